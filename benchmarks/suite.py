@@ -0,0 +1,254 @@
+"""
+Benchmarks every gate, the measurement routines and whole circuits as a function of the number of qubits.
+
+Usage: python benchmarks/suite.py --qubits 2 6 10 14 18 22 26 --output results.json
+       python benchmarks/suite.py --output new.json --compare results.json --threshold 1.25
+
+Every benchmark reports the best wall time over --repeat runs and the peak memory traced during one run (numpy
+allocations included). With --compare, the results are matched against a stored run and benchmarks which became slower
+than --threshold times the baseline are flagged; the exit status is then 1.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import quantum_simulator
+from quantum_simulator import QuantumCircuit, QuantumMeasurement
+
+UNITARY = np.linalg.qr(np.random.default_rng(0).normal(size=(4, 4)) + 1j*np.random.default_rng(1).normal(size=(4, 4)))[0]
+
+# name: (number of qubits, function(circuit, qubits))
+GATES = {
+  'h': (1, lambda circuit, q: circuit.h(q[0])),
+  'x': (1, lambda circuit, q: circuit.x(q[0])),
+  'y': (1, lambda circuit, q: circuit.y(q[0])),
+  'z': (1, lambda circuit, q: circuit.z(q[0])),
+  's': (1, lambda circuit, q: circuit.s(q[0])),
+  'inverse_s': (1, lambda circuit, q: circuit.inverse_s(q[0])),
+  't': (1, lambda circuit, q: circuit.t(q[0])),
+  'inverse_t': (1, lambda circuit, q: circuit.inverse_t(q[0])),
+  'p': (1, lambda circuit, q: circuit.p(q[0], 0.3)),
+  'rx': (1, lambda circuit, q: circuit.rx(q[0], 0.3)),
+  'ry': (1, lambda circuit, q: circuit.ry(q[0], 0.3)),
+  'rz': (1, lambda circuit, q: circuit.rz(q[0], 0.3)),
+  'cx': (2, lambda circuit, q: circuit.cx(q[0], q[1])),
+  'cy': (2, lambda circuit, q: circuit.cy(q[0], q[1])),
+  'cz': (2, lambda circuit, q: circuit.cz(q[0], q[1])),
+  'cp': (2, lambda circuit, q: circuit.cp(q[0], q[1], 3)),
+  'swap': (2, lambda circuit, q: circuit.swap(q[0], q[1])),
+  'unitary': (2, lambda circuit, q: circuit.unitary(UNITARY, q)),
+  'ccx': (3, lambda circuit, q: circuit.ccx(q[0], q[1], q[2])),
+  'cswap': (3, lambda circuit, q: circuit.cswap(q[0], q[1], q[2])),
+  'mcx': (4, lambda circuit, q: circuit.mcx(q[:-1], q[-1])),
+  'mcz': (4, lambda circuit, q: circuit.mcz(q[:-1], q[-1])),
+  'mcp': (4, lambda circuit, q: circuit.mcp(q[:-1], q[-1], 0.3)),
+  'qft': (1, lambda circuit, q: circuit.qft(range(circuit.n))),
+}
+
+
+def uniform_state(n):
+  return np.full(2**n, 2**(-n/2), dtype=complex)
+
+
+def ghz(n):
+  circuit = QuantumCircuit(n)
+  circuit.h(0)
+  for q in range(n-1):
+    circuit.cx(q, q+1)
+  return circuit.state
+
+
+def qft_gates(n):
+  """
+  Textbook QFT built from h, cp and swap.
+  """
+  circuit = QuantumCircuit(n, uniform_state(n))
+  for i in range(n):
+    circuit.h(i)
+    for j in range(i+1, n):
+      circuit.cp(j, i, j-i+1)
+  for i in range(n//2):
+    circuit.swap(i, n-1-i)
+  return circuit.state
+
+
+def qft(n):
+  circuit = QuantumCircuit(n, uniform_state(n))
+  circuit.qft(range(n))
+  return circuit.state
+
+
+def grover(n):
+  """
+  Grover search for |1...1>, limited to 4 iterations so that large n stay affordable.
+  """
+  circuit = QuantumCircuit(n)
+  qubits = list(range(n))
+  for q in qubits:
+    circuit.h(q)
+  for _ in range(min(int(np.pi/4*np.sqrt(2**n)), 4)):
+    circuit.mcz(qubits[:-1], qubits[-1])
+    for q in qubits:
+      circuit.h(q)
+      circuit.x(q)
+    circuit.mcz(qubits[:-1], qubits[-1])
+    for q in qubits:
+      circuit.x(q)
+      circuit.h(q)
+  return circuit.state
+
+
+def random_layers(n, depth = 10):
+  """
+  depth layers of random ry and rz rotations on every qubit followed by a brickwork of cx gates.
+  """
+  rng = np.random.default_rng(n)
+  circuit = QuantumCircuit(n)
+  for layer in range(depth):
+    for q in range(n):
+      circuit.ry(q, rng.uniform(0, 2*np.pi))
+      circuit.rz(q, rng.uniform(0, 2*np.pi))
+    for q in range(layer % 2, n-1, 2):
+      circuit.cx(q, q+1)
+  return circuit.state
+
+
+def teleportation(n):
+  """
+  Teleportation of qubit 0 to qubit 2 (examples/Quantum_Teleporation.py) with mid-circuit measurements, on an n-qubit
+  register.
+  """
+  circuit = QuantumCircuit(n, seed=0)
+  circuit.ry(0, 2*np.arccos(0.5))
+  circuit.h(1)
+  circuit.cx(1, 2)
+  circuit.cx(0, 1)
+  circuit.h(0)
+  if circuit.measure(1):
+    circuit.x(2)
+  if circuit.measure(0):
+    circuit.z(2)
+  return circuit.state
+
+
+# name: (minimum number of qubits, function(n))
+CIRCUITS = {
+  'ghz': (2, ghz),
+  'qft_gates': (1, qft_gates),
+  'qft': (1, qft),
+  'grover': (2, grover),
+  'random_layers': (2, random_layers),
+  'teleportation': (3, teleportation),
+}
+
+
+def benchmarks(n):
+  """
+  Yields (group, name, setup, run) for n qubits. setup() builds the input of run, which is the timed part.
+  """
+  for name, (k, gate) in GATES.items():
+    if n >= k:
+      qubits = [int(q) for q in np.linspace(0, n-1, k)]
+      yield 'gate', name, lambda: QuantumCircuit(n, uniform_state(n)), \
+            lambda circuit, gate=gate, qubits=qubits: (gate(circuit, qubits), circuit.state)
+  yield 'measurement', 'construction', lambda: uniform_state(n), QuantumMeasurement
+  yield 'measurement', 'collapse', lambda: QuantumMeasurement(uniform_state(n)), \
+        lambda measurement: measurement.collapse([0], [[1, 0]])
+  yield 'measurement', 'expectation_z', lambda: QuantumMeasurement(uniform_state(n)), \
+        lambda measurement: measurement.expectation('Z'*n)
+  yield 'measurement', 'expectation_x', lambda: QuantumMeasurement(uniform_state(n)), \
+        lambda measurement: measurement.expectation('X'*n)
+  yield 'measurement', 'sample', lambda: QuantumMeasurement(uniform_state(n)), \
+        lambda measurement: measurement.sample(1000, seed=0)
+  for name, (minimum, circuit) in CIRCUITS.items():
+    if n >= minimum:
+      yield 'circuit', name, lambda: n, circuit
+
+
+def measure(setup, run, repeat):
+  """
+  Returns (best wall time over repeat runs, peak traced memory in bytes of one run, setup included).
+  """
+  best = np.inf
+  for _ in range(repeat):
+    data = setup()
+    start = time.perf_counter()
+    run(data)
+    best = min(best, time.perf_counter()-start)
+  tracemalloc.start()
+  run(setup())
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return best, peak
+
+
+def compare(results, baseline, threshold, min_seconds):
+  """
+  Prints the ratio of every result to the baseline and returns the list of slowdowns.
+  """
+  reference = {(r['group'], r['name'], r['qubits']): r for r in baseline['results']}
+  slowdowns = []
+  print(f"\n{'group':>11} {'name':>14} {'qubits':>6} {'baseline':>10} {'seconds':>10} {'ratio':>6}")
+  for result in results:
+    key = (result['group'], result['name'], result['qubits'])
+    if key not in reference:
+      continue
+    base = reference[key]['seconds']
+    ratio = result['seconds']/base if base > 0 else np.inf
+    slower = ratio > threshold and result['seconds'] > min_seconds
+    if slower:
+      slowdowns.append(result)
+    print(f"{key[0]:>11} {key[1]:>14} {key[2]:>6} {base:>10.6f} {result['seconds']:>10.6f} {ratio:>6.2f}"
+          f"{'  SLOWER' if slower else ''}")
+  return slowdowns
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--qubits', type=int, nargs='+', default=list(range(2, 27, 4)))
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--only', nargs='+', default=None, help='run only the benchmarks with these names')
+  parser.add_argument('--output', default=None, help='JSON file for the results')
+  parser.add_argument('--compare', default=None, help='JSON file of a baseline run')
+  parser.add_argument('--threshold', type=float, default=1.25, help='ratio to the baseline flagged as a slowdown')
+  parser.add_argument('--min-seconds', type=float, default=1e-4, help='faster benchmarks are never flagged')
+  args = parser.parse_args()
+  results = []
+  print(f"{'group':>11} {'name':>14} {'qubits':>6} {'seconds':>10} {'peak MB':>9}")
+  for n in args.qubits:
+    for group, name, setup, run in benchmarks(n):
+      if args.only and name not in args.only:
+        continue
+      seconds, peak = measure(setup, run, args.repeat)
+      results.append({'group': group, 'name': name, 'qubits': n, 'seconds': seconds, 'peak_bytes': peak})
+      print(f"{group:>11} {name:>14} {n:>6} {seconds:>10.6f} {peak/2**20:>9.1f}")
+  report = {
+    'metadata': {
+      'version': quantum_simulator.__version__,
+      'python': platform.python_version(),
+      'numpy': np.__version__,
+      'machine': platform.machine(),
+      'processor': platform.processor(),
+      'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'repeat': args.repeat,
+    },
+    'results': results,
+  }
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(report, file, indent=2)
+  if args.compare:
+    with open(args.compare) as file:
+      baseline = json.load(file)
+    slowdowns = compare(results, baseline, args.threshold, args.min_seconds)
+    print(f"\n{len(slowdowns)} slowdown(s) above {args.threshold}x the baseline.")
+    if slowdowns:
+      sys.exit(1)
+  return None
+
+
+if __name__ == '__main__':
+  main()
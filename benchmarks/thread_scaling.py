@@ -0,0 +1,64 @@
+"""
+Measures how the gate kernels scale with the number of threads.
+
+Usage: python benchmarks/thread_scaling.py --qubits 20 22 24 26 --threads 1 2 4 8 16 32
+"""
+import argparse
+import time
+import numpy as np
+from quantum_simulator import QuantumCircuit
+from quantum_simulator.parallel import default_num_threads
+
+
+def layer(circuit):
+  """
+  One layer of every kind of kernel: single-qubit, diagonal, permutation and fused two-qubit gates.
+  """
+  n = circuit.n
+  circuit.h(0)
+  circuit.h(n-1)
+  circuit.rx(n//2, 0.3)
+  circuit.rz(1, 0.2)
+  circuit.cp(0, n-1, 3)
+  circuit.cx(0, n-1)
+  circuit.cx(n//2, 1)
+  circuit.swap(2, n-2)
+  circuit.ccx(0, 1, n-1)
+  circuit.state
+  return None
+
+
+def time_layer(n, num_threads, repeat):
+  """
+  Returns the best wall time of one layer over repeat runs.
+  """
+  circuit = QuantumCircuit(n, num_threads=num_threads)
+  layer(circuit)
+  best = np.inf
+  for _ in range(repeat):
+    start = time.perf_counter()
+    layer(circuit)
+    best = min(best, time.perf_counter()-start)
+  return best
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--qubits', type=int, nargs='+', default=[20, 22, 24])
+  parser.add_argument('--threads', type=int, nargs='+', default=None)
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+  threads = args.threads or sorted({1, 2, 4, 8, 16, 32, default_num_threads()})
+  print(f"CPUs available: {default_num_threads()}")
+  print(f"{'qubits':>6} {'threads':>7} {'seconds':>9} {'speedup':>8}")
+  for n in args.qubits:
+    serial = None
+    for num_threads in threads:
+      seconds = time_layer(n, num_threads, args.repeat)
+      serial = serial or seconds
+      print(f"{n:>6} {num_threads:>7} {seconds:>9.4f} {serial/seconds:>8.2f}")
+  return None
+
+
+if __name__ == '__main__':
+  main()
@@ -7,9 +7,22 @@ quantum measurements.
 
 from .quantum_circuit import QuantumCircuit
 from .quantum_measurement import QuantumMeasurement
+from .batched_circuit import BatchedQuantumCircuit
+from .memmap_circuit import MemmapQuantumCircuit
+from .sharded_circuit import ShardedQuantumCircuit
+from .sparse_circuit import SparseQuantumCircuit
+from .mps_circuit import MPSQuantumCircuit
+from .parameterized import Parameter, ParameterizedCircuit
+from .instrumentation import Profiler
+from .qasm import QasmReader, QasmError, run_qasm
+from .executor import CircuitExecutor
+from .stabilizer_circuit import StabilizerCircuit, NonCliffordGateError
 
 __version__ = "0.1.0"
 __author__ = "Mridul Singhal"
 __email__ = "res.mridul@gmail.com"
 
-__all__ = ['QuantumCircuit', 'QuantumMeasurement']
+__all__ = ['QuantumCircuit', 'QuantumMeasurement', 'BatchedQuantumCircuit', 'MemmapQuantumCircuit',
+           'ShardedQuantumCircuit', 'SparseQuantumCircuit', 'MPSQuantumCircuit', 'StabilizerCircuit',
+           'NonCliffordGateError', 'Parameter', 'ParameterizedCircuit', 'Profiler', 'QasmReader', 'QasmError',
+           'run_qasm', 'CircuitExecutor']
@@ -0,0 +1,32 @@
+from collections.abc import Sequence
+
+class BasisLabels(Sequence):
+  """
+  Read-only list of the 2^n basis state labels, e.g. ['|00>', '|01>', '|10>', '|11>'] for n = 2.
+
+  A label is only formatted when it is looked up, so no list of 2^n strings is ever built.
+  """
+  def __init__(self, n, template = '{}'):
+    """
+    template: format string in which the n-bit binary index is substituted, e.g. '|{}>'.
+    """
+    self.n = n
+    self.template = template
+
+  def __len__(self):
+    return 2**self.n
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [self[i] for i in range(*index.indices(len(self)))]
+    index = int(index)
+    if index < 0:
+      index += len(self)
+    if not 0 <= index < len(self):
+      raise IndexError("basis state index out of range")
+    return self.template.format(format(index, f'0{self.n}b'))
+
+  def __repr__(self):
+    if len(self) <= 8:
+      return repr(list(self))
+    return f"[{', '.join(repr(label) for label in self[:3])}, ..., {repr(self[-1])}]"
@@ -0,0 +1,60 @@
+import numpy as np
+from .quantum_circuit import QuantumCircuit
+from .gates import apply_gate
+from .kernels import apply_diagonal_gate
+
+class BatchedQuantumCircuit(QuantumCircuit):
+  """
+  A batch of circuits which share the same gates but may differ in the angles of p, rx, ry and rz.
+
+  The states are stored as an array of shape (batch, 2^n), so self.state[i] is the state of the i-th circuit. Every
+  gate is applied to the whole batch in one vectorized call. The angle phi of a parameterized gate may be a single
+  number, which is used for the whole batch, or an array of length batch with one angle per circuit. measure returns
+  one outcome per circuit.
+  """
+  def __init__(self, n, batch, initial_state = 0, dtype = complex, num_threads = 1, seed = None):
+    """
+    Initializes batch circuits of n qubits. initial_state is either 0 (all qubits in |0>), a single state vector used for
+    every circuit of the batch, or an array of shape (batch, 2^n). dtype is np.complex128 or np.complex64.
+    num_threads: number of threads among which every gate splits the batch.
+    seed: seed of the random number generator used by measure.
+    """
+    self.batch = batch
+    initial_state = np.array(initial_state)
+    if initial_state.ndim == 0:
+      initial_state = np.zeros((2**n,))
+      initial_state[0] = 1
+    super().__init__(n, np.broadcast_to(initial_state, (batch, 2**n)), seed=seed, dtype=dtype, num_threads=num_threads)
+
+  def _gate(self, name, qubits, params):
+    """
+    Applies the gate on every state of the batch.
+    """
+    params = tuple(np.asarray(param, dtype=float) for param in params) if name in ('p', 'rx', 'ry', 'rz') else params
+    self._execute(name, qubits, params)
+    return None
+
+  def _execute(self, name, qubits, params):
+    """
+    Applies the gate with its per-circuit angles in one vectorized call. Diagonal gates are not queued, since their
+    phases may differ from one circuit to the next.
+    """
+    self._own_state()
+    self._state = apply_gate(self._state, self.n, name, qubits, params, self.num_threads)
+    return None
+
+  def measure(self, qubit_position):
+    """
+    Measures qubit_position in every circuit of the batch independently and returns the array of outcomes (0 or 1), one
+    per circuit. Every state collapses onto its own outcome and is normalized.
+    """
+    self._run_pending()
+    view = self._state.reshape(self.batch, -1, 2, 2**(self.n-qubit_position-1))
+    probability0 = np.sum(np.abs(view[:, :, 0, :])**2, axis=(1, 2))
+    probability1 = np.sum(np.abs(view[:, :, 1, :])**2, axis=(1, 2))
+    outcomes = (self.rng.random(self.batch)*(probability0 + probability1) < probability1).astype(int)
+    mask = np.zeros((self.batch, 2))
+    mask[np.arange(self.batch), outcomes] = 1/np.sqrt(np.where(outcomes, probability1, probability0))
+    self._own_state()
+    self._state = apply_diagonal_gate(self._state, self.n, (qubit_position,), mask, self.num_threads)
+    return outcomes
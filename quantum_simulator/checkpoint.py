@@ -0,0 +1,102 @@
+"""
+Checkpoints of state vector circuits, so that long simulations can resume after an interruption.
+
+A checkpoint is a directory holding the state vector as a .npy file and circuit.npy, a pickled dictionary with the
+settings of the circuit, its queued gates (instructions recorded in lazy mode and pending diagonal gates) and the state
+of its random number generator. Queued gates are saved without being executed.
+
+Saving writes a new state file and only then atomically replaces circuit.npy, so an interruption during save_checkpoint
+leaves the previous checkpoint intact. Loading memory-maps the state file, so no amplitude is read before it is used.
+circuit.npy is unpickled on load: only load checkpoints from trusted sources.
+"""
+import os
+import numpy as np
+
+METADATA_FILE = 'circuit.npy'
+
+
+def _write(path, array, allow_pickle = False):
+  """
+  Writes the array as a .npy file and waits until it is on disk.
+  """
+  with open(path, 'wb') as file:
+    np.save(file, array, allow_pickle=allow_pickle)
+    file.flush()
+    os.fsync(file.fileno())
+  return None
+
+
+def _read_metadata(path):
+  return np.load(os.path.join(path, METADATA_FILE), allow_pickle=True).item()
+
+
+def save_checkpoint(circuit, path):
+  """
+  Saves the state vector, the queued gates, the settings and the random number generator of circuit to the directory
+  path, which is created if needed. An existing checkpoint in path is replaced.
+  """
+  state = getattr(circuit, '_state', None)
+  if not isinstance(state, np.ndarray) or state.ndim != 1:
+    raise TypeError(f"Checkpoints hold a single state vector, which a {type(circuit).__name__} does not have.")
+  os.makedirs(path, exist_ok=True)
+  version = _read_metadata(path)['version'] + 1 if os.path.exists(os.path.join(path, METADATA_FILE)) else 0
+  state_file = f'state-{version}.npy'
+  _write(os.path.join(path, state_file), state)
+  metadata = {
+    'version': version,
+    'state_file': state_file,
+    'class': type(circuit),
+    'chunk_qubits': getattr(circuit, 'chunk_qubits', None),
+    'n': circuit.n,
+    'dtype': circuit.dtype.str,
+    'lazy': circuit.lazy,
+    'max_fused_qubits': circuit.max_fused_qubits,
+    'num_threads': circuit.num_threads,
+    'rng': circuit.rng.bit_generator.state,
+    'instructions': list(circuit.instructions),
+    'pending_diagonals': dict(circuit._pending_diagonals),
+  }
+  _write(os.path.join(path, METADATA_FILE + '.tmp'), np.array(metadata, dtype=object), allow_pickle=True)
+  os.replace(os.path.join(path, METADATA_FILE + '.tmp'), os.path.join(path, METADATA_FILE))
+  for name in os.listdir(path):
+    if name.startswith('state-') and name.endswith('.npy') and name != state_file:
+      try:
+        os.remove(os.path.join(path, name))
+      except OSError:
+        pass  # still memory-mapped on Windows, removed by a later save
+  return None
+
+
+def load_checkpoint(circuit_class, path, mmap_mode = 'c'):
+  """
+  Returns the circuit saved in the directory path by save_checkpoint as an instance of the class it was saved from,
+  which must be circuit_class or a subclass of it, i.e. QuantumCircuit or MemmapQuantumCircuit.
+
+  mmap_mode: how the state file is mapped (see np.load).
+    'c' (default): copy-on-write, the gates modify private copies of the memory pages they touch and the file is kept.
+    'r': read-only, the state is copied into memory by the first gate which modifies it.
+    'r+': the gates modify the state file in place, which then no longer holds the saved state.
+    None: the state is read into memory.
+  A MemmapQuantumCircuit is restored with its amplitudes copied chunk by chunk from the mapped state file into a new
+  temporary amplitude file, so that it stays file-backed and the checkpoint is kept.
+  """
+  metadata = _read_metadata(path)
+  saved_class = metadata.get('class', circuit_class)
+  if not issubclass(saved_class, circuit_class):
+    raise TypeError(f"The checkpoint in {path} holds a {saved_class.__name__}, not a {circuit_class.__name__}.")
+  state = np.load(os.path.join(path, metadata['state_file']), mmap_mode=mmap_mode)
+  if metadata.get('chunk_qubits') is not None:
+    circuit = saved_class(metadata['n'], state, chunk_qubits=metadata['chunk_qubits'], lazy=metadata['lazy'],
+                          max_fused_qubits=metadata['max_fused_qubits'], dtype=metadata['dtype'],
+                          num_threads=metadata['num_threads'])
+  else:
+    circuit = saved_class.__new__(saved_class)
+    circuit._setup(metadata['n'], metadata['lazy'], metadata['max_fused_qubits'], None, metadata['dtype'],
+                   metadata['num_threads'])
+    circuit.state = state
+    circuit._owns_state = state.flags.writeable
+  circuit.rng = np.random.default_rng()
+  circuit.rng.bit_generator.state = metadata['rng']
+  circuit.instructions = metadata['instructions']
+  circuit._pending_diagonals = metadata['pending_diagonals']
+  return circuit
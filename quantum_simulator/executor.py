@@ -0,0 +1,285 @@
+"""
+Concurrent execution of many small, independent circuits on a pool of worker processes.
+
+Jobs are queued and collected by a dispatcher thread for up to linger seconds (or until max_batch jobs per worker are
+waiting). The jobs collected are grouped by number of qubits into tasks of at most max_batch jobs, which the worker
+processes run one task at a time, so the cost of a task is shared among its jobs. Within a task, circuits with the same
+structure (the same gates on the same qubits, possibly with different angles of rx, ry, rz and p) run together as one
+BatchedQuantumCircuit, which computes their gate tables once and applies every gate to all of them in a single call.
+
+Every job returns a concurrent.futures.Future, which may be cancelled as long as its task has not been sent to a worker.
+At most max_pending jobs are queued or running; submit blocks until a slot is free.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import io
+import os
+import queue
+import threading
+import time
+import numpy as np
+from .quantum_circuit import QuantumCircuit
+from .batched_circuit import BatchedQuantumCircuit
+from .quantum_measurement import QuantumMeasurement
+from .pauli import pauli_sum_expectation
+from .qasm import QasmReader, run_instructions
+from .gates import SINGLE_QUBIT_GATES, DIAGONAL_GATES, PERMUTATION_GATES, FOURIER_GATES, CONTROLLED_GATES
+
+ANGLE_GATES = ('p', 'rx', 'ry', 'rz')
+
+GATES = set(SINGLE_QUBIT_GATES) | set(DIAGONAL_GATES) | set(PERMUTATION_GATES) | set(FOURIER_GATES) \
+        | set(CONTROLLED_GATES) | {'unitary'}
+
+RESULTS = ('state', 'samples', 'expectation')
+
+Job = collections.namedtuple('Job', ['n', 'instructions', 'cregs', 'result', 'shots', 'terms', 'seed'])
+
+
+def structure(instructions):
+  """
+  Returns a key which is equal for two circuits which differ at most in the angles of rx, ry, rz and p, or None if the
+  circuit cannot run in a batch (it measures, or has parameters which cannot be compared).
+  """
+  key = []
+  for name, qubits, params in instructions:
+    if name in ('measure', 'if'):
+      return None
+    if name not in ANGLE_GATES:
+      try:
+        hash(params)
+      except TypeError:
+        return None
+    key.append((name, qubits, None if name in ANGLE_GATES else params))
+  return tuple(key)
+
+
+def _result(job, state):
+  """
+  Returns the requested result of the job from its final state.
+  """
+  if job.result == 'state':
+    return state
+  if job.result == 'samples':
+    return QuantumMeasurement(state).sample(job.shots, seed=job.seed)
+  terms = job.terms
+  if all(isinstance(pauli, str) and len(pauli) == 1 for pauli in terms):
+    terms = [(1, terms)]
+  return pauli_sum_expectation(state, job.n, terms)
+
+
+def _run_batch(jobs):
+  """
+  Runs jobs with the same structure as one BatchedQuantumCircuit and returns their states.
+  """
+  circuit = BatchedQuantumCircuit(jobs[0].n, len(jobs))
+  for j, (name, qubits, params) in enumerate(jobs[0].instructions):
+    if name in ANGLE_GATES:
+      params = (np.array([job.instructions[j][2][0] for job in jobs]),)
+    circuit._gate(name, qubits, params)
+  return circuit.state
+
+
+def run_jobs(jobs):
+  """
+  Runs a task, a list of jobs, in a worker process and returns the list of their results. A job whose execution fails
+  returns its exception instead.
+  """
+  results = [None]*len(jobs)
+  groups = collections.defaultdict(list)
+  for i, job in enumerate(jobs):
+    groups[structure(job.instructions)].append(i)
+  for key, indices in groups.items():
+    if key is not None and len(indices) > 1:
+      try:
+        states = _run_batch([jobs[i] for i in indices])
+      except Exception as error:
+        for i in indices:
+          results[i] = error
+        continue
+      for i, state in zip(indices, states):
+        results[i] = _run_safely(jobs[i], state)
+      continue
+    for i in indices:
+      results[i] = _run_safely(jobs[i])
+  return results
+
+
+def _run_safely(job, state = None):
+  try:
+    if state is None:
+      circuit = QuantumCircuit(job.n, seed=job.seed)
+      run_instructions(circuit, job.instructions, job.cregs)
+      state = circuit.state
+    return _result(job, state)
+  except Exception as error:
+    return error
+
+
+class CircuitExecutor:
+  """
+  Runs circuits on a pool of worker processes.
+
+  with CircuitExecutor() as executor:
+    futures = [executor.submit(program, result='samples', shots=1000) for program in programs]
+    counts = [future.result() for future in futures]
+
+  In asyncio code, await executor.submit_async(...) or executor.gather(...) instead.
+  """
+  def __init__(self, max_workers = None, max_pending = 10000, max_batch = 64, linger = 0.002, mp_context = None):
+    """
+    max_workers: number of worker processes, by default the number of CPUs.
+    max_pending: maximum number of jobs queued or running, after which submit blocks.
+    max_batch: maximum number of jobs per task sent to a worker.
+    linger: seconds during which the dispatcher collects jobs before sending them, so that they can be grouped.
+    mp_context: multiprocessing context of the pool, see concurrent.futures.ProcessPoolExecutor.
+    """
+    self.max_workers = max_workers or os.cpu_count()
+    self.max_batch = max_batch
+    self.linger = linger
+    self._pool = concurrent.futures.ProcessPoolExecutor(self.max_workers, mp_context=mp_context)
+    self._slots = threading.BoundedSemaphore(max_pending)
+    self._queue = queue.Queue()
+    self._lock = threading.Lock()
+    self._closed = False
+    self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+    self._dispatcher.start()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exception):
+    self.shutdown()
+    return False
+
+  def submit(self, circuit, result = 'state', shots = 1000, terms = None, seed = None, timeout = None):
+    """
+    Queues a circuit and returns a concurrent.futures.Future of its result.
+
+    circuit: OpenQASM 2 program text (or the path of a .qasm file as os.PathLike), or (n, instructions) where
+    instructions is a list of (name, qubits, params) as described in gates.py.
+    result: 'state' for the final state vector, 'samples' for {bitstring: count} over shots measurements of all the
+    qubits, or 'expectation' for the expectation value of terms, a Pauli string or [(coefficient, operator), ...].
+    seed: seed of the mid-circuit measurements and of the samples.
+    timeout: seconds to wait for a free slot, after which TimeoutError is raised. By default submit waits as long as
+    needed.
+
+    Once the executor is shut down, the future returned fails with RuntimeError.
+    """
+    if result not in RESULTS:
+      raise ValueError(f"result must be one of {RESULTS}, not '{result}'.")
+    if result == 'expectation' and terms is None:
+      raise ValueError("terms are required for result='expectation'.")
+    if isinstance(circuit, (str, os.PathLike)):
+      reader = QasmReader(io.StringIO(circuit) if isinstance(circuit, str) else circuit)
+      instructions = list(reader)
+      job = Job(reader.n, instructions, reader.cregs, result, shots, terms, seed)
+    else:
+      n, instructions = circuit
+      instructions = [(name, tuple(qubits), tuple(params)) for name, qubits, params in instructions]
+      unknown = {name for name, _, _ in instructions} - GATES
+      if unknown:
+        raise ValueError(f"Unknown gate(s) {sorted(unknown)}.")
+      job = Job(n, instructions, {}, result, shots, terms, seed)
+    if not self._slots.acquire(timeout=timeout):
+      raise TimeoutError(f"No free slot among the pending jobs after {timeout} seconds.")
+    future = concurrent.futures.Future()
+    future.add_done_callback(lambda _: self._slots.release())
+    with self._lock:
+      if self._closed:
+        future.set_exception(RuntimeError("The executor has been shut down."))
+      else:
+        self._queue.put((job, future))
+    return future
+
+  async def submit_async(self, circuit, **options):
+    """
+    Coroutine version of submit, which waits for a free slot without blocking the event loop and returns the result.
+    """
+    loop = asyncio.get_running_loop()
+    future = await loop.run_in_executor(None, lambda: self.submit(circuit, **options))
+    return await asyncio.wrap_future(future)
+
+  async def gather(self, circuits, **options):
+    """
+    Runs all the circuits with the same options (see submit) and returns the list of their results.
+    """
+    return await asyncio.gather(*[self.submit_async(circuit, **options) for circuit in circuits])
+
+  def map(self, circuits, **options):
+    """
+    Runs all the circuits with the same options (see submit) and returns the list of their results.
+    """
+    futures = [self.submit(circuit, **options) for circuit in circuits]
+    return [future.result() for future in futures]
+
+  def _dispatch(self):
+    """
+    Collects the queued jobs, groups them by number of qubits into tasks and sends the tasks to the pool.
+    """
+    while True:
+      item = self._queue.get()
+      if item is None:
+        return
+      batch = [item]
+      deadline = time.perf_counter() + self.linger
+      while len(batch) < self.max_batch*self.max_workers:
+        try:
+          item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+        except queue.Empty:
+          break
+        if item is None:
+          self._queue.put(None)
+          break
+        batch.append(item)
+      tasks = collections.defaultdict(list)
+      for job, future in batch:
+        if future.set_running_or_notify_cancel():
+          tasks[job.n].append((job, future))
+      for items in tasks.values():
+        for start in range(0, len(items), self.max_batch):
+          self._send(items[start:start+self.max_batch])
+
+  def _send(self, items):
+    """
+    Sends a task to the pool and sets the futures of its jobs when it is done.
+    """
+    def done(task):
+      try:
+        results = task.result()
+      except BaseException as error:
+        results = [error]*len(items)
+      for (_, future), result in zip(items, results):
+        if isinstance(result, BaseException):
+          future.set_exception(result)
+        else:
+          future.set_result(result)
+      return None
+
+    try:
+      self._pool.submit(run_jobs, [job for job, _ in items]).add_done_callback(done)
+    except RuntimeError as error:
+      for _, future in items:
+        future.set_exception(error)
+    return None
+
+  def shutdown(self, wait = True, cancel = False):
+    """
+    Stops the executor. If cancel is True, the jobs which have not been sent to a worker are cancelled, otherwise they
+    still run. If wait is True, returns once the workers have finished.
+    """
+    with self._lock:
+      self._closed = True
+      if cancel:
+        while True:
+          try:
+            item = self._queue.get_nowait()
+          except queue.Empty:
+            break
+          if item is not None:
+            item[1].cancel()
+      self._queue.put(None)
+    if wait:
+      self._dispatcher.join()
+    self._pool.shutdown(wait=wait)
+    return None
@@ -0,0 +1,57 @@
+"""
+Gate fusion for recorded instructions (see gates.py).
+
+Gates acting on small sets of qubits are merged into blocks of at most max_qubits qubits so that a deep circuit needs
+fewer passes over the state vector. Blocks that only contain diagonal gates stay diagonal.
+"""
+import numpy as np
+from .gates import is_diagonal, gate_diagonal, apply_gate
+from .kernels import diagonal_table, fuse_diagonals
+
+
+def fuse_block(instructions):
+  """
+  Returns a single instruction equivalent to the list of instructions, applied in order.
+  """
+  if len(instructions) == 1:
+    return instructions[0]
+  qubits = sorted(set().union(*[qubits for _, qubits, _ in instructions]))
+  if all(is_diagonal(name) for name, _, _ in instructions):
+    terms = [diagonal_table(q, gate_diagonal(name, params)) for name, q, params in instructions]
+    qubits, table = fuse_diagonals(terms)
+    return ('diagonal', qubits, (table.ravel(),))
+  k = len(qubits)
+  local = {q: i for i, q in enumerate(qubits)}
+  columns = np.eye(2**k, dtype=complex)
+  for name, q, params in instructions:
+    columns = apply_gate(columns, k, name, tuple(local[i] for i in q), params)
+  return ('unitary', tuple(qubits), (columns.T,))
+
+
+def fuse_instructions(instructions, max_qubits=2):
+  """
+  Fuses a list of instructions into blocks acting on at most max_qubits qubits and returns the new list.
+
+  Open blocks always act on disjoint qubits. A gate joins (and merges) the open blocks it touches if the union of their
+  qubits stays within max_qubits, otherwise those blocks are closed first. Adjacent single-qubit gates on the same
+  qubit therefore always end up in one 2x2 matrix.
+  """
+  fused = []
+  blocks = []
+  for instruction in instructions:
+    qubits = set(instruction[1])
+    touched = [block for block in blocks if block[0] & qubits]
+    union = qubits.union(*[block[0] for block in touched])
+    for block in touched:
+      blocks.remove(block)
+    if len(union) <= max_qubits:
+      merged = [i for block in touched for i in block[1]]
+      blocks.append((union, merged + [instruction]))
+    else:
+      fused.extend(fuse_block(block[1]) for block in touched)
+      if len(qubits) <= max_qubits:
+        blocks.append((qubits, [instruction]))
+      else:
+        fused.append(instruction)
+  fused.extend(fuse_block(block[1]) for block in blocks)
+  return fused
@@ -0,0 +1,112 @@
+"""
+Definitions of the gates supported by QuantumCircuit.
+
+A gate is described by an instruction (name, qubits, params), e.g. ('h', (0,), ()), ('rx', (2,), (phi,)) or
+('cp', (0, 1), (k,)). The qubits are given in the same order as the arguments of the corresponding QuantumCircuit
+method. Fused gates use the names 'unitary' with params (matrix,) and 'diagonal' with params (diagonal,). 'qft' and
+'iqft' act on any number of qubits, and the multi-controlled gates 'mcx', 'mcz' and 'mcp' have the controls first and
+the target last.
+
+The angles of rx, ry, p and rz may be arrays, in which case the gate is a stack of matrices (or diagonals) with the
+angle dimensions in front.
+"""
+import numpy as np
+from .kernels import apply_single_qubit_gate, apply_permutation_gate, apply_diagonal_gate, apply_unitary_gate
+from .kernels import apply_controlled_gate, apply_fourier_transform, diagonal_table
+
+
+SINGLE_QUBIT_GATES = {
+  'h': lambda: (1/np.sqrt(2))*np.array([[1,1],[1,-1]]),
+  'x': lambda: np.array([[0,1],[1,0]]),
+  'y': lambda: np.array([[0,-1j],[1j,0]]),
+  'rx': lambda phi: np.moveaxis(np.array([[np.cos(phi/2),-1j*np.sin(phi/2)],[-1j*np.sin(phi/2),np.cos(phi/2)]]), [0,1], [-2,-1]),
+  'ry': lambda phi: np.moveaxis(np.array([[np.cos(phi/2),-1*np.sin(phi/2)],[np.sin(phi/2),np.cos(phi/2)]]), [0,1], [-2,-1]),
+}
+
+DIAGONAL_GATES = {
+  'z': lambda: np.array([1,-1]),
+  's': lambda: np.array([1,1j]),
+  'inverse_s': lambda: np.array([1,-1j]),
+  't': lambda: np.array([1,np.exp(1j*np.sqrt(np.pi/4))]),
+  'inverse_t': lambda: np.array([1,np.exp(-1j*np.sqrt(np.pi/4))]),
+  'p': lambda phi: np.exp(1j*np.multiply.outer(phi, [0,1])),
+  'rz': lambda phi: np.exp(1j*np.multiply.outer(phi, [-1/2,1/2])),
+  'cz': lambda: np.array([1,1,1,-1]),
+  'cp': lambda k: np.array([1,1,1,np.exp(1j*2*np.pi/(2**k))]),
+  'diagonal': lambda diagonal: np.asarray(diagonal),
+}
+
+PERMUTATION_GATES = ('cx', 'cy', 'swap', 'ccx', 'cswap')
+
+FOURIER_GATES = ('qft', 'iqft')
+
+CONTROLLED_GATES = {
+  'mcx': lambda: np.array([[0,1],[1,0]]),
+  'mcz': lambda: np.array([[1,0],[0,-1]]),
+  'mcp': lambda phi: np.array([[1,0],[0,np.exp(1j*phi)]]),
+}
+
+
+def is_diagonal(name):
+  """
+  True if the gate name is diagonal in the computational basis.
+  """
+  return name in DIAGONAL_GATES
+
+
+def gate_diagonal(name, params=()):
+  """
+  Returns the diagonal entries of a diagonal gate.
+  """
+  return DIAGONAL_GATES[name](*params)
+
+
+def inverse_gate(name, qubits, params=()):
+  """
+  Returns the instruction (name, qubits, params) of the inverse (conjugate transpose) of the gate.
+  """
+  inverses = {'s': 'inverse_s', 'inverse_s': 's', 't': 'inverse_t', 'inverse_t': 't', 'qft': 'iqft', 'iqft': 'qft'}
+  if name in inverses:
+    return (inverses[name], qubits, params)
+  if name in ('rx', 'ry', 'rz', 'p', 'mcp'):
+    return (name, qubits, (-np.asarray(params[0]),))
+  if name == 'unitary':
+    return (name, qubits, (np.conj(np.swapaxes(params[0], -1, -2)),))
+  if name in ('cp', 'diagonal'):
+    return ('diagonal', qubits, (np.conj(gate_diagonal(name, params)),))
+  return (name, qubits, params)
+
+
+def gate_matrix(name, qubits, params=()):
+  """
+  Returns the 2^k x 2^k matrix of the gate acting on its k qubits, with the first qubit as the most significant bit.
+  """
+  if name == 'unitary':
+    return np.asarray(params[0])
+  if name in SINGLE_QUBIT_GATES:
+    return SINGLE_QUBIT_GATES[name](*params)
+  if name in DIAGONAL_GATES:
+    return np.diag(gate_diagonal(name, params))
+  k = len(qubits)
+  columns = apply_gate(np.eye(2**k, dtype=complex), k, name, tuple(range(k)), params)
+  return columns.T
+
+
+def apply_gate(state, n, name, qubits, params=(), num_threads=1):
+  """
+  Applies the gate in place on state with the fastest available kernel and returns the state. state may have leading
+  batch dimensions, in which case the gate is applied to every state of the batch. The state is split among
+  num_threads threads.
+  """
+  if name in DIAGONAL_GATES:
+    return apply_diagonal_gate(state, n, *diagonal_table(qubits, gate_diagonal(name, params)), num_threads=num_threads)
+  if name in PERMUTATION_GATES:
+    return apply_permutation_gate(state, n, name, qubits, num_threads)
+  if name in CONTROLLED_GATES:
+    operator = CONTROLLED_GATES[name](*params)
+    return apply_controlled_gate(state, n, qubits[:-1], qubits[-1], operator, num_threads)
+  if name in FOURIER_GATES:
+    return apply_fourier_transform(state, n, qubits, name == 'iqft', num_threads)
+  if len(qubits) == 1:
+    return apply_single_qubit_gate(state, n, gate_matrix(name, qubits, params), qubits[0], num_threads)
+  return apply_unitary_gate(state, n, qubits, gate_matrix(name, qubits, params), num_threads)
@@ -0,0 +1,195 @@
+"""
+Opt-in instrumentation of circuit execution.
+
+add_hook(circuit, hook) wraps the circuit's _execute, _flush_diagonals and measure methods on the instance, so circuits
+without hooks run the plain methods. After every applied gate, diagonal flush and measurement, hook(record) is called
+with a dictionary:
+
+  name: gate name, 'flush_diagonals' or 'measure'.
+  qubits: tuple of qubits.
+  start: time.perf_counter() at the start.
+  duration: wall time in seconds, including nested events (e.g. a flush of queued diagonal gates triggered by a gate).
+  seconds: wall time in seconds without the nested events.
+  bytes: peak memory allocated during the event above the memory in use at its start, or None if tracemalloc is not
+  tracing or cannot reset its peak (Python 3.8).
+  passes: passes over the state vector, 0 for a diagonal gate which is only queued (see QuantumCircuit._apply_diagonal).
+
+Profiler is a hook which collects the records, summarizes them by gate name and exports them as a Chrome/Perfetto
+trace.
+"""
+import json
+import time
+import tracemalloc
+from .gates import is_diagonal
+
+PASSES = {'measure': 2, 'flush_diagonals': 1}
+
+WRAPPED_METHODS = ('_execute', '_flush_diagonals', 'measure')
+
+RESETS_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+
+def _describe(circuit, method_name, args):
+  """
+  Returns (name, qubits) of the event for the arguments of the wrapped method.
+  """
+  if method_name == '_execute':
+    return args[0], tuple(int(q) for q in args[1])
+  if method_name == 'measure':
+    return 'measure', (int(args[0]),)
+  return 'flush_diagonals', tuple(int(q) for q in sorted(set().union(*circuit._pending_diagonals)))
+
+
+def _wrap(circuit, method_name):
+  method = getattr(type(circuit), method_name).__get__(circuit)
+
+  def wrapped(*args):
+    name, qubits = _describe(circuit, method_name, args)
+    stack = circuit._hook_stack
+    tracing = RESETS_PEAK and tracemalloc.is_tracing()
+    if tracing:
+      current, peak = tracemalloc.get_traced_memory()
+      if stack:
+        stack[-1][1] = max(stack[-1][1], peak)
+      tracemalloc.reset_peak()
+    stack.append([0.0, 0])
+    start = time.perf_counter()
+    result = method(*args)
+    duration = time.perf_counter()-start
+    nested_seconds, nested_peak = stack.pop()
+    bytes_allocated = None
+    if tracing:
+      peak = max(tracemalloc.get_traced_memory()[1], nested_peak)
+      bytes_allocated = peak-current
+    if stack:
+      stack[-1][0] += duration
+      if tracing:
+        stack[-1][1] = max(stack[-1][1], peak)
+    if method_name == '_execute':
+      passes = 0 if is_diagonal(name) and getattr(circuit, '_pending_diagonals', None) else 1
+    else:
+      passes = PASSES[name]
+    record = {'name': name, 'qubits': qubits, 'start': start, 'duration': duration, 'seconds': duration-nested_seconds,
+              'bytes': bytes_allocated, 'passes': passes}
+    for hook in list(circuit._hooks):
+      hook(record)
+    return result
+
+  setattr(circuit, method_name, wrapped)
+  return None
+
+
+def add_hook(circuit, hook):
+  """
+  Calls hook(record) after every gate, diagonal flush and measurement of circuit.
+  """
+  if not circuit._hooks:
+    circuit._hooks = []
+    circuit._hook_stack = []
+    for method_name in WRAPPED_METHODS:
+      _wrap(circuit, method_name)
+  circuit._hooks.append(hook)
+  return None
+
+
+def remove_hook(circuit, hook):
+  """
+  Removes hook from circuit. Once no hook is left, the circuit runs the plain methods again.
+  """
+  circuit._hooks.remove(hook)
+  if not circuit._hooks:
+    for method_name in WRAPPED_METHODS:
+      delattr(circuit, method_name)
+    del circuit._hooks, circuit._hook_stack
+  return None
+
+
+class Profiler:
+  """
+  Hook which collects the records of one or more circuits.
+
+  profiler = Profiler().attach(circuit)
+  ...
+  print(profiler.report())
+  profiler.export_chrome_trace('trace.json')  # open in chrome://tracing or https://ui.perfetto.dev
+  """
+  def __init__(self, trace_memory = True):
+    """
+    trace_memory: if True, tracemalloc is started on attach (if it is not tracing yet) so that bytes are recorded.
+    """
+    self.trace_memory = trace_memory
+    self.records = []
+    self._started_tracing = False
+
+  def __call__(self, record):
+    self.records.append(record)
+    return None
+
+  def attach(self, circuit):
+    """
+    Adds the profiler as a hook of circuit and returns the profiler.
+    """
+    if self.trace_memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self._started_tracing = True
+    add_hook(circuit, self)
+    return self
+
+  def detach(self, circuit):
+    """
+    Removes the profiler from circuit, and stops tracemalloc if the profiler started it.
+    """
+    remove_hook(circuit, self)
+    if self._started_tracing:
+      tracemalloc.stop()
+      self._started_tracing = False
+    return None
+
+  def summary(self):
+    """
+    Returns {name: {'count', 'seconds', 'mean_seconds', 'max_bytes', 'passes'}} over the records, where seconds excludes
+    nested events so that the totals add up to the execution time.
+    """
+    summary = {}
+    for record in self.records:
+      entry = summary.setdefault(record['name'], {'count': 0, 'seconds': 0.0, 'max_bytes': None, 'passes': 0})
+      entry['count'] += 1
+      entry['seconds'] += record['seconds']
+      entry['passes'] += record['passes']
+      if record['bytes'] is not None:
+        entry['max_bytes'] = max(entry['max_bytes'] or 0, record['bytes'])
+    for entry in summary.values():
+      entry['mean_seconds'] = entry['seconds']/entry['count']
+    return summary
+
+  def report(self):
+    """
+    Returns the summary as a table, with the most expensive gates first.
+    """
+    summary = self.summary()
+    total = sum(entry['seconds'] for entry in summary.values()) or 1
+    lines = [f"{'gate':>16} {'count':>7} {'seconds':>10} {'%':>6} {'mean':>10} {'max MB':>8} {'passes':>7}"]
+    for name, entry in sorted(summary.items(), key=lambda item: -item[1]['seconds']):
+      memory = '' if entry['max_bytes'] is None else f"{entry['max_bytes']/2**20:.1f}"
+      lines.append(f"{name:>16} {entry['count']:>7} {entry['seconds']:>10.6f} {100*entry['seconds']/total:>6.1f} "
+                   f"{entry['mean_seconds']:>10.6f} {memory:>8} {entry['passes']:>7}")
+    return '\n'.join(lines)
+
+  def export_chrome_trace(self, path):
+    """
+    Writes the records as complete events of the Chrome trace event format, readable by chrome://tracing and Perfetto.
+    """
+    origin = min((record['start'] for record in self.records), default=0)
+    events = [{
+      'name': record['name'],
+      'cat': 'measure' if record['name'] == 'measure' else 'gate',
+      'ph': 'X',
+      'ts': (record['start']-origin)*1e6,
+      'dur': record['duration']*1e6,
+      'pid': 0,
+      'tid': 0,
+      'args': {'qubits': list(record['qubits']), 'bytes': record['bytes'], 'passes': record['passes']},
+    } for record in self.records]
+    with open(path, 'w') as file:
+      json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+    return None
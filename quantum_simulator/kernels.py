@@ -0,0 +1,270 @@
+"""
+Low level routines which apply gates directly on a state vector of 2^n amplitudes.
+
+Qubit 0 is the most significant bit of a basis index, i.e. |q0 q1 ... q(n-1)>, which is the same ordering used by
+np.kron(q0, np.kron(q1, ...)).
+"""
+import numpy as np
+from .parallel import run_blocks, run_chunks
+
+
+def prepare_state(state):
+  """
+  Returns state as a C-contiguous complex array which the kernels can modify in place. No copy is made if state
+  already satisfies this.
+  """
+  state = np.asarray(state)
+  if not np.iscomplexobj(state):
+    state = state.astype(complex)
+  return np.ascontiguousarray(state)
+
+
+def apply_single_qubit_gate(state, n, operator, qubit_position, num_threads = 1):
+  """
+  Applies a 2x2 operator on qubit_position in place and returns the state.
+
+  The state is viewed as an array of shape (2^qubit_position, 2, 2^(n-qubit_position-1)) so that the middle axis is the
+  acted-on qubit, and no 2^n x 2^n matrix is built. Every block is updated chunk by chunk (see parallel.run_chunks),
+  with two temporaries of half a chunk, so the extra memory is bounded by a few chunks per thread whatever n.
+
+  operator may also be a stack of shape (batch, 2, 2) for a state of shape (batch, 2^n), in which case every state of
+  the batch gets its own operator.
+
+  num_threads: number of threads among which the state is split (see parallel.run_blocks).
+  """
+  state = prepare_state(state)
+  operator = np.asarray(operator, dtype=state.dtype)
+  view = state.reshape(operator.shape[:-2] + (-1, 2, 2**(n-qubit_position-1)))
+  u = operator[..., None, None]
+
+  def update_chunk(chunk):
+    a0 = chunk[..., 0, :]
+    a1 = chunk[..., 1, :]
+    temp = a0.copy()
+    product = a1*u[..., 0, 1, :, :]
+    a0 *= u[..., 0, 0, :, :]
+    a0 += product
+    np.multiply(temp, u[..., 1, 0, :, :], out=temp)
+    a1 *= u[..., 1, 1, :, :]
+    a1 += temp
+
+  batch = operator.ndim-2
+  axes = [axis for axis in range(view.ndim) if axis != view.ndim-2 and (axis >= batch or operator.shape[axis] == 1)]
+
+  def update(block):
+    run_chunks(update_chunk, block, axes)
+
+  run_blocks(update, view, axes, num_threads)
+  return state
+
+
+def qubit_mask(n, qubit_position):
+  """
+  Returns the integer bitmask of qubit_position in a basis index.
+  """
+  return 1 << (n-qubit_position-1)
+
+
+def apply_permutation_gate(state, n, gate, qubits, num_threads = 1):
+  """
+  Applies a permutation gate ('cx', 'cy', 'swap', 'ccx' or 'cswap', with the qubits in the same order as the arguments
+  of the corresponding QuantumCircuit method) in place and returns the state.
+
+  No index table is built: cx, cy and ccx are controlled X and Y gates (see apply_controlled_gate), and swap and cswap
+  exchange the two strided views of the reshaped state (see split_shape) in which the swapped qubits differ, with the
+  control bit 1 for cswap.
+  """
+  state = prepare_state(state)
+  qubits = tuple(qubits)
+  if gate in ('cx', 'cy', 'ccx'):
+    operator = np.array([[0,-1j],[1j,0]]) if gate == 'cy' else np.array([[0,1],[1,0]])
+    return apply_controlled_gate(state, n, qubits[:-1], qubits[-1], operator, num_threads)
+  if gate not in ('swap', 'cswap'):
+    raise ValueError(f"'{gate}' is not a permutation gate.")
+  sorted_qubits = sorted(qubits)
+  view = state.reshape(split_shape(n, sorted_qubits))
+  index = [slice(None)]*view.ndim
+  if gate == 'cswap':
+    index[2*sorted_qubits.index(qubits[0])+1] = 1
+  axes = [2*sorted_qubits.index(q)+1 for q in qubits[-2:]]
+  view = view[tuple(index)]
+  if gate == 'cswap':
+    axes = [axis - (axis > 2*sorted_qubits.index(qubits[0])+1) for axis in axes]
+  view = np.moveaxis(view, axes, [0, 1])
+
+  def update(block):
+    temp = block[0, 1].copy()
+    block[0, 1] = block[1, 0]
+    block[1, 0] = temp
+
+  run_blocks(update, view, list(range(2, view.ndim)), num_threads)
+  return state
+
+
+def split_shape(n, sorted_qubits):
+  """
+  Returns the shape (-1, 2^a, 2, 2^b, 2, ..., 2^c) under which every qubit in sorted_qubits gets an axis of its own and
+  the remaining qubits are grouped into the axes in between. The leading -1 absorbs any batch dimension.
+  """
+  shape = []
+  previous = 0
+  for q in sorted_qubits:
+    shape.append(2**(q-previous))
+    shape.append(2)
+    previous = q+1
+  shape.append(2**(n-previous))
+  shape[0] = -1
+  return shape
+
+
+def diagonal_table(qubits, diagonal):
+  """
+  Returns (sorted_qubits, table) where table is diagonal of length 2^k reshaped to (2,)*k with its axes ordered by
+  qubit position. Leading batch dimensions of diagonal are kept in front.
+  """
+  qubits = tuple(qubits)
+  k = len(qubits)
+  diagonal = np.asarray(diagonal)
+  table = diagonal.reshape(diagonal.shape[:-1] + (2,)*k)
+  batch = table.ndim-k
+  order = np.argsort(qubits)
+  return tuple(qubits[i] for i in order), table.transpose(list(range(batch)) + [batch+i for i in order])
+
+
+def fuse_diagonals(terms, dtype = complex):
+  """
+  Multiplies diagonal gates acting on possibly different qubits into a single table.
+
+  terms: list of (sorted_qubits, table) as returned by diagonal_table.
+  dtype: dtype of the fused table, which should be that of the state so that a complex64 state gets a complex64 table.
+  Returns (sorted_qubits, table) for the union of all the qubits.
+  """
+  union = sorted(set().union(*[qubits for qubits, _ in terms]))
+  fused = np.ones((1,)*len(union), dtype=dtype)
+  for qubits, table in sorted(terms, key=lambda term: len(term[0])):
+    shape = [1]*len(union)
+    for q in qubits:
+      shape[union.index(q)] = 2
+    fused = fused*np.asarray(table, dtype=dtype).reshape(shape)
+  return tuple(union), np.broadcast_to(fused, (2,)*len(union))
+
+
+def apply_diagonal_gate(state, n, sorted_qubits, table, num_threads = 1):
+  """
+  Multiplies the state in place by the diagonal gate table (see diagonal_table) acting on sorted_qubits and returns
+  the state. This is a single element-wise pass with the table broadcast over the untouched qubits.
+
+  table may have leading batch dimensions matching those of state, one table per state of the batch.
+  """
+  state = prepare_state(state)
+  table = np.asarray(table, dtype=state.dtype)
+  shape = split_shape(n, sorted_qubits)
+  factor_shape = [1]*len(shape)
+  factor_shape[1::2] = [2]*len(sorted_qubits)
+  batch_shape = list(table.shape[:table.ndim-len(sorted_qubits)])
+  view = state.reshape(batch_shape + shape)
+  factor = table.reshape(batch_shape + factor_shape)
+
+  def update(block):
+    block *= factor
+
+  run_blocks(update, view, [axis for axis in range(view.ndim) if factor.shape[axis] == 1], num_threads)
+  return state
+
+
+def apply_unitary_gate(state, n, qubits, matrix, num_threads = 1):
+  """
+  Applies a 2^k x 2^k matrix on the k given qubits in place and returns the state. The first qubit in qubits is the
+  most significant bit of the matrix indices.
+
+  The matrix is contracted with the reshaped state (see split_shape), which needs a single full-size temporary.
+  """
+  state = prepare_state(state)
+  k = len(qubits)
+  order = list(np.argsort(qubits))
+  sorted_qubits = [qubits[i] for i in order]
+  tensor = np.asarray(matrix, dtype=state.dtype).reshape((2,)*(2*k))
+  tensor = tensor.transpose(order + [k+i for i in order])
+  view = state.reshape(split_shape(n, sorted_qubits))
+  axes = list(range(1, 2*k, 2))
+
+  def update(block):
+    result = np.tensordot(tensor, block, axes=(list(range(k, 2*k)), axes))
+    np.copyto(block, np.moveaxis(result, list(range(k)), axes))
+
+  run_blocks(update, view, list(range(0, 2*k+1, 2)), num_threads)
+  return state
+
+
+def apply_controlled_gate(state, n, controls, target, operator, num_threads = 1):
+  """
+  Applies the 2x2 operator on target, controlled by all the qubits in controls, in place and returns the state.
+
+  Only the 2^(n-len(controls)) amplitudes whose control bits are all 1 are read and written: they are selected with a
+  strided view of the reshaped state (see split_shape). Diagonal operators only scale the halves whose factor is not 1.
+  """
+  state = prepare_state(state)
+  qubits = sorted(tuple(controls) + (target,))
+  view = state.reshape(split_shape(n, qubits))
+  index = [slice(None)]*view.ndim
+  for q in controls:
+    index[2*qubits.index(q)+1] = 1
+  axis = 2*qubits.index(target)+1-sum(q < target for q in controls)
+  view = np.moveaxis(view[tuple(index)], axis, 0)
+  operator = np.asarray(operator)
+
+  def update(block):
+    if operator[0, 1] == 0 and operator[1, 0] == 0:
+      for i in (0, 1):
+        if operator[i, i] != 1:
+          block[i] *= operator[i, i]
+    elif operator[0, 0] == 0 and operator[1, 1] == 0:
+      temp = block[0]*operator[1, 0]
+      block[0] = block[1]*operator[0, 1]
+      block[1] = temp
+    else:
+      temp = operator[0, 0]*block[0] + operator[0, 1]*block[1]
+      block[1] = operator[1, 0]*block[0] + operator[1, 1]*block[1]
+      block[0] = temp
+
+  run_blocks(update, view, list(range(1, view.ndim)), num_threads)
+  return state
+
+
+def apply_fourier_transform(state, n, qubits, inverse = False, num_threads = 1):
+  """
+  Applies the quantum Fourier transform |j> -> sum_l e^(2*pi*i*j*l/2^k) |l> / sqrt(2^k) (or its inverse) on the k
+  given qubits in place and returns the state. The first qubit in qubits is the most significant bit of j and l.
+
+  The qubit axes of the reshaped state are moved last and merged, so the transform is a single numpy.fft call over
+  2^k points for every value of the other qubits, instead of O(k^2) gates.
+  """
+  state = prepare_state(state)
+  k = len(qubits)
+  view = np.moveaxis(state.reshape((-1,) + (2,)*n), [q+1 for q in qubits], list(range(n+1-k, n+1)))
+  transform = np.fft.fft if inverse else np.fft.ifft
+
+  def update(block):
+    points = block.reshape(block.shape[:-k] + (2**k,))
+    block[...] = transform(points, axis=-1, norm='ortho').reshape(block.shape)
+
+  run_blocks(update, view, list(range(n+1-k)), num_threads)
+  return state
+
+
+def outcome_mask(outcomes):
+  """
+  Returns the 0/1 table (see diagonal_table) which keeps only the amplitudes whose bits on the measured qubits, in
+  ascending order, equal outcomes.
+  """
+  mask = np.zeros((2,)*len(outcomes))
+  mask[tuple(outcomes)] = 1
+  return mask
+
+
+def outcome_probability(state, n, qubit_position, outcome):
+  """
+  Returns the probability of measuring outcome (0 or 1) on qubit_position.
+  """
+  amplitudes = np.asarray(state).reshape(-1, 2, 2**(n-qubit_position-1))[:, outcome, :]
+  return np.linalg.norm(amplitudes)**2
@@ -0,0 +1,161 @@
+import os
+import tempfile
+import itertools
+import numpy as np
+from .quantum_circuit import QuantumCircuit
+from .gates import is_diagonal, gate_diagonal, apply_gate
+from .kernels import apply_diagonal_gate, fuse_diagonals, outcome_mask
+
+class MemmapQuantumCircuit(QuantumCircuit):
+  """
+  Quantum circuit whose state vector is stored in a memory-mapped file instead of RAM, for states larger than memory.
+
+  The 2^n amplitudes are split into chunks of 2^chunk_qubits amplitudes. Qubits n-chunk_qubits to n-1 (the low-order
+  bits of a basis index) lie within a chunk, so gates on them are applied one chunk at a time. Gates on the other,
+  high-order qubits are applied on groups of 2^k chunks (pairs of chunks for a single high-order qubit) which differ only
+  in the k high-order qubits touched. Diagonal gates never need more than one chunk. At most 2^k chunks are held in
+  memory at any time.
+
+  self.state returns the np.memmap of the file itself, so reading it pages amplitudes in from disk as they are used,
+  and close() flushes and releases the file.
+  """
+  def __init__(self, n, initial_state = 0, path = None, chunk_qubits = 20, lazy = False, max_fused_qubits = 2,
+               seed = None, dtype = complex, num_threads = 1):
+    """
+    path: file holding the amplitudes. If path is None a temporary file is created, which is deleted by close(). If
+    initial_state is None, the amplitudes already stored in the file at path are used as the initial state.
+    chunk_qubits: number of low-order qubits per chunk, i.e. each chunk holds 2^chunk_qubits amplitudes. Larger chunks
+    mean fewer reads and writes of the file but more memory: a gate on k high-order qubits holds 2^k chunks at once.
+    initial_state: 0 for |0...0>, a state vector which is written to the file chunk by chunk, or None (see path).
+    dtype: precision of the amplitudes in the file, complex64 halves its size.
+    num_threads: threads among which every chunk is split.
+    lazy, max_fused_qubits and seed work as for a QuantumCircuit: with lazy=True, gates are fused before they run, which
+    saves passes over the file.
+    """
+    self._setup(n, lazy, max_fused_qubits, seed, dtype, num_threads)
+    self.chunk_qubits = min(chunk_qubits, n)
+    self.chunk_size = 2**self.chunk_qubits
+    self._temporary = path is None
+    if path is None:
+      handle, path = tempfile.mkstemp(suffix='.amplitudes')
+      os.close(handle)
+    self.path = path
+    if initial_state is None:
+      self._state = np.memmap(path, dtype=self.dtype, mode='r+', shape=(2**n,))
+    else:
+      self._state = np.memmap(path, dtype=self.dtype, mode='w+', shape=(2**n,))
+    if initial_state is None:
+      return
+    initial_state = np.asarray(initial_state)
+    if initial_state.ndim == 0:
+      self._state[0] = 1
+    else:
+      self.state = initial_state
+
+  @QuantumCircuit.state.setter
+  def state(self, state):
+    state = np.asarray(state)
+    for start in range(0, 2**self.n, self.chunk_size):
+      self._state[start:start+self.chunk_size] = state[start:start+self.chunk_size]
+    self._pending_diagonals = {}
+    self.instructions = []
+
+  def close(self):
+    """
+    Flushes the amplitudes to the file and releases it. A temporary file is deleted.
+    """
+    self.state.flush()
+    del self._state
+    if self._temporary:
+      os.remove(self.path)
+    return None
+
+  def _fork_state(self, circuit):
+    raise TypeError("A MemmapQuantumCircuit cannot be forked, use save_checkpoint and load_checkpoint.")
+
+  def _chunks(self):
+    """
+    Yields (chunk_index, chunk) for every chunk of the state. chunk is a view into the memory map.
+    """
+    for index in range(2**(self.n-self.chunk_qubits)):
+      yield index, self._state[index*self.chunk_size:(index+1)*self.chunk_size]
+
+  def _execute(self, name, qubits, params):
+    """
+    Applies the gate chunk by chunk. Diagonal gates are queued (see QuantumCircuit._apply_diagonal).
+    """
+    if is_diagonal(name):
+      self._apply_diagonal(qubits, gate_diagonal(name, params))
+      return None
+    if self._pending_diagonals:
+      self._flush_diagonals()
+    high = self.n-self.chunk_qubits
+    high_qubits = sorted(q for q in qubits if q < high)
+    local_qubits = tuple(high_qubits.index(q) if q < high else len(high_qubits)+q-high for q in qubits)
+    if not high_qubits:
+      for _, chunk in self._chunks():
+        apply_gate(chunk, self.chunk_qubits, name, local_qubits, params, self.num_threads)
+      return None
+    high_mask = sum(1 << (high-q-1) for q in high_qubits)
+    offsets = [sum(bit << (high-q-1) for bit, q in zip(bits, high_qubits))
+               for bits in itertools.product((0, 1), repeat=len(high_qubits))]
+    for base in range(2**high):
+      if base & high_mask:
+        continue
+      indices = [base | offset for offset in offsets]
+      block = np.concatenate([self._state[i*self.chunk_size:(i+1)*self.chunk_size] for i in indices])
+      block = apply_gate(block, len(high_qubits)+self.chunk_qubits, name, local_qubits, params, self.num_threads)
+      for j, i in enumerate(indices):
+        self._state[i*self.chunk_size:(i+1)*self.chunk_size] = block[j*self.chunk_size:(j+1)*self.chunk_size]
+    return None
+
+  def _flush_diagonals(self):
+    """
+    Applies the queued diagonal gates as a single fused phase multiplication, one chunk at a time.
+    """
+    qubits, table = fuse_diagonals(list(self._pending_diagonals.items()), self.dtype)
+    self._pending_diagonals = {}
+    self._apply_diagonal_table(qubits, table)
+    return None
+
+  def _apply_diagonal_table(self, sorted_qubits, table):
+    """
+    Multiplies every chunk by the part of the diagonal table selected by the chunk's high-order qubits.
+    """
+    high = self.n-self.chunk_qubits
+    local_qubits = tuple(q-high for q in sorted_qubits if q >= high)
+    for index, chunk in self._chunks():
+      selection = tuple((index >> (high-q-1)) & 1 if q < high else slice(None) for q in sorted_qubits)
+      factor = table[selection]
+      if local_qubits:
+        apply_diagonal_gate(chunk, self.chunk_qubits, local_qubits, factor, self.num_threads)
+      else:
+        chunk *= factor
+    return None
+
+  def _outcome_probability(self, qubit_position, outcome):
+    """
+    Returns the probability of measuring outcome on qubit_position, accumulated chunk by chunk.
+    """
+    high = self.n-self.chunk_qubits
+    probability = 0
+    for index, chunk in self._chunks():
+      if qubit_position < high:
+        if (index >> (high-qubit_position-1)) & 1 == outcome:
+          probability += np.linalg.norm(chunk)**2
+      else:
+        local = chunk.reshape(-1, 2, 2**(self.n-qubit_position-1))[:, outcome, :]
+        probability += np.linalg.norm(local)**2
+    return probability
+
+  def measure(self, qubit_position):
+    """
+    Measures a single qubit and returns the outcome (0 or 1). The probabilities are accumulated over the chunks, and
+    the collapse is one more pass over the file.
+    """
+    self._run_pending()
+    probability0 = self._outcome_probability(qubit_position, 0)
+    probability1 = self._outcome_probability(qubit_position, 1)
+    outcome, probability = self._draw_outcome(probability0, probability1)
+    self._apply_diagonal_table((qubit_position,), outcome_mask([outcome])/np.sqrt(probability))
+    return outcome
@@ -0,0 +1,221 @@
+import numpy as np
+from .quantum_circuit import QuantumCircuit
+from .gates import gate_matrix
+from .pauli import PAULI_MATRICES
+from .quantum_measurement import outcome_integers
+
+SWAP = np.array([[1,0,0,0],[0,0,1,0],[0,1,0,0],[0,0,0,1]])
+
+
+class MPSQuantumCircuit(QuantumCircuit):
+  """
+  Quantum circuit whose state is a matrix product state (MPS): qubit i is a tensor of shape (left bond, 2, right bond),
+  and the state vector is the contraction of the chain. Memory grows with the bond dimensions rather than with 2^n, so
+  circuits which create little entanglement, e.g. shallow nearest-neighbour circuits, can be simulated for 50-100 qubits.
+
+  Single-qubit gates update one tensor. A k-qubit gate on adjacent qubits contracts their tensors, applies the gate and
+  splits the result again with SVDs, keeping at most max_bond_dimension singular values and dropping those whose squared
+  weight is below cutoff. The dropped weight is added to self.truncation_error. The chain is kept in mixed canonical form
+  around the last updated qubit so that the truncation is optimal. Gates on non-adjacent qubits are routed through
+  swaps of neighbouring qubits, which are undone after the gate.
+
+  self.state contracts the chain into a state vector of 2^n amplitudes, so it is only possible for a small number of
+  qubits; measure, sample and expectation work on the chain directly.
+  """
+  def __init__(self, n, initial_state = 0, max_bond_dimension = None, cutoff = 1e-12, lazy = False,
+               max_fused_qubits = 2, seed = None, dtype = complex):
+    """
+    max_bond_dimension: maximum number of singular values kept on every bond, unlimited if None.
+    cutoff: singular values whose squared weight, relative to the total, is below cutoff are dropped.
+
+    initial_state: 0 for the product state |0...0>, or a state vector of 2^n amplitudes which is split into an MPS with
+    the same truncation.
+    dtype: precision of the tensors.
+    lazy: gates are recorded and fused into blocks of at most max_fused_qubits qubits before they run, so fewer SVDs
+    are needed, but a fused block on k qubits contracts k sites at once.
+    seed: seed of the random number generator of measure.
+    """
+    self._setup(n, lazy, max_fused_qubits, seed, dtype, 1)
+    self.max_bond_dimension = max_bond_dimension
+    self.cutoff = cutoff
+    initial_state = np.asarray(initial_state)
+    if initial_state.ndim == 0:
+      self.tensors = [np.array([1, 0], dtype=self.dtype).reshape(1, 2, 1) for _ in range(n)]
+      self.truncation_error = 0.0
+      self._center = 0
+    else:
+      self.state = initial_state
+
+  @property
+  def state(self):
+    """
+    State vector of the circuit, contracted from the MPS into a new array.
+    """
+    self._run_pending()
+    vector = np.ones((1, 1), dtype=self.dtype)
+    for tensor in self.tensors:
+      vector = np.tensordot(vector, tensor, axes=(-1, 0)).reshape(-1, tensor.shape[2])
+    return vector.reshape(-1)
+
+  @state.setter
+  def state(self, state):
+    tensor = np.asarray(state, dtype=self.dtype).reshape(1, -1)
+    self.tensors = [None]*self.n
+    self.truncation_error = 0.0
+    self._split(0, tensor.reshape((1,) + (2,)*self.n + (1,)))
+    self._pending_diagonals = {}
+    self.instructions = []
+
+  def _fork_state(self, circuit):
+    """
+    Gives the fork its own list of tensors. Gates replace tensors instead of modifying them, so the tensors themselves
+    are shared.
+    """
+    super()._fork_state(circuit)
+    self.tensors = list(circuit.tensors)
+    return None
+
+  @property
+  def bond_dimensions(self):
+    """
+    List of the n-1 bond dimensions between neighbouring qubits.
+    """
+    self._run_pending()
+    return [tensor.shape[2] for tensor in self.tensors[:-1]]
+
+  def _move_center(self, site):
+    """
+    Moves the orthogonality center of the chain to site with QR decompositions.
+    """
+    while self._center < site:
+      left, _, right = self.tensors[self._center].shape
+      q, r = np.linalg.qr(self.tensors[self._center].reshape(left*2, right))
+      self.tensors[self._center] = q.reshape(left, 2, -1)
+      self.tensors[self._center+1] = np.tensordot(r, self.tensors[self._center+1], axes=(1, 0))
+      self._center += 1
+    while self._center > site:
+      left, _, right = self.tensors[self._center].shape
+      q, r = np.linalg.qr(self.tensors[self._center].reshape(left, 2*right).T)
+      self.tensors[self._center] = q.T.reshape(-1, 2, right)
+      self.tensors[self._center-1] = np.tensordot(self.tensors[self._center-1], r.T, axes=(2, 0))
+      self._center -= 1
+    return None
+
+  def _split(self, site, theta):
+    """
+    Splits theta, of shape (left bond, 2, ..., 2, right bond), into the tensors of consecutive sites starting at site
+    with truncated SVDs. The orthogonality center ends on the last site.
+    """
+    last = site+theta.ndim-3
+    for i in range(site, last):
+      left = theta.shape[0]
+      u, s, v = np.linalg.svd(theta.reshape(left*2, -1), full_matrices=False)
+      weights = s**2
+      total = weights.sum()
+      keep = max(1, int(np.count_nonzero(weights > self.cutoff*total)))
+      if self.max_bond_dimension is not None:
+        keep = min(keep, self.max_bond_dimension)
+      self.truncation_error += float(weights[keep:].sum()/total)
+      s = s[:keep]/np.linalg.norm(s[:keep])*np.sqrt(total)
+      self.tensors[i] = u[:, :keep].reshape(left, 2, keep)
+      theta = (s[:, None]*v[:keep]).reshape((keep,) + theta.shape[2:])
+    self.tensors[last] = theta
+    self._center = last
+    return None
+
+  def _apply_block(self, site, operator):
+    """
+    Applies operator, of shape (2,)*2k, to the k consecutive sites starting at site.
+    """
+    k = operator.ndim//2
+    if k == 1:
+      self.tensors[site] = np.einsum('ij,ajb->aib', operator, self.tensors[site]).astype(self.dtype, copy=False)
+      return None
+    self._move_center(site)
+    theta = self.tensors[site]
+    for i in range(site+1, site+k):
+      theta = np.tensordot(theta, self.tensors[i], axes=(-1, 0))
+    theta = np.tensordot(operator, theta, axes=(list(range(k, 2*k)), list(range(1, k+1))))
+    theta = theta.transpose([k] + list(range(k)) + [k+1]).astype(self.dtype, copy=False)
+    self._split(site, theta)
+    return None
+
+  def _execute(self, name, qubits, params):
+    """
+    Applies the gate, moving its qubits next to the first of them with swaps which are undone afterwards.
+    """
+    k = len(qubits)
+    operator = np.asarray(gate_matrix(name, qubits, params)).reshape((2,)*2*k)
+    order = sorted(range(k), key=lambda i: qubits[i])
+    operator = operator.transpose(order + [k+i for i in order])
+    sites = sorted(qubits)
+    swaps = []
+    for j in range(1, k):
+      for site in range(sites[j]-1, sites[0]+j-1, -1):
+        swaps.append(site)
+        self._apply_block(site, SWAP.reshape(2, 2, 2, 2))
+    self._apply_block(sites[0], operator)
+    for site in reversed(swaps):
+      self._apply_block(site, SWAP.reshape(2, 2, 2, 2))
+    return None
+
+  def measure(self, qubit_position):
+    """
+    Measures a single qubit and returns the outcome (0 or 1). The orthogonality center is moved to the qubit, so the
+    probabilities are the norms of the two halves of its tensor, and the collapse only changes that tensor.
+    """
+    self._run_pending()
+    self._move_center(qubit_position)
+    tensor = self.tensors[qubit_position]
+    probability0 = np.linalg.norm(tensor[:, 0, :])**2
+    probability1 = np.linalg.norm(tensor[:, 1, :])**2
+    outcome, probability = self._draw_outcome(probability0, probability1)
+    tensor = tensor.copy()
+    tensor[:, 1-outcome, :] = 0
+    self.tensors[qubit_position] = tensor/np.sqrt(probability)
+    return outcome
+
+  def sample(self, shots, qubits = None, seed = None, counts = True):
+    """
+    Draws measurement shots in the computational basis without changing the state, like QuantumMeasurement.sample.
+
+    All the shots are drawn together, one qubit after the other, from the probabilities conditioned on the outcomes of
+    the previous qubits.
+    """
+    self._run_pending()
+    qubits = list(range(self.n)) if qubits is None else list(qubits)
+    self._move_center(0)
+    rng = np.random.default_rng(seed)
+    environment = np.ones((shots, 1), dtype=self.dtype)
+    bits = np.zeros((shots, self.n), dtype=np.uint8)
+    for site in range(max(qubits)+1):
+      branches = np.einsum('sa,aib->sib', environment, self.tensors[site])
+      weights = np.linalg.norm(branches, axis=2)**2
+      bits[:, site] = rng.random(shots)*weights.sum(axis=1) < weights[:, 1]
+      environment = branches[np.arange(shots), bits[:, site]]
+      environment /= np.linalg.norm(environment, axis=1, keepdims=True)
+    outcomes = bits[:, qubits]
+    if not counts:
+      return outcome_integers(outcomes)
+    rows, histogram = np.unique(outcomes, axis=0, return_counts=True)
+    return {''.join(map(str, row)): int(count) for row, count in zip(rows, histogram)}
+
+  def expectation(self, operator):
+    """
+    Returns the expectation value of a Pauli string, e.g. ['X', 'Y', 'I'] or 'XYI', by contracting the chain with the
+    Pauli matrices applied to its tensors.
+    """
+    self._run_pending()
+    if len(operator) != self.n:
+      raise ValueError(f"Pauli string {operator} does not act on {self.n} qubits.")
+    environment = np.ones((1, 1), dtype=self.dtype)
+    for tensor, pauli in zip(self.tensors, operator):
+      applied = np.einsum('ij,ajb->aib', PAULI_MATRICES[pauli.upper()], tensor)
+      environment = np.einsum('ab,aic,bid->cd', environment, tensor.conj(), applied)
+    return float(np.real(environment[0, 0]))
+
+  def expectation_sum(self, terms):
+    """
+    Returns the expectation value of a weighted sum of Pauli strings terms = [(coefficient, operator), ...].
+    """
+    return sum(coefficient*self.expectation(operator) for coefficient, operator in terms)
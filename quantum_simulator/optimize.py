@@ -0,0 +1,161 @@
+"""
+Optimization pass over recorded instructions (see gates.py).
+
+Gates are cancelled (x x, h h, s inverse_s, cx cx, qft iqft, ...) or merged (rz rz -> rz, p p -> p, ...) with an
+earlier gate on the same qubits, as long as every gate in between commutes with them. Two gates commute if on each
+shared qubit both are diagonal in the Z basis (diagonal gates and controls) or both in the X basis (x, rx and the
+targets of cx, ccx and mcx), so diagonal gates move freely past controls. Given the measured qubits, gates outside
+their backward light cone are dropped.
+"""
+import numbers
+import numpy as np
+from .gates import is_diagonal
+
+SELF_INVERSE_GATES = ('h', 'x', 'y', 'z', 'cx', 'cy', 'cz', 'swap', 'ccx', 'cswap', 'mcx', 'mcz')
+
+INVERSE_PAIRS = {'s': 'inverse_s', 'inverse_s': 's', 't': 'inverse_t', 'inverse_t': 't', 'qft': 'iqft', 'iqft': 'qft'}
+
+# Angle after which the gate is the identity (rotations by 2*pi are -I).
+MERGEABLE_GATES = {'rx': 4*np.pi, 'ry': 4*np.pi, 'rz': 4*np.pi, 'p': 2*np.pi, 'mcp': 2*np.pi}
+
+
+def canonical_qubits(name, qubits):
+  """
+  Returns a key which is equal for two instructions of the gate name exactly when they act identically, e.g. cz(0, 1)
+  and cz(1, 0), or ccx(0, 1, 2) and ccx(1, 0, 2).
+  """
+  if name in ('cz', 'swap', 'mcz', 'mcp'):
+    return frozenset(qubits)
+  if name in ('ccx', 'mcx'):
+    return (frozenset(qubits[:-1]), qubits[-1])
+  if name == 'cswap':
+    return (qubits[0], frozenset(qubits[1:]))
+  return tuple(qubits)
+
+
+def qubit_bases(name, qubits):
+  """
+  Returns {qubit: 'z' or 'x'} for the qubits on which the gate is diagonal in the Z or the X basis.
+  """
+  if is_diagonal(name) or name in ('mcz', 'mcp'):
+    return dict.fromkeys(qubits, 'z')
+  if name in ('x', 'rx'):
+    return {qubits[0]: 'x'}
+  if name in ('cx', 'ccx', 'mcx'):
+    bases = dict.fromkeys(qubits[:-1], 'z')
+    bases[qubits[-1]] = 'x'
+    return bases
+  if name in ('cy', 'cswap'):
+    return {qubits[0]: 'z'}
+  return {}
+
+
+def commute(instruction1, instruction2):
+  """
+  True if the two instructions commute by the basis rule of qubit_bases.
+  """
+  bases1 = qubit_bases(*instruction1[:2])
+  bases2 = qubit_bases(*instruction2[:2])
+  shared = set(instruction1[1]) & set(instruction2[1])
+  return all(q in bases1 and bases1[q] == bases2.get(q) for q in shared)
+
+
+def _combine(earlier, later):
+  """
+  Returns None if the two instructions on the same qubits cancel, the merged instruction, or False if they cannot be
+  combined.
+  """
+  name1, qubits1, params1 = earlier
+  name2, qubits2, params2 = later
+  if canonical_qubits(name1, qubits1) != canonical_qubits(name2, qubits2):
+    return False
+  if name1 == name2 and name1 in SELF_INVERSE_GATES:
+    return None
+  if INVERSE_PAIRS.get(name1) == name2:
+    return None
+  if name1 == name2 and name1 in MERGEABLE_GATES:
+    if not all(isinstance(param, numbers.Number) for param in params1 + params2):
+      return False
+    angle = params1[0] + params2[0]
+    period = MERGEABLE_GATES[name1]
+    if np.isclose((angle + period/2) % period, period/2):
+      return None
+    return (name1, qubits1, (angle,))
+  return False
+
+
+def count_passes(instructions):
+  """
+  Returns the number of passes over the state vector needed by QuantumCircuit: one per non-diagonal gate and one per
+  run of consecutive diagonal gates, which are fused.
+  """
+  passes = 0
+  diagonal_run = False
+  for name, _, _ in instructions:
+    if is_diagonal(name):
+      passes += not diagonal_run
+      diagonal_run = True
+    else:
+      passes += 1
+      diagonal_run = False
+  return passes
+
+
+def cancel_gates(instructions):
+  """
+  Returns the instructions with cancelling pairs removed and mergeable gates merged.
+  """
+  kept = []
+  by_qubit = {}
+  for instruction in instructions:
+    qubits = instruction[1]
+    candidates = sorted(set().union(*[by_qubit.get(q, ()) for q in qubits]), reverse=True)
+    combined = False
+    for index in candidates:
+      earlier = kept[index]
+      if earlier is None:
+        continue
+      combined = _combine(earlier, instruction)
+      if combined is not False:
+        kept[index] = combined
+        break
+      if not commute(earlier, instruction):
+        break
+    if combined is False:
+      for q in qubits:
+        by_qubit.setdefault(q, []).append(len(kept))
+      kept.append(instruction)
+  return [instruction for instruction in kept if instruction is not None]
+
+
+def light_cone(instructions, measured_qubits):
+  """
+  Returns the instructions which can affect the measured qubits, i.e. those in their backward light cone.
+  """
+  cone = set(measured_qubits)
+  kept = []
+  for instruction in reversed(instructions):
+    if cone & set(instruction[1]):
+      cone.update(instruction[1])
+      kept.append(instruction)
+  return kept[::-1]
+
+
+def optimize_instructions(instructions, measured_qubits = None):
+  """
+  Returns (optimized instructions, report). The gates are cancelled and merged (see cancel_gates) and, if
+  measured_qubits is given, restricted to the light cone of these qubits. report is a dictionary with the number of
+  gates and state passes (see count_passes) before and after, and how many were saved.
+  """
+  optimized = cancel_gates(instructions)
+  if measured_qubits is not None:
+    optimized = cancel_gates(light_cone(optimized, measured_qubits))
+  report = {
+    'gates_before': len(instructions),
+    'gates_after': len(optimized),
+    'passes_before': count_passes(instructions),
+    'passes_after': count_passes(optimized),
+  }
+  report['gates_saved'] = report['gates_before'] - report['gates_after']
+  report['passes_saved'] = report['passes_before'] - report['passes_after']
+  return optimized, report
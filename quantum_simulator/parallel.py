@@ -0,0 +1,95 @@
+"""
+Thread-pool execution layer for the gate kernels.
+
+A gate only mixes amplitudes along the axes of the qubits it acts on, so the state can be cut along any other axis into
+independent blocks. The blocks are processed by a shared pool of threads. NumPy releases the GIL inside its element-wise
+loops, so the threads run in parallel.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+MIN_BLOCK_SIZE = 2**14
+
+CHUNK_SIZE = 2**14
+
+_pools = {}
+
+
+def default_num_threads():
+  """
+  Returns the number of CPUs available to this process.
+  """
+  if hasattr(os, 'sched_getaffinity'):
+    return len(os.sched_getaffinity(0))
+  return os.cpu_count() or 1
+
+
+def thread_pool(num_threads):
+  """
+  Returns a ThreadPoolExecutor with num_threads workers, shared by all the circuits using this thread count.
+  """
+  if num_threads not in _pools:
+    _pools[num_threads] = ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix='quantum_simulator')
+  return _pools[num_threads]
+
+
+def run_blocks(function, view, axes, num_threads = 1):
+  """
+  Calls function(block) on blocks of view which together cover it, in parallel on num_threads threads.
+
+  axes: the axes along which view may be cut, i.e. axes which are not mixed by function. The longest one is used.
+  Small views are processed in the calling thread.
+  """
+  num_threads = min(num_threads, view.size//MIN_BLOCK_SIZE)
+  if num_threads <= 1 or not axes:
+    function(view)
+    return None
+  axis = max(axes, key=lambda axis: view.shape[axis]) % view.ndim
+  length = view.shape[axis]
+  num_threads = min(num_threads, length)
+  if num_threads <= 1:
+    function(view)
+    return None
+  blocks = []
+  for i in range(num_threads):
+    index = [slice(None)]*view.ndim
+    index[axis] = slice(i*length//num_threads, (i+1)*length//num_threads)
+    blocks.append(view[tuple(index)])
+  for _ in thread_pool(num_threads).map(function, blocks):
+    pass
+  return None
+
+
+def run_chunks(function, view, axes, size = CHUNK_SIZE):
+  """
+  Calls function(chunk) in the calling thread on consecutive chunks of view of at most about size elements which
+  together cover it, so that the temporaries of function are bounded by the size of a chunk.
+
+  axes: the axes along which view may be cut, as for run_blocks. The longest one is cut first, then the next ones if
+  the chunks are still too large.
+  """
+  axis = max(axes, key=lambda axis: view.shape[axis]) % view.ndim if axes else None
+  if view.size <= size or axis is None or view.shape[axis] == 1:
+    function(view)
+    return None
+  length = view.shape[axis]
+  step = max(1, length*size//view.size)
+  for start in range(0, length, step):
+    index = [slice(None)]*view.ndim
+    index[axis] = slice(start, start+step)
+    run_chunks(function, view[tuple(index)], axes, size)
+  return None
+
+
+def run_ranges(function, length, num_threads = 1):
+  """
+  Calls function(start, stop) on num_threads consecutive ranges which together cover range(length), in parallel.
+  """
+  num_threads = min(num_threads, length//MIN_BLOCK_SIZE)
+  if num_threads <= 1:
+    function(0, length)
+    return None
+  bounds = [i*length//num_threads for i in range(num_threads+1)]
+  for _ in thread_pool(num_threads).map(function, bounds[:-1], bounds[1:]):
+    pass
+  return None
@@ -0,0 +1,242 @@
+"""
+Parameterized circuits for variational algorithms.
+
+The angles of rx, ry, rz and p may be given as Parameter objects. The circuit is compiled once: the fixed gates between
+two parameterized gates are fused (see fusion.py) and turned into precomputed matrices and diagonals. Binding a vector
+of parameter values then only runs this plan. Gradients of expectation values are computed with adjoint differentiation:
+one forward run, then one backward sweep which un-applies every gate on the state and on O|psi>.
+"""
+import numpy as np
+from .quantum_circuit import QuantumCircuit
+from .gates import is_diagonal, gate_diagonal, gate_matrix, inverse_gate, apply_gate
+from .gates import PERMUTATION_GATES, FOURIER_GATES, CONTROLLED_GATES
+from .fusion import fuse_instructions
+from .pauli import PAULI_MATRICES, apply_pauli_sum, pauli_sum_expectation
+from .basis import BasisLabels
+
+PARAMETERIZED_GATES = ('rx', 'ry', 'rz', 'p')
+
+# d/dphi U(phi) = factor * generator @ U(phi)
+GENERATORS = {
+  'rx': (-0.5j, PAULI_MATRICES['X']),
+  'ry': (-0.5j, PAULI_MATRICES['Y']),
+  'rz': (-0.5j, PAULI_MATRICES['Z']),
+  'p': (1j, np.array([[0,0],[0,1]])),
+}
+
+
+def _pauli_terms(terms):
+  """
+  Returns terms as [(coefficient, operator), ...], where a single Pauli string such as 'XYI' has coefficient 1.
+  """
+  if all(isinstance(pauli, str) and len(pauli) == 1 for pauli in terms):
+    return [(1, terms)]
+  return terms
+
+
+class Parameter:
+  """
+  Symbolic angle scale*name + shift, e.g. Parameter('theta'), 2*Parameter('theta') or Parameter('theta') - np.pi/2.
+  """
+  def __init__(self, name, scale = 1.0, shift = 0.0):
+    self.name = name
+    self.scale = scale
+    self.shift = shift
+
+  def value(self, values):
+    """
+    Returns the angle for values, a dictionary {name: value}.
+    """
+    return self.scale*np.asarray(values[self.name]) + self.shift
+
+  def __mul__(self, number):
+    return Parameter(self.name, self.scale*number, self.shift*number)
+
+  __rmul__ = __mul__
+
+  def __truediv__(self, number):
+    return self*(1/number)
+
+  def __add__(self, number):
+    return Parameter(self.name, self.scale, self.shift + number)
+
+  __radd__ = __add__
+
+  def __neg__(self):
+    return self*-1
+
+  def __sub__(self, number):
+    return self + -number
+
+  def __rsub__(self, number):
+    return -self + number
+
+  def __repr__(self):
+    return f"Parameter('{self.name}', scale={self.scale}, shift={self.shift})"
+
+
+class ParameterizedCircuit(QuantumCircuit):
+  """
+  Records a circuit in which the angles of rx, ry, rz and p may be Parameter objects. The same gate methods as
+  QuantumCircuit are available. compile() returns a CompiledCircuit which computes states, expectation values and
+  gradients for given parameter values.
+  """
+  def __init__(self, n, max_fused_qubits = 2, dtype = complex, num_threads = 1):
+    """
+    See QuantumCircuit for the arguments. The circuit always starts in |0...0>.
+    """
+    self.n = n
+    self.max_fused_qubits = max_fused_qubits
+    self.dtype = np.dtype(dtype)
+    self.num_threads = num_threads
+    self.instructions = []
+    self.binary_indices_list = BasisLabels(self.n)
+    self.basis_states = BasisLabels(self.n, '|{}>')
+
+  @property
+  def state(self):
+    raise AttributeError("A ParameterizedCircuit has no state, use compile().bind(values).")
+
+  @property
+  def parameters(self):
+    """
+    Names of the parameters, in the order in which they first appear.
+    """
+    names = []
+    for _, _, params in self.instructions:
+      for param in params:
+        if isinstance(param, Parameter) and param.name not in names:
+          names.append(param.name)
+    return names
+
+  def _gate(self, name, qubits, params):
+    """
+    Records the gate.
+    """
+    if any(isinstance(param, Parameter) for param in params) and name not in PARAMETERIZED_GATES:
+      raise ValueError(f"'{name}' cannot take a Parameter, only {', '.join(PARAMETERIZED_GATES)} can.")
+    self.instructions.append((name, qubits, params))
+    return None
+
+  def measure(self, qubit_position):
+    raise AttributeError("A ParameterizedCircuit cannot be measured, use compile().bind(values).")
+
+  def compile(self):
+    """
+    Returns the CompiledCircuit of the recorded gates.
+    """
+    return CompiledCircuit(self.n, self.instructions, self.parameters, self.max_fused_qubits, self.dtype,
+                           self.num_threads)
+
+
+class CompiledCircuit:
+  """
+  Execution plan of a ParameterizedCircuit: a list of steps, each either a fixed fused gate with its precomputed inverse
+  or a parameterized gate.
+  """
+  def __init__(self, n, instructions, parameters, max_fused_qubits = 2, dtype = complex, num_threads = 1):
+    self.n = n
+    self.parameters = list(parameters)
+    self.dtype = np.dtype(dtype)
+    self.num_threads = num_threads
+    self.steps = []
+    fixed = []
+    for instruction in list(instructions) + [None]:
+      if instruction is not None and not isinstance(next(iter(instruction[2]), None), Parameter):
+        fixed.append(instruction)
+        continue
+      for name, qubits, params in fuse_instructions(fixed, max_fused_qubits):
+        step = self._precompute(name, qubits, params)
+        self.steps.append((step, self._precompute(*inverse_gate(*step))))
+      fixed = []
+      if instruction is not None:
+        self.steps.append(instruction)
+
+  def _precompute(self, name, qubits, params):
+    """
+    Returns the fixed gate as a diagonal or a matrix. Permutation, Fourier and controlled gates are kept as they are,
+    since their kernels need no table.
+    """
+    if is_diagonal(name):
+      return ('diagonal', qubits, (gate_diagonal(name, params),))
+    if name in PERMUTATION_GATES or name in FOURIER_GATES or name in CONTROLLED_GATES:
+      return (name, qubits, params)
+    return ('unitary', qubits, (gate_matrix(name, qubits, params),))
+
+  def _values(self, values):
+    """
+    Returns values as a dictionary {name: value}. values is either such a dictionary or a sequence ordered as
+    self.parameters, whose entries may be arrays of the same length for a batch of parameter vectors.
+    """
+    if isinstance(values, dict):
+      return values
+    values = np.asarray(values, dtype=float)
+    if values.shape[-1] != len(self.parameters):
+      raise ValueError(f"{values.shape[-1]} values given for the {len(self.parameters)} parameters {self.parameters}.")
+    return {name: values[..., i] for i, name in enumerate(self.parameters)}
+
+  def bind(self, values):
+    """
+    Runs the plan for the parameter values and returns the state vector. If values has shape (batch, parameters), a
+    batch of states of shape (batch, 2^n) is returned.
+    """
+    values = self._values(values)
+    batch = np.broadcast(*[np.asarray(value) for value in values.values()]).shape if values else ()
+    state = np.zeros(batch + (2**self.n,), dtype=self.dtype)
+    state[..., 0] = 1
+    for step in self.steps:
+      if len(step) == 2:
+        name, qubits, params = step[0]
+      else:
+        name, qubits, (parameter,) = step
+        params = (parameter.value(values),)
+      state = apply_gate(state, self.n, name, qubits, params, self.num_threads)
+    return state
+
+  def expectation(self, values, terms):
+    """
+    Returns the expectation value of a Pauli string (e.g. 'XYI') or of a weighted sum of Pauli strings
+    terms = [(coefficient, operator), ...] for the parameter values. For a batch of parameter vectors (see bind), an
+    array with one expectation value per vector is returned.
+
+    Only the forward run is needed: the state is bound and the terms are evaluated on it (see pauli.py).
+    """
+    terms = _pauli_terms(terms)
+    state = self.bind(values)
+    values = [pauli_sum_expectation(row, self.n, terms) for row in state.reshape(-1, 2**self.n)]
+    return values[0] if state.ndim == 1 else np.array(values).reshape(state.shape[:-1])
+
+  def gradient(self, values, terms):
+    """
+    Returns (expectation value, gradient) of a Pauli string or weighted sum of Pauli strings (see expectation), where
+    gradient[..., i] is the derivative with respect to self.parameters[i]. For a batch of parameter vectors of shape
+    (batch, parameters), the value has shape (batch,) and the gradient shape (batch, parameters).
+
+    Adjoint differentiation: with psi = U_N ... U_1 |0> and lambda = O psi, the gates are un-applied one by one on both
+    vectors, and every parameterized gate U_i = exp(phi*factor*G) adds 2*Re(factor*<lambda|G|psi>) times the chain rule
+    factor of its Parameter. This costs about three runs of the circuit, independently of the number of parameters.
+    """
+    terms = _pauli_terms(terms)
+    values = self._values(values)
+    psi = self.bind(values)
+    phi = apply_pauli_sum(psi, self.n, terms).astype(self.dtype)
+    value = np.einsum('...i,...i->...', psi.conj(), phi)
+    gradient = dict.fromkeys(self.parameters, 0.0)
+    for step in reversed(self.steps):
+      if len(step) == 2:
+        name, qubits, params = step[1]
+      else:
+        name, qubits, (parameter,) = step
+        factor, generator = GENERATORS[name]
+        left = phi.reshape(phi.shape[:-1] + (-1, 2, 2**(self.n-qubits[0]-1)))
+        right = psi.reshape(psi.shape[:-1] + (-1, 2, 2**(self.n-qubits[0]-1)))
+        overlap = sum(generator[a, b]*np.einsum('...ij,...ij->...', left[..., a, :].conj(), right[..., b, :])
+                      for a in (0, 1) for b in (0, 1) if generator[a, b] != 0)
+        gradient[parameter.name] += 2*np.real(factor*overlap)*parameter.scale
+        name, qubits, params = inverse_gate(name, qubits, (parameter.value(values),))
+      psi = apply_gate(psi, self.n, name, qubits, params, self.num_threads)
+      phi = apply_gate(phi, self.n, name, qubits, params, self.num_threads)
+    if np.isrealobj(np.asarray([coefficient for coefficient, _ in terms])):
+      value = np.real(value)
+    gradient = [np.broadcast_to(gradient[name], value.shape) for name in self.parameters]
+    return value, np.stack(gradient, axis=-1) if gradient else np.zeros(value.shape + (0,))
@@ -0,0 +1,131 @@
+"""
+Expectation values of Pauli strings computed directly on the state vector.
+
+A Pauli string P = P_0 P_1 ... P_(n-1), e.g. 'XYI' or ['X', 'Y', 'I'], maps a basis state |i> to
+i^(number of Y) * (-1)^popcount(i & z_mask) |i ^ x_mask>, where x_mask marks the X and Y qubits and z_mask the Z and Y
+qubits. <psi|P|psi> is therefore a sum over the amplitudes of psi times the conjugated amplitudes of psi with the
+x_mask bits flipped, weighted by a parity sign. No 2^n x 2^n matrix is built.
+"""
+import numpy as np
+from .kernels import split_shape, apply_single_qubit_gate
+
+PAULI_MATRICES = {
+  'I': np.array([[1,0],[0,1]]),
+  'X': np.array([[0,1],[1,0]]),
+  'Y': np.array([[0,-1j],[1j,0]]),
+  'Z': np.array([[1,0],[0,-1]]),
+}
+
+def pauli_masks(operator):
+  """
+  Returns (x_qubits, z_qubits, y_count) of a Pauli string.
+  """
+  x_qubits = []
+  z_qubits = []
+  y_count = 0
+  for qubit, pauli in enumerate(operator):
+    pauli = pauli.upper()
+    if pauli not in ('I', 'X', 'Y', 'Z'):
+      raise ValueError(f"'{pauli}' is not one of the Pauli operators I, X, Y or Z.")
+    if pauli in ('X', 'Y'):
+      x_qubits.append(qubit)
+    if pauli in ('Z', 'Y'):
+      z_qubits.append(qubit)
+    y_count += pauli == 'Y'
+  return tuple(x_qubits), tuple(z_qubits), y_count
+
+
+def _overlap(state, n, x_qubits):
+  """
+  Returns the flat array conj(psi[i ^ x_mask])*psi[i].
+  """
+  if not x_qubits:
+    return np.real(np.conjugate(state)*state)
+  shape = split_shape(n, x_qubits)
+  view = state.reshape(shape)
+  index = [slice(None)]*len(shape)
+  index[1::2] = [slice(None, None, -1)]*len(x_qubits)
+  return (np.conjugate(view[tuple(index)])*view).reshape(-1)
+
+
+def _parity_sum(overlap, n, z_qubits):
+  """
+  Returns the sum over i of overlap[i]*(-1)^popcount(i & z_mask).
+  """
+  if not z_qubits:
+    return overlap.sum()
+  shape = split_shape(n, z_qubits)
+  reduced = overlap.reshape(shape).sum(axis=tuple(range(0, len(shape), 2)))
+  for _ in z_qubits:
+    reduced = reduced[0]-reduced[1]
+  return reduced
+
+
+def _walsh_hadamard(overlap, n):
+  """
+  Returns all 2^n parity sums of overlap at once (index z_mask holds the sum for z_mask), using n in-place butterfly
+  passes.
+  """
+  transform = overlap.copy()
+  for qubit in range(n):
+    view = transform.reshape(-1, 2, 2**(n-qubit-1))
+    a0 = view[:, 0, :]
+    a1 = view[:, 1, :]
+    a0 += a1
+    a1 *= -2
+    a1 += a0
+  return transform
+
+
+def pauli_expectation(state, n, operator):
+  """
+  Returns <psi|P|psi> for the Pauli string operator.
+  """
+  return pauli_sum_expectation(state, n, [(1, operator)])
+
+
+def pauli_sum_expectation(state, n, terms):
+  """
+  Returns the expectation value of the weighted sum of Pauli strings terms = [(coefficient, operator), ...].
+
+  Terms are grouped by their X-mask so that each group needs a single permuted copy of the state. Large groups are
+  evaluated with one Walsh-Hadamard transform instead of one pass per term. The result is real if all the coefficients
+  are real.
+  """
+  state = np.asarray(state)
+  groups = {}
+  for coefficient, operator in terms:
+    if len(operator) != n:
+      raise ValueError(f"Pauli string {operator} does not act on {n} qubits.")
+    x_qubits, z_qubits, y_count = pauli_masks(operator)
+    groups.setdefault(x_qubits, []).append((coefficient*1j**y_count, z_qubits))
+  total = 0
+  for x_qubits, group in groups.items():
+    overlap = _overlap(state, n, x_qubits)
+    if len(group) > n:
+      transform = _walsh_hadamard(overlap, n)
+      for coefficient, z_qubits in group:
+        total += coefficient*transform[sum(1 << (n-q-1) for q in z_qubits)]
+    else:
+      for coefficient, z_qubits in group:
+        total += coefficient*_parity_sum(overlap, n, z_qubits)
+  if all(np.isreal(coefficient) for coefficient, _ in terms):
+    return float(np.real(total))
+  return complex(total)
+
+
+def apply_pauli_sum(state, n, terms):
+  """
+  Returns the new state sum_j c_j P_j |psi> for the weighted sum of Pauli strings terms = [(c_j, P_j), ...].
+  """
+  state = np.asarray(state)
+  result = np.zeros(state.shape, dtype=np.result_type(state.dtype, np.complex64))
+  for coefficient, operator in terms:
+    if len(operator) != n:
+      raise ValueError(f"Pauli string {operator} does not act on {n} qubits.")
+    applied = state.astype(result.dtype)
+    for qubit, pauli in enumerate(operator):
+      if pauli.upper() != 'I':
+        applied = apply_single_qubit_gate(applied, n, PAULI_MATRICES[pauli.upper()], qubit)
+    result += coefficient*applied
+  return result
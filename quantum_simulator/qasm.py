@@ -0,0 +1,304 @@
+"""
+Streaming reader for OpenQASM 2 programs.
+
+The program is read one line at a time and every statement is turned into an instruction (name, qubits, params) as
+described in gates.py, so files of any length are processed in constant memory. The qubits of all the qreg declarations
+are numbered in order of declaration, e.g. after 'qreg a[2]; qreg b[3];' b[0] is qubit 2. Supported statements:
+
+  OPENQASM 2.0; include "qelib1.inc"; qreg; creg; barrier (ignored); measure q[i] -> c[j];
+  h, x, y, z, s, sdg, t, tdg, id, p (u1), rx, ry, rz, cx (CX), cy, cz, cp (cu1), swap, ccx, cswap;
+  if(c==value) followed by one of the above.
+
+Gates applied to whole registers are broadcast, e.g. 'h q;' or 'cx a,b;' for registers a and b of the same size. Angles
+are expressions of numbers, pi, + - * / ^ and the functions sin, cos, tan, exp, ln and sqrt. Gate definitions (gate,
+opaque) and reset raise QasmError.
+
+Besides the gates, QasmReader yields ('measure', (qubit,), (creg, bit)) and ('if', (), (creg, value, instruction)).
+"""
+import ast
+import math
+import os
+import re
+import functools
+import itertools
+import numpy as np
+from .quantum_circuit import QuantumCircuit
+
+# QASM name: (name in gates.py, number of qubits, number of angles)
+QASM_GATES = {
+  'h': ('h', 1, 0),
+  'x': ('x', 1, 0),
+  'y': ('y', 1, 0),
+  'z': ('z', 1, 0),
+  's': ('s', 1, 0),
+  'sdg': ('inverse_s', 1, 0),
+  'p': ('p', 1, 1),
+  'u1': ('p', 1, 1),
+  'rx': ('rx', 1, 1),
+  'ry': ('ry', 1, 1),
+  'rz': ('rz', 1, 1),
+  'cx': ('cx', 2, 0),
+  'CX': ('cx', 2, 0),
+  'cy': ('cy', 2, 0),
+  'cz': ('cz', 2, 0),
+  'cp': ('mcp', 2, 1),
+  'cu1': ('mcp', 2, 1),
+  'swap': ('swap', 2, 0),
+  'ccx': ('ccx', 3, 0),
+  'cswap': ('cswap', 3, 0),
+}
+
+# QASM gates given by a fixed angle of a gate in QASM_GATES. t is diag(1, exp(i*pi/4)) in OpenQASM.
+FIXED_ANGLE_GATES = {'t': ('p', np.pi/4), 'tdg': ('p', -np.pi/4)}
+
+IGNORED_STATEMENTS = ('OPENQASM', 'include', 'barrier', 'id')
+
+FUNCTIONS = {'sin': math.sin, 'cos': math.cos, 'tan': math.tan, 'exp': math.exp, 'ln': math.log, 'sqrt': math.sqrt}
+
+OPERATORS = {
+  ast.Add: lambda a, b: a + b,
+  ast.Sub: lambda a, b: a - b,
+  ast.Mult: lambda a, b: a * b,
+  ast.Div: lambda a, b: a / b,
+  ast.Pow: lambda a, b: a ** b,
+}
+
+STATEMENT_CACHE_SIZE = 2**16
+
+STATEMENT = re.compile(r'(\w+)\s*(?:\((.*)\))?\s*(.*)$', re.S)
+ARGUMENT = re.compile(r'(\w+)\s*(?:\[\s*(\d+)\s*\])?$')
+CONDITION = re.compile(r'if\s*\(\s*(\w+)\s*==\s*(\d+)\s*\)\s*(.*)$', re.S)
+
+
+class QasmError(ValueError):
+  """
+  Raised for a statement which is malformed or not supported.
+  """
+
+
+def _evaluate(node):
+  if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+    return node.value
+  if isinstance(node, ast.Name) and node.id == 'pi':
+    return math.pi
+  if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+    return OPERATORS[type(node.op)](_evaluate(node.left), _evaluate(node.right))
+  if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+    value = _evaluate(node.operand)
+    return -value if isinstance(node.op, ast.USub) else value
+  if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+     and len(node.args) == 1:
+    return FUNCTIONS[node.func.id](_evaluate(node.args[0]))
+  raise QasmError(f"Unsupported expression '{ast.dump(node)}'.")
+
+
+@functools.lru_cache(maxsize=4096)
+def angle(expression):
+  """
+  Returns the value of an angle expression such as 'pi/4' or '-2*pi/3'. Generated circuits repeat few distinct angles,
+  so the values are cached.
+  """
+  try:
+    tree = ast.parse(expression.replace('^', '**'), mode='eval')
+  except SyntaxError:
+    raise QasmError(f"Invalid expression '{expression}'.") from None
+  return float(_evaluate(tree.body))
+
+
+def statements(lines):
+  """
+  Yields the statements of a program, given as an iterable of lines, without comments and the final ';'.
+  """
+  buffer = ''
+  for line in lines:
+    line = line.split('//', 1)[0]
+    if ';' not in line:
+      buffer += line
+      continue
+    *complete, buffer_end = (buffer + line).split(';')
+    for statement in complete:
+      statement = statement.strip()
+      if statement:
+        yield statement
+    buffer = buffer_end
+  if buffer.strip():
+    raise QasmError(f"Statement '{buffer.strip()}' is not terminated by ';'.")
+
+
+class QasmReader:
+  """
+  Iterates over the instructions of an OpenQASM 2 program (see the module docstring), reading it line by line.
+
+  reader = QasmReader('circuit.qasm')
+  for name, qubits, params in reader:
+    ...
+
+  After the iteration, reader.n is the number of qubits and reader.cregs maps every classical register to its size.
+  """
+  def __init__(self, source):
+    """
+    source: path of a .qasm file, or an iterable of lines such as an open file or io.StringIO(program).
+    """
+    self.source = source
+    self.n = 0
+    self.qregs = {}
+    self.cregs = {}
+    self._started = False
+
+  def __iter__(self):
+    if isinstance(self.source, (str, os.PathLike)):
+      with open(self.source) as file:
+        yield from self._instructions(file)
+    else:
+      yield from self._instructions(self.source)
+
+  def _instructions(self, lines):
+    """
+    Yields the instructions of the program. Once the registers are declared, the instructions of every statement are
+    cached, since generated programs repeat the same statements (e.g. 'cx q[0],q[1]') many times.
+    """
+    cache = {}
+    for statement in statements(lines):
+      instructions = cache.get(statement)
+      if instructions is None:
+        instructions = list(self._conditional(statement))
+        if instructions and self._started and len(cache) < STATEMENT_CACHE_SIZE:
+          cache[statement] = instructions
+      yield from instructions
+
+  def _conditional(self, statement):
+    """
+    Yields the instructions of a statement, wrapped in 'if' instructions if it has a condition.
+    """
+    condition = CONDITION.match(statement)
+    if not condition:
+      yield from self._statement(statement)
+      return
+    creg, value, statement = condition.groups()
+    if creg not in self.cregs:
+      raise QasmError(f"Unknown classical register '{creg}'.")
+    for instruction in self._statement(statement):
+      yield ('if', (), (creg, int(value), instruction))
+    return
+
+  def _register(self, text, registers):
+    """
+    Returns the list of (register, index) of an argument, e.g. 'q[2]' or 'q' for the whole register.
+    """
+    match = ARGUMENT.match(text.strip())
+    if not match or match.group(1) not in registers:
+      raise QasmError(f"Unknown register argument '{text.strip()}'.")
+    name, index = match.groups()
+    size = registers[name][1] if registers is self.qregs else registers[name]
+    if index is None:
+      return [(name, i) for i in range(size)]
+    if int(index) >= size:
+      raise QasmError(f"Index {index} is out of range for register '{name}' of size {size}.")
+    return [(name, int(index))]
+
+  def _qubits(self, text):
+    return [self.qregs[name][0] + index for name, index in self._register(text, self.qregs)]
+
+  def _statement(self, statement):
+    """
+    Yields the instructions of a statement without condition.
+    """
+    match = STATEMENT.match(statement)
+    if not match:
+      raise QasmError(f"Invalid statement '{statement}'.")
+    keyword, params, arguments = match.groups()
+    if keyword in IGNORED_STATEMENTS:
+      return
+    if keyword in ('qreg', 'creg'):
+      declaration = ARGUMENT.match(arguments.strip())
+      if not declaration or declaration.group(2) is None:
+        raise QasmError(f"Invalid declaration '{statement}'.")
+      name, size = declaration.group(1), int(declaration.group(2))
+      if keyword == 'qreg' and self._started:
+        raise QasmError(f"'{statement}' declares qubits after the first gate.")
+      if keyword == 'qreg':
+        self.qregs[name] = (self.n, size)
+        self.n += size
+      else:
+        self.cregs[name] = size
+      return
+    if keyword == 'measure':
+      source, _, target = arguments.partition('->')
+      qubits = self._qubits(source)
+      clbits = self._register(target, self.cregs)
+      if len(qubits) != len(clbits):
+        raise QasmError(f"'{statement}' measures {len(qubits)} qubit(s) into {len(clbits)} bit(s).")
+      self._started = True
+      for qubit, (creg, bit) in zip(qubits, clbits):
+        yield ('measure', (qubit,), (creg, bit))
+      return
+    if keyword in FIXED_ANGLE_GATES:
+      name, value = FIXED_ANGLE_GATES[keyword]
+      angles = (value,)
+      k = 1
+    elif keyword in QASM_GATES:
+      name, k, num_angles = QASM_GATES[keyword]
+      angles = tuple(angle(param) for param in params.split(',')) if params else ()
+      if len(angles) != num_angles:
+        raise QasmError(f"'{keyword}' takes {num_angles} angle(s), not {len(angles)}.")
+    else:
+      raise QasmError(f"Unsupported statement '{keyword}'.")
+    operands = [self._qubits(argument) for argument in arguments.split(',')]
+    if len(operands) != k:
+      raise QasmError(f"'{keyword}' acts on {k} qubit(s), not {len(operands)}.")
+    sizes = {len(qubits) for qubits in operands if len(qubits) > 1}
+    if len(sizes) > 1:
+      raise QasmError(f"'{statement}' broadcasts over registers of different sizes {sorted(sizes)}.")
+    self._started = True
+    size = max(len(qubits) for qubits in operands)
+    for i in range(size):
+      qubits = tuple(qubits[i] if len(qubits) > 1 else qubits[0] for qubits in operands)
+      yield (name, qubits, angles)
+    return
+
+
+def run_instructions(circuit, instructions, cregs):
+  """
+  Applies instructions as yielded by QasmReader on circuit, measuring and evaluating conditions as they come, and
+  returns the classical registers {creg: list of measured bits, bit 0 first}. cregs maps every creg to its size.
+  """
+  bits = {}
+  for name, qubits, params in instructions:
+    if name == 'if':
+      creg, value, instruction = params
+      register = bits.setdefault(creg, [0]*cregs[creg])
+      if sum(bit << i for i, bit in enumerate(register)) != value:
+        continue
+      name, qubits, params = instruction
+    if name == 'measure':
+      creg, bit = params
+      bits.setdefault(creg, [0]*cregs[creg])[bit] = circuit.measure(qubits[0])
+    else:
+      circuit._gate(name, qubits, params)
+  for creg, size in cregs.items():
+    bits.setdefault(creg, [0]*size)
+  return bits
+
+
+def run_qasm(source, circuit = None, **circuit_arguments):
+  """
+  Runs an OpenQASM 2 program while it is read and returns (circuit, classical registers), where the classical
+  registers map every creg to its list of measured bits (bit 0 first).
+
+  source: see QasmReader.
+  circuit: circuit on which the program runs, e.g. a SparseQuantumCircuit, with as many qubits as the program declares
+  (QasmError otherwise). By default a QuantumCircuit with the
+  declared number of qubits is created with circuit_arguments (see QuantumCircuit) once the first gate is read. With
+  lazy=True the gates are only recorded in circuit.instructions, where they can be optimized before they run (see
+  QuantumCircuit.optimize), as long as the program does not measure.
+  """
+  reader = QasmReader(source)
+  instructions = iter(reader)
+  first = next(instructions, None)
+  if circuit is None:
+    circuit = QuantumCircuit(reader.n, **circuit_arguments)
+  elif circuit.n != reader.n:
+    raise QasmError(f"The program declares {reader.n} qubits, but the circuit has {circuit.n}.")
+  if first is not None:
+    instructions = itertools.chain([first], instructions)
+  return circuit, run_instructions(circuit, instructions, reader.cregs)
@@ -1,11 +1,22 @@
+import copy
 import numpy as np
+from .kernels import apply_diagonal_gate, diagonal_table, fuse_diagonals, outcome_mask, outcome_probability
+from .gates import is_diagonal, gate_diagonal, apply_gate
+from .fusion import fuse_instructions
+from .optimize import optimize_instructions
+from . import instrumentation, checkpoint
+from .basis import BasisLabels
 
 class QuantumCircuit:
   """
   |0> = np.array([1,0]).
   |1> = np.array([0,1]).
   """
-  def __init__(self, n, initial_state = 0):
+  _hooks = ()
+  _owns_state = True
+
+  def __init__(self, n, initial_state = 0, lazy = False, max_fused_qubits = 2, seed = None, dtype = complex,
+               num_threads = 1):
     """
     Initializes the total number of qubits n, required in the quantum circuit. If initial_state == 0, this means that all
     the qubits are initialized in state |0>.
@@ -14,18 +25,192 @@ class QuantumCircuit:
     For e.g. if n = 2 and 1st qubit = (1/sqrt(2))(|0> + |1>) and 2nd qubit = |1> then,
     initial_state = [0,np.sqrt(2)*1,0,np.sqrt(2)*1]. If n = 2 and the initial state is a Bell's state = (|00> + |11>)/sqrt(2),
     then user can provide initial_state = [(1/sqrt(2))*1,0,0,(1/sqrt(2))*1].
+
+    If lazy == True, gates are only recorded in self.instructions and the state is computed when it is accessed. Before
+    that the recorded gates are fused into blocks acting on at most max_fused_qubits qubits.
+
+    seed: seed of the random number generator used by measure.
+
+    dtype: np.complex128 (default) or np.complex64. Every gate keeps the state in this precision, so complex64 halves
+    the memory and bandwidth needed for a given number of qubits.
+
+    num_threads: number of threads among which every gate splits the state vector. parallel.default_num_threads()
+    returns the number of CPUs available.
     """
-    self.n = n
-    initial_state = np.array(initial_state)
+    self._setup(n, lazy, max_fused_qubits, seed, dtype, num_threads)
+    initial_state = np.array(initial_state, dtype=self.dtype)
     if initial_state.ndim == 0:
-      self.state = np.zeros((2**self.n,))
-      self.state[0] = 1
+      initial_state = np.zeros((2**self.n,), dtype=self.dtype)
+      initial_state[0] = 1
+    self.state = initial_state
+    self._owns_state = True
+
+  def _setup(self, n, lazy, max_fused_qubits, seed, dtype, num_threads):
+    """
+    Sets the settings, the random number generator, the basis labels and the empty gate queues, which every backend
+    has whatever its state is made of.
+    """
+    self.n = n
+    self.lazy = lazy
+    self.max_fused_qubits = max_fused_qubits
+    self.rng = np.random.default_rng(seed)
+    self.dtype = np.dtype(dtype)
+    self.num_threads = num_threads
+    self.binary_indices_list = BasisLabels(self.n)
+    self.basis_states = BasisLabels(self.n, '|{}>')
+    self._pending_diagonals = {}
+    self.instructions = []
+    return None
+
+  @property
+  def state(self):
+    """
+    State vector of the circuit. Recorded gates (lazy mode) are fused and executed, and diagonal gates which were
+    collected are applied together as a single fused phase multiplication.
+
+    The gates modify the state vector in place, so the array returned (or assigned) is shared copy-on-write: the next
+    gate works on a copy and the array held by the caller keeps its amplitudes.
+    """
+    self._run_pending()
+    self._owns_state = False
+    return self._state
+
+  @state.setter
+  def state(self, state):
+    self._state = np.asarray(state, dtype=self.dtype)
+    self._owns_state = False
+    self._pending_diagonals = {}
+    self.instructions = []
+
+  def _run_pending(self):
+    """
+    Executes the recorded gates (lazy mode) and the queued diagonal gates.
+    """
+    if self.instructions:
+      instructions = fuse_instructions(self.instructions, self.max_fused_qubits)
+      self.instructions = []
+      for instruction in instructions:
+        self._execute(*instruction)
+    if self._pending_diagonals:
+      self._flush_diagonals()
+    return None
+
+  def _gate(self, name, qubits, params):
+    """
+    Records the gate in lazy mode, otherwise applies it.
+    """
+    if self.lazy:
+      self.instructions.append((name, qubits, params))
     else:
-      self.state = initial_state
-    self.state = self.state.astype(complex)
-    self.binary_indices_list = [bin(i)[2:].zfill(self.n) for i in range(2**self.n)]
-    self.basis_states = [f"|{s}>" for s in self.binary_indices_list]
+      self._execute(name, qubits, params)
+    return None
+
+  def _execute(self, name, qubits, params):
+    """
+    Applies the gate on the state. Diagonal gates are queued (see _apply_diagonal).
+    """
+    if is_diagonal(name):
+      self._apply_diagonal(qubits, gate_diagonal(name, params))
+    else:
+      self._run_pending()
+      self._own_state()
+      self._state = apply_gate(self._state, self.n, name, qubits, params, self.num_threads)
+    return None
+
+  def _flush_diagonals(self):
+    """
+    Applies the queued diagonal gates as a single fused phase multiplication.
+    """
+    qubits, table = fuse_diagonals(list(self._pending_diagonals.items()), self.dtype)
+    self._pending_diagonals = {}
+    self._own_state()
+    self._state = apply_diagonal_gate(self._state, self.n, qubits, table, self.num_threads)
+    return None
+
+  def _apply_diagonal(self, qubits, diagonal):
+    """
+    Queues a diagonal gate given by its diagonal entries on qubits. Gates on the same set of qubits are multiplied
+    together straight away.
+    """
+    qubits, table = diagonal_table(qubits, diagonal)
+    if qubits in self._pending_diagonals:
+      table = self._pending_diagonals[qubits]*table
+    self._pending_diagonals[qubits] = table
+    return None
+
+  def _own_state(self):
+    """
+    Copies the state vector if it is shared with a fork, before it is modified in place (copy-on-write).
+    """
+    if not self._owns_state:
+      self._state = self._state.copy()
+      self._owns_state = True
+    return None
+
+  def fork(self, seed = None):
+    """
+    Returns a copy of the circuit for branching, e.g. into different measurement bases or outcomes after a common
+    prefix. The state vector is shared until the circuit or the fork modifies it, which copies it first, so a fork
+    which is kept unchanged is a cheap snapshot to fork again. Queued gates are copied and hooks are not.
+
+    seed: seed of the random number generator of the fork. By default it continues the stream of the circuit, so that
+    the fork draws the same measurement outcomes as the circuit would have.
+    """
+    fork = copy.copy(self)
+    for name in instrumentation.WRAPPED_METHODS + ('_hooks', '_hook_stack'):
+      vars(fork).pop(name, None)
+    fork.rng = copy.deepcopy(self.rng) if seed is None else np.random.default_rng(seed)
+    fork._fork_state(self)
+    return fork
+
+  def _fork_state(self, circuit):
+    """
+    Gives the fork its own queues and shares the state vector of circuit copy-on-write.
+    """
+    self.instructions = list(circuit.instructions)
+    self._pending_diagonals = dict(circuit._pending_diagonals)
+    self._owns_state = circuit._owns_state = False
+    return None
+
+  def save_checkpoint(self, path):
+    """
+    Saves the state vector, the queued gates, the settings and the random number generator to the directory path, from
+    which QuantumCircuit.load_checkpoint(path) resumes the circuit (see checkpoint.py).
+    """
+    checkpoint.save_checkpoint(self, path)
+    return None
+
+  @staticmethod
+  def load_checkpoint(path, mmap_mode = 'c'):
+    """
+    Returns the circuit saved by save_checkpoint, of the class it was saved from (e.g. a MemmapQuantumCircuit stays
+    file-backed). The state file is memory-mapped with mmap_mode, by default copy-on-write so that it is neither read
+    into memory up front nor modified (see checkpoint.load_checkpoint).
+    """
+    return checkpoint.load_checkpoint(QuantumCircuit, path, mmap_mode)
+
+  def optimize(self, measured_qubits = None):
+    """
+    Cancels and merges redundant recorded gates (lazy mode) and, if measured_qubits is given, drops the gates which
+    cannot affect these qubits (see optimize.optimize_instructions). Returns the report of the gates and passes saved.
+    """
+    self.instructions, report = optimize_instructions(self.instructions, measured_qubits)
+    return report
+
+  def add_hook(self, hook):
+    """
+    Calls hook(record) after every applied gate, diagonal flush and measurement, where record holds the name, qubits,
+    wall time, bytes allocated and state passes (see instrumentation.py). instrumentation.Profiler is such a hook.
+    """
+    instrumentation.add_hook(self, hook)
+    return None
 
+  def remove_hook(self, hook):
+    """
+    Removes a hook added with add_hook.
+    """
+    instrumentation.remove_hook(self, hook)
+    return None
 
 
                                                    ####### Single-Qubit Gates #######
@@ -34,25 +219,7 @@ class QuantumCircuit:
     Single qubit Hadamard Gate.
     qubit_position: 0 to n-1.
     """
-    operator = (1/np.sqrt(2))*np.array([[1,1],[1,-1]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('h', (qubit_position,), ())
     return None
 
   def x(self, qubit_position):
@@ -60,25 +227,7 @@ class QuantumCircuit:
     Single qubit Pauli X Gate.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[0,1],[1,0]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('x', (qubit_position,), ())
     return None
 
   def y(self, qubit_position):
@@ -86,25 +235,7 @@ class QuantumCircuit:
     Single qubit Pauli Y Gate.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[0,-1j],[1j,0]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('y', (qubit_position,), ())
     return None
 
   def z(self, qubit_position):
@@ -112,25 +243,7 @@ class QuantumCircuit:
     Single qubit Pauli Z Gate.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[1,0],[0,-1]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('z', (qubit_position,), ())
     return None
 
   def s(self, qubit_position):
@@ -138,25 +251,7 @@ class QuantumCircuit:
     Single qubit S Gate.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[1,0],[0,1j]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('s', (qubit_position,), ())
     return None
 
   def inverse_s(self, qubit_position):
@@ -164,25 +259,7 @@ class QuantumCircuit:
     Single qubit Inverse S Gate.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[1,0],[0,-1j]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('inverse_s', (qubit_position,), ())
     return None
 
   def t(self, qubit_position):
@@ -190,25 +267,7 @@ class QuantumCircuit:
     Single qubit T Gate.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[1,0],[0,np.exp(1j*np.sqrt(np.pi/4))]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('t', (qubit_position,), ())
     return None
 
   def inverse_t(self, qubit_position):
@@ -216,25 +275,7 @@ class QuantumCircuit:
     Single qubit Inverse T Gate.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[1,0],[0,np.exp(-1j*np.sqrt(np.pi/4))]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('inverse_t', (qubit_position,), ())
     return None
 
   def p(self, qubit_position, phi):
@@ -242,25 +283,7 @@ class QuantumCircuit:
     Single qubit Phase Gate with phi in radians.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[1,0],[0,np.exp(1j*phi)]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('p', (qubit_position,), (phi,))
     return None
 
   def rx(self, qubit_position, phi):
@@ -268,25 +291,7 @@ class QuantumCircuit:
     Single qubit Rotation X Gate with phi in radians.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[np.cos(phi/2),-1j*np.sin(phi/2)],[-1j*np.sin(phi/2),np.cos(phi/2)]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('rx', (qubit_position,), (phi,))
     return None
 
   def ry(self, qubit_position, phi):
@@ -294,25 +299,7 @@ class QuantumCircuit:
     Single qubit Rotation Y Gate with phi in radians.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[np.cos(phi/2),-1*np.sin(phi/2)],[np.sin(phi/2),np.cos(phi/2)]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('ry', (qubit_position,), (phi,))
     return None
 
   def rz(self, qubit_position, phi):
@@ -320,25 +307,7 @@ class QuantumCircuit:
     Single qubit Rotation Z Gate with phi in radians.
     qubit_position: 0 to n-1.
     """
-    operator = np.array([[np.exp(-1j*phi/2),0],[0,np.exp(1j*phi/2)]])
-
-    if qubit_position == 0:
-      gate = operator
-      for i in range(1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    elif qubit_position == self.n-1:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-    else:
-      gate = np.eye(2)
-      for i in range(1, qubit_position):
-        gate = np.kron(gate, np.eye(2))
-      gate = np.kron(gate, operator)
-      for i in range(qubit_position+1, self.n):
-        gate = np.kron(gate, np.eye(2))
-    self.state = np.dot(gate, self.state)
+    self._gate('rz', (qubit_position,), (phi,))
     return None
 
 
@@ -348,13 +317,7 @@ class QuantumCircuit:
     Two qubit CNOT Gate.
     control_qubit, action_qubit: 0 to n-1.
     """
-    binary_indices_array = np.array([[int(i) for i in char] for char in self.binary_indices_list])
-    copy = binary_indices_array.copy()
-    binary_indices_array[np.logical_and(copy[:,control_qubit] == 1, copy[:,action_qubit] == 0),action_qubit] = 1
-    binary_indices_array[np.logical_and(copy[:,control_qubit] == 1, copy[:,action_qubit] == 1),action_qubit] = 0
-    sorted_array = np.array([int(''.join(map(str, row)),2) for row in binary_indices_array])
-    duplicate = self.state.copy()
-    self.state = np.array([duplicate[i] for i in sorted_array])
+    self._gate('cx', (control_qubit, action_qubit), ())
     return None
 
   def cy(self, control_qubit, action_qubit):
@@ -362,19 +325,7 @@ class QuantumCircuit:
     Two qubit Controlled Y Gate.
     control_qubit, action_qubit: 0 to n-1.
     """
-    binary_indices_array = np.array([[int(i) for i in char] for char in self.binary_indices_list])
-    copy = binary_indices_array.copy()
-    binary_indices_array[np.logical_and(copy[:,control_qubit] == 1, copy[:,action_qubit] == 0),action_qubit] = 1
-    binary_indices_array[np.logical_and(copy[:,control_qubit] == 1, copy[:,action_qubit] == 1),action_qubit] = 0
-    condition1 = np.where(np.logical_and(copy[:,control_qubit] == 1, copy[:,action_qubit] == 0))[0]
-    condition2 = np.where(np.logical_and(copy[:,control_qubit] == 1, copy[:,action_qubit] == 1))[0]
-    sorted_array = np.array([int(''.join(map(str, row)),2) for row in binary_indices_array])
-    duplicate = self.state.copy()
-    self.state = np.array([duplicate[i] for i in sorted_array])
-    for i in condition1:
-      self.state[i] = -1j*self.state[i]
-    for i in condition2:
-      self.state[i] = 1j*self.state[i]
+    self._gate('cy', (control_qubit, action_qubit), ())
     return None
 
   def cz(self, control_qubit, action_qubit):
@@ -382,10 +333,7 @@ class QuantumCircuit:
     Two qubit Controlled Z Gate.
     control_qubit, action_qubit: 0 to n-1.
     """
-    binary_indices_array = np.array([[int(i) for i in char] for char in self.binary_indices_list])
-    condition = np.where(np.logical_and(binary_indices_array[:,control_qubit] == 1, binary_indices_array[:,action_qubit] == 1))[0]
-    for i in condition:
-      self.state[i] = -self.state[i]
+    self._gate('cz', (control_qubit, action_qubit), ())
     return None
 
   def cp(self, control_qubit, action_qubit, k):
@@ -393,10 +341,7 @@ class QuantumCircuit:
     Two qubit Controlled Phase Gate with phase factor e^(i*2*pi/(2^k)).
     control_qubit, action_qubit: 0 to n-1.
     """
-    binary_indices_array = np.array([[int(i) for i in char] for char in self.binary_indices_list])
-    condition = np.where(np.logical_and(binary_indices_array[:,control_qubit] == 1, binary_indices_array[:,action_qubit] == 1))[0]
-    for i in condition:
-      self.state[i] = np.exp(1j*2*np.pi/(2**k))*self.state[i]
+    self._gate('cp', (control_qubit, action_qubit), (k,))
     return None
 
   def swap(self, qubit1, qubit2):
@@ -404,15 +349,7 @@ class QuantumCircuit:
     Two qubit SWAP Gate.
     qubit1, qubit2: 0 to n-1.
     """
-    binary_indices_array = np.array([[int(i) for i in char] for char in self.binary_indices_list])
-    copy = binary_indices_array.copy()
-    binary_indices_array[np.logical_and(copy[:,qubit1] == 1, copy[:,qubit2] == 0),qubit2] = 1
-    binary_indices_array[np.logical_and(copy[:,qubit1] == 1, copy[:,qubit2] == 0),qubit1] = 0
-    binary_indices_array[np.logical_and(copy[:,qubit1] == 0, copy[:,qubit2] == 1),qubit2] = 0
-    binary_indices_array[np.logical_and(copy[:,qubit1] == 0, copy[:,qubit2] == 1),qubit1] = 1
-    sorted_array = np.array([int(''.join(map(str, row)),2) for row in binary_indices_array])
-    duplicate = self.state.copy()
-    self.state = np.array([duplicate[i] for i in sorted_array])
+    self._gate('swap', (qubit1, qubit2), ())
     return None
 
 
@@ -423,13 +360,7 @@ class QuantumCircuit:
     Three qubit CCNOT or Toffoli Gate.
     control_qubit1, control_qubit2, action_qubit: 0 to n-1.
     """
-    binary_indices_array = np.array([[int(i) for i in char] for char in self.binary_indices_list])
-    copy = binary_indices_array.copy()
-    binary_indices_array[np.logical_and(np.logical_and(copy[:,control_qubit1] == 1, copy[:,control_qubit2] == 1), copy[:,action_qubit] == 0),action_qubit] = 1
-    binary_indices_array[np.logical_and(np.logical_and(copy[:,control_qubit1] == 1, copy[:,control_qubit2] == 1), copy[:,action_qubit] == 1),action_qubit] = 0
-    sorted_array = np.array([int(''.join(map(str, row)),2) for row in binary_indices_array])
-    duplicate = self.state.copy()
-    self.state = np.array([duplicate[i] for i in sorted_array])
+    self._gate('ccx', (control_qubit1, control_qubit2, action_qubit), ())
     return None
 
   def cswap(self, control_qubit, qubit1, qubit2):
@@ -437,13 +368,100 @@ class QuantumCircuit:
     Three qubit controlled SWAP Gate.
     control_qubit, qubit1, qubit2: 0 to n-1.
     """
-    binary_indices_array = np.array([[int(i) for i in char] for char in self.binary_indices_list])
-    copy = binary_indices_array.copy()
-    binary_indices_array[np.logical_and(copy[:,control_qubit] == 1, np.logical_and(copy[:,qubit1] == 1, copy[:,qubit2] == 0)),qubit2] = 1
-    binary_indices_array[np.logical_and(copy[:,control_qubit] == 1, np.logical_and(copy[:,qubit1] == 1, copy[:,qubit2] == 0)),qubit1] = 0
-    binary_indices_array[np.logical_and(copy[:,control_qubit] == 1, np.logical_and(copy[:,qubit1] == 0, copy[:,qubit2] == 1)),qubit2] = 0
-    binary_indices_array[np.logical_and(copy[:,control_qubit] == 1, np.logical_and(copy[:,qubit1] == 0, copy[:,qubit2] == 1)),qubit1] = 1
-    sorted_array = np.array([int(''.join(map(str, row)),2) for row in binary_indices_array])
-    duplicate = self.state.copy()
-    self.state = np.array([duplicate[i] for i in sorted_array])
+    self._gate('cswap', (control_qubit, qubit1, qubit2), ())
+    return None
+
+
+                                                    ####### Multi-Qubit Gates #######
+
+  @staticmethod
+  def _distinct(qubits):
+    """
+    Returns qubits as a tuple, or raises ValueError if a qubit appears more than once.
+    """
+    qubits = tuple(qubits)
+    if len(set(qubits)) != len(qubits):
+      raise ValueError(f"The qubits {qubits} are not distinct.")
+    return qubits
+
+  def unitary(self, matrix, qubits):
+    """
+    Applies an arbitrary 2^k x 2^k unitary matrix on k qubits, with the first qubit in qubits as the most significant
+    bit of the matrix indices.
+    qubits: list of k distinct qubit positions from 0 to n-1.
+    """
+    qubits = self._distinct(qubits)
+    matrix = np.asarray(matrix)
+    if matrix.shape != (2**len(qubits), 2**len(qubits)):
+      raise ValueError(f"A matrix of shape {matrix.shape} cannot act on {len(qubits)} qubits.")
+    self._gate('unitary', qubits, (matrix,))
     return None
+
+  def mcx(self, control_qubits, action_qubit):
+    """
+    Multi-controlled X Gate, flips action_qubit if all the control_qubits are in state |1>.
+    control_qubits: list of distinct qubit positions from 0 to n-1. action_qubit: 0 to n-1, not among control_qubits.
+    """
+    self._gate('mcx', self._distinct(tuple(control_qubits) + (action_qubit,)), ())
+    return None
+
+  def mcz(self, control_qubits, action_qubit):
+    """
+    Multi-controlled Z Gate, applies Z on action_qubit if all the control_qubits are in state |1>.
+    control_qubits: list of distinct qubit positions from 0 to n-1. action_qubit: 0 to n-1, not among control_qubits.
+    """
+    self._gate('mcz', self._distinct(tuple(control_qubits) + (action_qubit,)), ())
+    return None
+
+  def mcp(self, control_qubits, action_qubit, phi):
+    """
+    Multi-controlled Phase Gate with phase factor e^(i*phi), phi in radians, applied if all the control_qubits and
+    action_qubit are in state |1>.
+    control_qubits: list of distinct qubit positions from 0 to n-1. action_qubit: 0 to n-1, not among control_qubits.
+    """
+    self._gate('mcp', self._distinct(tuple(control_qubits) + (action_qubit,)), (phi,))
+    return None
+
+  def qft(self, qubits):
+    """
+    Quantum Fourier Transform on k qubits, |j> -> (1/sqrt(2^k)) sum_l e^(i*2*pi*j*l/2^k) |l>, with the first qubit in
+    qubits as the most significant bit. It is the same as the usual circuit of h and cp gates followed by the swaps
+    which reverse the qubit order, but applied as a single FFT.
+    qubits: list of distinct qubit positions from 0 to n-1, in any order.
+    """
+    self._gate('qft', self._distinct(qubits), ())
+    return None
+
+  def iqft(self, qubits):
+    """
+    Inverse Quantum Fourier Transform on the given qubits, see qft.
+    qubits: list of distinct qubit positions from 0 to n-1, in any order.
+    """
+    self._gate('iqft', self._distinct(qubits), ())
+    return None
+
+
+                                                    ####### Measurement #######
+
+  def _draw_outcome(self, probability0, probability1):
+    """
+    Draws the outcome of a measurement from the unnormalized probabilities of 0 and 1, and returns (outcome,
+    probability of the outcome).
+    """
+    outcome = int(self.rng.random()*(probability0 + probability1) < probability1)
+    return outcome, probability1 if outcome else probability0
+
+  def measure(self, qubit_position):
+    """
+    Measures a single qubit in the computational basis. The state collapses in place onto the randomly drawn outcome,
+    which is returned (0 or 1).
+    qubit_position: 0 to n-1.
+    """
+    self._run_pending()
+    probability0 = outcome_probability(self._state, self.n, qubit_position, 0)
+    probability1 = outcome_probability(self._state, self.n, qubit_position, 1)
+    outcome, probability = self._draw_outcome(probability0, probability1)
+    self._own_state()
+    mask = outcome_mask([outcome])/np.sqrt(probability)
+    self._state = apply_diagonal_gate(self._state, self.n, (qubit_position,), mask, self.num_threads)
+    return outcome
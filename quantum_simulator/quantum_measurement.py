@@ -1,14 +1,44 @@
+import copy
 import numpy as np
 import matplotlib.pyplot as plt
+from .pauli import pauli_expectation, pauli_sum_expectation
+from .kernels import apply_single_qubit_gate, apply_diagonal_gate, outcome_mask
+from .basis import BasisLabels
+
+
+def outcome_integers(bits):
+  """
+  Returns the integer outcome of every row of an array of shape (shots, k) of outcome bits, with the first column as
+  the most significant bit, as returned by sample(counts=False) of every backend. Outcomes on more than 63 qubits do not
+  fit in np.int64 and are returned as Python ints in an object array.
+  """
+  bits = np.asarray(bits)
+  k = bits.shape[1]
+  if k <= 63:
+    return bits.astype(np.int64) @ (np.int64(1) << np.arange(k-1, -1, -1, dtype=np.int64))
+  outcomes = np.zeros(len(bits), dtype=object)
+  for column in bits.T:
+    outcomes = 2*outcomes + column.astype(object)
+  return outcomes
+
 
 class QuantumMeasurement:
 
-  def __init__(self, state):
-    self.state = state
+  def __init__(self, state, dtype = None):
+    """
+    state: state vector of the circuit, e.g. QuantumCircuit.state.
+    dtype: np.complex128 or np.complex64. By default the precision of state is kept. Collapse, expectation values and
+    probabilities are computed in this precision.
+    """
+    state = np.asarray(state)
+    if dtype is None:
+      dtype = state.dtype if np.iscomplexobj(state) else complex
+    self.state = np.asarray(state, dtype=dtype)
+    self._owns_state = self.state is not state
     self.n = int(np.log2(len(self.state)) + 0.1)
-    binary_indices_list = [bin(i)[2:].zfill(self.n) for i in range(2**self.n)]
-    self.basis_state = [f'|{s}>' for s in binary_indices_list]
-    self.probabilities = np.array([np.real(np.conjugate(self.state[i])*(self.state[i])) for i in range(len(self.state))])
+    self.basis_state = BasisLabels(self.n, '|{}>')
+    self.probabilities = np.real(np.conjugate(self.state)*self.state)
+    self._sampling_probabilities = {}
 
   def collapse(self, list_qubits, state_qubits):
     """
@@ -18,52 +48,115 @@ class QuantumMeasurement:
     state_qubits: a list containing arrays of state vectors onto which collapse is required. In the above example if I want 1st qubit
     to collapse onto |0> and 3rd to |1> then state_qubits = [[1,0], [0,1]].
     """
-    m = len(state_qubits)
-    for i in range(m):
-      state_qubits[i] = np.outer(np.array(state_qubits[i]),np.conjugate(np.array(state_qubits[i])))
-    operator = []
-    j = 0
-    for i in range(self.n):
-      if i in list_qubits:
-        operator.append(state_qubits[j])
-        j += 1
+    if not self._owns_state:
+      self.state = self.state.copy()
+      self._owns_state = True
+    basis_qubits = []
+    basis_outcomes = []
+    weight = 1
+    for qubit, vector in zip(sorted(list_qubits), state_qubits):
+      vector = np.asarray(vector)
+      if np.count_nonzero(vector) == 1:
+        outcome = int(np.flatnonzero(vector)[0])
+        basis_qubits.append(qubit)
+        basis_outcomes.append(outcome)
+        weight *= np.abs(vector[outcome])**2
       else:
-        operator.append(np.eye(2))
-    collapse_operator = operator[0]
-    for i in range(1, len(operator)):
-      collapse_operator = np.kron(collapse_operator, operator[i])
-    self.state = np.dot(collapse_operator, self.state)
+        self.state = apply_single_qubit_gate(self.state, self.n, np.outer(vector, np.conjugate(vector)), qubit)
+    if basis_qubits:
+      self.state = apply_diagonal_gate(self.state, self.n, tuple(basis_qubits), outcome_mask(basis_outcomes)*weight)
     norm = np.linalg.norm(self.state)
+    if norm == 0:
+      raise ValueError("The requested outcome has zero probability.")
     self.collapse_probability = norm**2
-    self.state = self.state/norm
-    representation = []
-    for i in range(len(self.state)):
-      if np.abs(self.state[i]) > 1e-5:
-        representation.append(f'{self.state[i]}{self.basis_state[i]}')
-    self.collapsed_state = " + ".join(representation)
+    self.state /= norm
+    self.probabilities = np.real(np.conjugate(self.state)*self.state)
+    self._sampling_probabilities = {}
     return None
 
+  def fork(self):
+    """
+    Returns a copy of the measurement which shares the state vector until either of them collapses it, e.g. to collapse
+    the same state onto several outcomes.
+    """
+    fork = copy.copy(self)
+    fork._sampling_probabilities = dict(self._sampling_probabilities)
+    self._owns_state = fork._owns_state = False
+    return fork
+
+  @property
+  def collapsed_state(self):
+    """
+    String representation of the state, listing only the basis states with non-zero amplitude.
+    """
+    representation = []
+    for i in np.flatnonzero(np.abs(self.state) > 1e-5):
+      representation.append(f'{self.state[i]}{self.basis_state[i]}')
+    return " + ".join(representation)
+
   def expectation(self, operator):
     """
     operator: Provide a list of strings with length equal to number of qubits. Each string represent Pauli X, Y or Z or I identity.
-    operator: E.g. for 3 qubits, operator = ['X', 'Y', 'I'].
-    """
-    X = np.array([[0, 1],[0, 1]])
-    Y = np.array([[0, -1j],[1j, 0]])
-    Z = np.array([[1, 0],[0, -1]])
-    I = np.array([[1, 0],[0, 1]])
-    observable = eval(operator[0])
-    for i in range(1, len(operator)):
-      observable = np.kron(observable, eval(operator[i]))
-    self.expectation_value = np.dot(np.conjugate(self.state), np.dot(observable, self.state))
-    print(self.expectation_value)
-    return None
+    operator: E.g. for 3 qubits, operator = ['X', 'Y', 'I'] or 'XYI'.
+
+    Returns the expectation value, which is also stored in self.expectation_value.
+    """
+    self.expectation_value = pauli_expectation(self.state, self.n, operator)
+    return self.expectation_value
+
+  def expectation_sum(self, terms):
+    """
+    terms: a list of (coefficient, operator) pairs describing a weighted sum of Pauli strings, e.g. a Hamiltonian
+    H = 0.5*ZZI - 1.2*XIX is given as terms = [(0.5, 'ZZI'), (-1.2, 'XIX')].
+
+    Returns the expectation value of the sum, which is also stored in self.expectation_value.
+    """
+    self.expectation_value = pauli_sum_expectation(self.state, self.n, terms)
+    return self.expectation_value
+
+  def sample(self, shots, qubits = None, seed = None, counts = True):
+    """
+    Draws measurement shots in the computational basis.
+
+    qubits: list of qubit positions from 0 to n-1 which are measured, in the order in which they appear in the outcome
+    bitstrings. By default all the qubits are measured.
+    seed: seed of the random number generator, for reproducible shots.
+    counts: if True a dictionary {bitstring: count} is returned, e.g. {'00': 498, '11': 502}. Otherwise an array with
+    the integer outcome of every shot is returned, where the first qubit in qubits is the most significant bit.
+
+    The counts are a single multinomial draw over the 2^k outcomes, and only the outcomes drawn at least once get a
+    bitstring. The array of outcomes is the counts expanded and shuffled, so no shot needs a search.
+    """
+    qubits = tuple(range(self.n)) if qubits is None else tuple(qubits)
+    if qubits not in self._sampling_probabilities:
+      probabilities = self.marginal_probabilities(qubits).astype(float)
+      self._sampling_probabilities[qubits] = probabilities/probabilities.sum()
+    probabilities = self._sampling_probabilities[qubits]
+    rng = np.random.default_rng(seed)
+    histogram = rng.multinomial(shots, probabilities)
+    if not counts:
+      return rng.permutation(np.repeat(np.arange(len(histogram)), histogram))
+    outcomes = np.flatnonzero(histogram)
+    k = len(qubits)
+    bits = ((outcomes[:, None] >> np.arange(k-1, -1, -1)) & 1).astype(np.uint8) + ord('0')
+    bitstrings = bits.view(f'S{k}').ravel().astype(f'U{k}') if k else np.full(len(outcomes), '')
+    return dict(zip(bitstrings.tolist(), histogram[outcomes].tolist()))
+
+  def marginal_probabilities(self, qubits):
+    """
+    Returns the probabilities of the 2^k outcomes of measuring the k given qubits, with the first qubit as the most
+    significant bit.
+    """
+    qubits = list(qubits)
+    others = tuple(i for i in range(self.n) if i not in qubits)
+    probabilities = self.probabilities.reshape((2,)*self.n).sum(axis=others)
+    return probabilities.transpose(np.argsort(np.argsort(qubits))).ravel()
 
   def barplot(self):
     """
     Plots the probabilities of the basis states.
     """
-    plt.bar(self.basis_state, np.real(np.conjugate(self.state)*self.state))
+    plt.bar(list(self.basis_state), np.real(np.conjugate(self.state)*self.state))
     plt.xlabel("Basis States")
     plt.ylabel("Probabilities")
     plt.show()
@@ -0,0 +1,241 @@
+import multiprocessing
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+from .quantum_circuit import QuantumCircuit
+from .gates import is_diagonal, gate_diagonal, apply_gate
+from .kernels import apply_diagonal_gate, fuse_diagonals, outcome_mask
+
+_segments = {}
+
+
+def _attach(name, shard_qubits, dtype):
+  """
+  Returns the shard stored in the shared memory segment name. Segments stay attached for the life of the worker.
+  """
+  if name not in _segments:
+    _segments[name] = shared_memory.SharedMemory(name=name)
+  return np.ndarray((2**shard_qubits,), dtype=dtype, buffer=_segments[name].buf)
+
+
+def _release(pool, segments):
+  """
+  Stops the worker processes and frees the shared memory segments. Called once, by close() or when the circuit is
+  garbage collected or the interpreter exits.
+  """
+  pool.terminate()
+  pool.join()
+  for segment in segments:
+    try:
+      segment.close()
+    except BufferError:
+      pass  # an array still points into the segment, which stays mapped until it is freed
+    segment.unlink()
+  return None
+
+
+def _apply_shard_gate(task):
+  name, shard_qubits, dtype, gate, qubits, params = task
+  apply_gate(_attach(name, shard_qubits, dtype), shard_qubits, gate, qubits, params)
+
+
+def _apply_shard_diagonal(task):
+  name, shard_qubits, dtype, sorted_qubits, table = task
+  shard = _attach(name, shard_qubits, dtype)
+  if sorted_qubits:
+    apply_diagonal_gate(shard, shard_qubits, sorted_qubits, table)
+  else:
+    shard *= table
+
+
+def _exchange_shards(task):
+  """
+  Swaps the amplitudes of shard0 whose local qubit is 1 with those of shard1 whose local qubit is 0.
+  """
+  name0, name1, shard_qubits, dtype, qubit = task
+  view0 = _attach(name0, shard_qubits, dtype).reshape(-1, 2, 2**(shard_qubits-qubit-1))[:, 1, :]
+  view1 = _attach(name1, shard_qubits, dtype).reshape(-1, 2, 2**(shard_qubits-qubit-1))[:, 0, :]
+  temp = view0.copy()
+  view0[...] = view1
+  view1[...] = temp
+
+
+def _shard_probability(task):
+  name, shard_qubits, dtype, qubit, outcome = task
+  shard = _attach(name, shard_qubits, dtype)
+  if qubit is None:
+    return np.linalg.norm(shard)**2
+  return np.linalg.norm(shard.reshape(-1, 2, 2**(shard_qubits-qubit-1))[:, outcome, :])**2
+
+
+class ShardedQuantumCircuit(QuantumCircuit):
+  """
+  Quantum circuit whose state vector is split into 2^global_qubits shards, each held in a
+  multiprocessing.shared_memory segment and updated by a pool of worker processes.
+
+  The shard index is given by the global_qubits most significant physical qubits and the remaining (local) qubits
+  index the amplitudes inside a shard. Gates on local qubits are applied by all the workers in parallel, each on its own
+  shard. Before a non-diagonal gate touches a global qubit, that qubit is swapped with an unused local qubit by a
+  pairwise exchange of half of the amplitudes between shards, and the mapping from circuit qubits to physical qubits is
+  updated. Diagonal gates never need an exchange.
+
+  self.state gathers the shards into a new array in the usual qubit order, undoing the exchanges, so it needs the memory
+  of the whole state in the calling process.
+  """
+  def __init__(self, n, initial_state = 0, global_qubits = 2, num_workers = None, lazy = False, max_fused_qubits = 2,
+               seed = None, dtype = complex):
+    """
+    global_qubits: the state is split into 2^global_qubits shards. At least 3 qubits must stay local.
+    num_workers: number of worker processes, by default one per shard.
+
+    initial_state: 0 for |0...0>, or a state vector which is scattered into the shards.
+    lazy: gates are recorded and fused before they are sent to the workers, which saves exchanges and pool round trips.
+    max_fused_qubits, seed and dtype work as for a QuantumCircuit; every worker applies its gates single-threaded.
+
+    Call close(), or use the circuit as a context manager, to stop the workers and free the shared memory. Otherwise
+    this is done when the circuit is garbage collected.
+    """
+    if n-global_qubits < 3:
+      raise ValueError(f"{n} qubits cannot be split with {global_qubits} global qubits, at least 3 must stay local.")
+    self._setup(n, lazy, max_fused_qubits, seed, dtype, 1)
+    self.global_qubits = global_qubits
+    self.shard_qubits = n-global_qubits
+    self._physical = list(range(n))
+    size = 2**self.shard_qubits*self.dtype.itemsize
+    self._segments = [shared_memory.SharedMemory(create=True, size=size) for _ in range(2**global_qubits)]
+    self._shards = [np.ndarray((2**self.shard_qubits,), dtype=self.dtype, buffer=segment.buf)
+                    for segment in self._segments]
+    self._pool = multiprocessing.Pool(num_workers or len(self._segments))
+    self._finalizer = weakref.finalize(self, _release, self._pool, self._segments)
+    initial_state = np.asarray(initial_state)
+    if initial_state.ndim == 0:
+      for shard in self._shards:
+        shard[:] = 0
+      self._shards[0][0] = 1
+    else:
+      self.state = initial_state
+
+  @property
+  def state(self):
+    """
+    State vector of the circuit, gathered from the shards into a new array.
+    """
+    self._run_pending()
+    tensor = np.concatenate(self._shards).reshape((2,)*self.n)
+    return tensor.transpose(self._physical).reshape(-1)
+
+  @state.setter
+  def state(self, state):
+    tensor = np.asarray(state, dtype=self.dtype).reshape((2,)*self.n)
+    tensor = tensor.transpose(np.argsort(self._physical)).reshape(len(self._shards), -1)
+    for shard, amplitudes in zip(self._shards, tensor):
+      shard[:] = amplitudes
+    self._pending_diagonals = {}
+    self.instructions = []
+
+  def close(self):
+    """
+    Stops the worker processes and frees the shared memory.
+    """
+    self._shards = []
+    self._finalizer()
+    self._segments = []
+    return None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exception):
+    self.close()
+    return False
+
+  def _fork_state(self, circuit):
+    raise TypeError("A ShardedQuantumCircuit cannot be forked.")
+
+  def _names(self):
+    return [segment.name for segment in self._segments]
+
+  def _swap_physical(self, global_position, local_position):
+    """
+    Exchanges a global and a local physical qubit between pairs of shards and updates the qubit mapping.
+    """
+    bit = 1 << (self.global_qubits-global_position-1)
+    names = self._names()
+    tasks = [(names[i], names[i | bit], self.shard_qubits, self.dtype, local_position-self.global_qubits)
+             for i in range(len(names)) if not i & bit]
+    self._pool.map(_exchange_shards, tasks)
+    a = self._physical.index(global_position)
+    b = self._physical.index(local_position)
+    self._physical[a], self._physical[b] = local_position, global_position
+    return None
+
+  def _execute(self, name, qubits, params):
+    """
+    Applies the gate on every shard, after moving any global qubit it touches to a local position. Diagonal gates are
+    queued (see QuantumCircuit._apply_diagonal).
+    """
+    if is_diagonal(name):
+      self._apply_diagonal(qubits, gate_diagonal(name, params))
+      return None
+    if self._pending_diagonals:
+      self._flush_diagonals()
+    positions = [self._physical[q] for q in qubits]
+    free = [p for p in range(self.n-1, self.global_qubits-1, -1) if p not in positions]
+    for position in positions:
+      if position < self.global_qubits:
+        self._swap_physical(position, free.pop(0))
+    local_qubits = tuple(self._physical[q]-self.global_qubits for q in qubits)
+    tasks = [(segment, self.shard_qubits, self.dtype, name, local_qubits, params) for segment in self._names()]
+    self._pool.map(_apply_shard_gate, tasks)
+    return None
+
+  def _flush_diagonals(self):
+    """
+    Applies the queued diagonal gates as a single fused phase multiplication on every shard.
+    """
+    qubits, table = fuse_diagonals(list(self._pending_diagonals.items()), self.dtype)
+    self._pending_diagonals = {}
+    self._apply_diagonal_table(qubits, table)
+    return None
+
+  def _apply_diagonal_table(self, sorted_qubits, table):
+    """
+    Multiplies every shard by the part of the diagonal table (over circuit qubits sorted_qubits) selected by the
+    shard's global qubits.
+    """
+    positions = [self._physical[q] for q in sorted_qubits]
+    local = [(p-self.global_qubits, axis) for axis, p in enumerate(positions) if p >= self.global_qubits]
+    local_qubits = tuple(sorted(q for q, _ in local))
+    local_axes = [axis for _, axis in sorted(local)]
+    tasks = []
+    for index, name in enumerate(self._names()):
+      selection = tuple((index >> (self.global_qubits-p-1)) & 1 if p < self.global_qubits else slice(None)
+                        for p in positions)
+      remaining = [axis for axis, p in enumerate(positions) if p >= self.global_qubits]
+      factor = np.asarray(table[selection]).transpose([remaining.index(axis) for axis in local_axes])
+      tasks.append((name, self.shard_qubits, self.dtype, local_qubits, factor))
+    self._pool.map(_apply_shard_diagonal, tasks)
+    return None
+
+  def measure(self, qubit_position):
+    """
+    Measures a single qubit and returns the outcome (0 or 1). Every worker sums the probabilities of its shard, and the
+    collapse is a diagonal gate sent to all the shards.
+    """
+    self._run_pending()
+    position = self._physical[qubit_position]
+    names = self._names()
+    if position < self.global_qubits:
+      norms = self._pool.map(_shard_probability, [(name, self.shard_qubits, self.dtype, None, 0) for name in names])
+      bit = 1 << (self.global_qubits-position-1)
+      probability1 = sum(norm for i, norm in enumerate(norms) if i & bit)
+      probability0 = sum(norms)-probability1
+    else:
+      probabilities = [sum(self._pool.map(_shard_probability, [(name, self.shard_qubits, self.dtype,
+                                                                position-self.global_qubits, outcome)
+                                                               for name in names]))
+                       for outcome in (0, 1)]
+      probability0, probability1 = probabilities
+    outcome, probability = self._draw_outcome(probability0, probability1)
+    self._apply_diagonal_table((qubit_position,), outcome_mask([outcome])/np.sqrt(probability))
+    return outcome
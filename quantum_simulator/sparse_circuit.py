@@ -0,0 +1,207 @@
+import numpy as np
+from .quantum_circuit import QuantumCircuit
+from .gates import is_diagonal, gate_diagonal, gate_matrix, CONTROLLED_GATES
+
+FLIP_GATES = ('x', 'y', 'cx', 'cy', 'ccx', 'mcx')
+SWAP_GATES = ('swap', 'cswap')
+
+
+class SparseQuantumCircuit(QuantumCircuit):
+  """
+  Quantum circuit whose state is stored as two parallel arrays, self.indices (basis indices, np.int64) and
+  self.amplitudes, holding only the non-zero amplitudes. This suits reversible circuits of x, cx, ccx, mcx, swap and
+  cswap, which only relabel basis states: they update self.indices in place and never touch the amplitudes. Diagonal
+  gates only scale the amplitudes. Other gates on k qubits map every non-zero amplitude to at most 2^k new ones.
+
+  Once the number of non-zero amplitudes exceeds max_nonzero, the state is converted to a dense state vector and the
+  circuit continues as a QuantumCircuit. Up to 62 qubits are supported.
+
+  self.state builds the dense state vector of 2^n amplitudes, so for many qubits use nonzero(), measure and sample,
+  which only read the non-zero amplitudes.
+  """
+  def __init__(self, n, initial_state = 0, max_nonzero = None, atol = 1e-14, lazy = False, max_fused_qubits = 2,
+               seed = None, dtype = complex, num_threads = 1):
+    """
+    max_nonzero: number of non-zero amplitudes above which the state becomes dense, by default 2^(n-3).
+    atol: amplitudes with a smaller absolute value created by non-permutation gates are dropped.
+    initial_state: 0 for |0...0>, or a state vector of which only the non-zero amplitudes are kept.
+    lazy: gates are recorded and fused into blocks of at most max_fused_qubits qubits before they run. Fused blocks
+    are applied as matrices, so reversible circuits are usually faster without it.
+    seed and dtype work as for a QuantumCircuit, and num_threads only applies once the state is dense.
+    """
+    if n > 62:
+      raise ValueError(f"A SparseQuantumCircuit supports up to 62 qubits, not {n}.")
+    self._setup(n, lazy, max_fused_qubits, seed, dtype, num_threads)
+    self.max_nonzero = 2**max(n-3, 0) if max_nonzero is None else max_nonzero
+    self.atol = atol
+    self.dense = False
+    initial_state = np.asarray(initial_state)
+    if initial_state.ndim == 0:
+      self.indices = np.zeros(1, dtype=np.int64)
+      self.amplitudes = np.ones(1, dtype=self.dtype)
+    else:
+      self.indices = np.flatnonzero(initial_state).astype(np.int64)
+      self.amplitudes = initial_state[self.indices].astype(self.dtype)
+      self._check_density()
+
+  @property
+  def state(self):
+    """
+    Dense state vector of the circuit. While the circuit is sparse it is built into a new array.
+    """
+    self._run_pending()
+    if self.dense:
+      self._owns_state = False
+      return self._state
+    state = np.zeros(2**self.n, dtype=self.dtype)
+    state[self.indices] = self.amplitudes
+    return state
+
+  @state.setter
+  def state(self, state):
+    self._state = np.asarray(state, dtype=self.dtype)
+    self._owns_state = False
+    self._pending_diagonals = {}
+    self.instructions = []
+    self.dense = True
+
+  def nonzero(self):
+    """
+    Returns (indices, amplitudes) of the non-zero amplitudes, sorted by basis index.
+    """
+    self._run_pending()
+    if self.dense:
+      indices = np.flatnonzero(self._state)
+      return indices, self._state[indices]
+    order = np.argsort(self.indices)
+    return self.indices[order], self.amplitudes[order]
+
+  def _densify(self):
+    """
+    Converts the state to a dense state vector, after which the circuit behaves as a QuantumCircuit.
+    """
+    state = np.zeros(2**self.n, dtype=self.dtype)
+    state[self.indices] = self.amplitudes
+    self.state = state
+    self._owns_state = True
+    del self.indices, self.amplitudes
+    return None
+
+  def _check_density(self):
+    """
+    Converts the state to a dense state vector if it has more than max_nonzero non-zero amplitudes.
+    """
+    if len(self.indices) > self.max_nonzero:
+      self._densify()
+    return None
+
+  def _own_state(self):
+    """
+    Copies the non-zero amplitudes if they are shared with a fork, before they are modified in place (copy-on-write).
+    """
+    if self.dense:
+      return super()._own_state()
+    if not self._owns_state:
+      self.indices = self.indices.copy()
+      self.amplitudes = self.amplitudes.copy()
+      self._owns_state = True
+    return None
+
+  def _bits(self, qubit):
+    return (self.indices >> (self.n-qubit-1)) & 1
+
+  def _controlled(self, controls):
+    """
+    Returns the boolean mask of the non-zero amplitudes whose control bits are all 1.
+    """
+    selected = np.ones(len(self.indices), dtype=bool)
+    for q in controls:
+      selected &= self._bits(q) == 1
+    return selected
+
+  def _execute(self, name, qubits, params):
+    """
+    Applies the gate on the non-zero amplitudes, or on the dense state vector once the circuit is dense.
+    """
+    if self.dense:
+      return super()._execute(name, qubits, params)
+    n = self.n
+    self._own_state()
+    if name in FLIP_GATES:
+      selected = self._controlled(qubits[:-1])
+      mask = 1 << (n-qubits[-1]-1)
+      if name in ('y', 'cy'):
+        self.amplitudes[selected] *= np.where(self.indices[selected] & mask, -1j, 1j)
+      self.indices[selected] ^= mask
+    elif name in SWAP_GATES:
+      a, b = qubits[-2:]
+      selected = self._controlled(qubits[:-2]) & (self._bits(a) != self._bits(b))
+      self.indices[selected] ^= (1 << (n-a-1)) | (1 << (n-b-1))
+    elif is_diagonal(name):
+      local = sum(self._bits(q) << (len(qubits)-j-1) for j, q in enumerate(qubits))
+      self.amplitudes *= np.asarray(gate_diagonal(name, params)).ravel()[local]
+    elif name in ('mcz', 'mcp'):
+      self.amplitudes[self._controlled(qubits)] *= CONTROLLED_GATES[name](*params)[1, 1]
+    else:
+      self._apply_matrix(qubits, gate_matrix(name, qubits, params))
+    return None
+
+  def _apply_matrix(self, qubits, matrix):
+    """
+    Applies a 2^k x 2^k matrix on k qubits. The non-zero amplitudes are grouped by their bits on the other qubits, each
+    group is multiplied by the matrix, and the new amplitudes smaller than atol are dropped.
+    """
+    k = len(qubits)
+    masks = np.array([1 << (self.n-q-1) for q in qubits], dtype=np.int64)
+    rest, inverse = np.unique(self.indices & ~np.int64(masks.sum()), return_inverse=True)
+    if len(rest)*2**k > self.max_nonzero:
+      self._densify()
+      return super()._execute('unitary', qubits, (matrix,))
+    local = sum(((self.indices & mask) != 0).astype(np.int64) << (k-j-1) for j, mask in enumerate(masks))
+    block = np.zeros((len(rest), 2**k), dtype=self.dtype)
+    block[inverse.ravel(), local] = self.amplitudes
+    block = block @ np.asarray(matrix, dtype=self.dtype).T
+    patterns = np.array([sum(int(mask) for j, mask in enumerate(masks) if (i >> (k-j-1)) & 1) for i in range(2**k)],
+                        dtype=np.int64)
+    indices = (rest[:, None] | patterns[None, :]).ravel()
+    amplitudes = block.ravel()
+    keep = np.abs(amplitudes) > self.atol
+    self.indices = indices[keep]
+    self.amplitudes = amplitudes[keep]
+    self._check_density()
+    return None
+
+  def measure(self, qubit_position):
+    """
+    Measures a single qubit and returns the outcome (0 or 1). Only the non-zero amplitudes are read, and those of the
+    other outcome are removed.
+    """
+    self._run_pending()
+    if self.dense:
+      return super().measure(qubit_position)
+    ones = self._bits(qubit_position) == 1
+    weights = np.abs(self.amplitudes)**2
+    probability1 = weights[ones].sum()
+    probability0 = weights.sum()-probability1
+    outcome, probability = self._draw_outcome(probability0, probability1)
+    keep = ones if outcome else ~ones
+    self.indices = self.indices[keep]
+    self.amplitudes = self.amplitudes[keep]/np.sqrt(probability)
+    return outcome
+
+  def sample(self, shots, qubits = None, seed = None, counts = True):
+    """
+    Draws measurement shots in the computational basis without changing the state, see QuantumMeasurement.sample.
+    """
+    indices, amplitudes = self.nonzero()
+    qubits = list(range(self.n)) if qubits is None else list(qubits)
+    weights = np.abs(amplitudes)**2
+    rng = np.random.default_rng(seed)
+    drawn = indices[rng.choice(len(indices), size=shots, p=weights/weights.sum())]
+    outcomes = np.zeros(shots, dtype=np.int64)
+    for q in qubits:
+      outcomes = (outcomes << 1) | ((drawn >> (self.n-q-1)) & 1)
+    if not counts:
+      return outcomes
+    values, histogram = np.unique(outcomes, return_counts=True)
+    return {format(value, f'0{len(qubits)}b'): int(count) for value, count in zip(values, histogram)}
@@ -0,0 +1,295 @@
+import numpy as np
+from .quantum_circuit import QuantumCircuit
+from .quantum_measurement import QuantumMeasurement, outcome_integers
+from .kernels import apply_single_qubit_gate
+from .pauli import PAULI_MATRICES, pauli_masks
+
+
+class NonCliffordGateError(ValueError):
+  """
+  Raised when a gate which is not a Clifford gate is applied to a StabilizerCircuit without fallback.
+  """
+
+
+class StabilizerCircuit(QuantumCircuit):
+  """
+  Simulator for Clifford circuits (h, s, inverse_s, x, y, z, cx, cy, cz, swap) based on the stabilizer tableau of
+  Aaronson and Gottesman, which needs O(n^2) memory and O(n) time per gate (O(n^2) per measurement) instead of 2^n.
+
+  Rows 0 to n-1 of the tableau are the destabilizers, rows n to 2n-1 the stabilizers. Row i stands for the Pauli
+  string (-1)^r[i] P_0 ... P_(n-1) with P_j = X, Y or Z when (x[i,j], z[i,j]) = (1,0), (1,1) or (0,1). p, rz, rx and
+  ry with angles which are multiples of pi/2, and cp with k = 0 or 1 are also Clifford gates.
+
+  Any other gate (t, inverse_t, ccx, cswap, ...) raises NonCliffordGateError, or, if fallback == True, converts the
+  circuit to a state vector QuantumCircuit on which all further gates are applied.
+  """
+  def __init__(self, n, seed = None, fallback = False):
+    """
+    Initializes n qubits in state |0...0>.
+    seed: seed of the random number generator used by measure and sample.
+    fallback: if True, non-Clifford gates switch the simulation to a state vector instead of raising an error.
+    """
+    self.n = n
+    self.rng = np.random.default_rng(seed)
+    self.fallback = fallback
+    self.lazy = False
+    self.instructions = []
+    self._x = np.zeros((2*n, n), dtype=bool)
+    self._z = np.zeros((2*n, n), dtype=bool)
+    self._r = np.zeros((2*n, 1), dtype=bool)
+    self._x[np.arange(n), np.arange(n)] = True
+    self._z[n+np.arange(n), np.arange(n)] = True
+    self._vector = None
+
+  @property
+  def state(self):
+    """
+    State vector of the circuit, defined up to a global phase. It has 2^n amplitudes, so this is only possible for a
+    small number of qubits.
+    """
+    if self._vector is not None:
+      return self._vector.state
+    return self._to_state_vector()
+
+  @state.setter
+  def state(self, state):
+    raise AttributeError("The state of a StabilizerCircuit cannot be set.")
+
+                                                    ####### Gates #######
+
+  def _execute(self, name, qubits, params):
+    """
+    Updates the tableau for a Clifford gate, otherwise raises NonCliffordGateError or falls back to a state vector.
+    """
+    if self._vector is not None:
+      self._vector._gate(name, qubits, params)
+      return None
+    sequence = self._clifford_sequence(name, qubits, params)
+    if sequence is None:
+      if not self.fallback:
+        raise NonCliffordGateError(f"'{name}' with parameters {params} is not a Clifford gate.")
+      self._vector = QuantumCircuit(self.n, self._to_state_vector())
+      self._vector.rng = self.rng
+      self._vector._gate(name, qubits, params)
+      return None
+    for gate, gate_qubits in sequence:
+      getattr(self, '_' + gate)(*gate_qubits)
+    return None
+
+  def _clifford_sequence(self, name, qubits, params):
+    """
+    Returns the gate as a list of (elementary gate, qubits) with elementary gates h, s and cx, up to a global phase, or
+    None if it is not a Clifford gate.
+    """
+    if name in ('mcx', 'mcz') and len(qubits) <= 2:
+      name = {('mcx', 1): 'x', ('mcx', 2): 'cx', ('mcz', 1): 'z', ('mcz', 2): 'cz'}[(name, len(qubits))]
+    if name in ('h', 's', 'cx'):
+      return [(name, qubits)]
+    h, s = ('h', qubits), ('s', qubits)
+    if name in ('p', 'rz', 'rx', 'ry'):
+      turns = params[0]/(np.pi/2)
+      if not np.isclose(turns, np.round(turns)):
+        return None
+      rz = [s]*(int(np.round(turns)) % 4)
+      if name == 'rx':
+        return [h] + rz + [h]
+      if name == 'ry':
+        return [s]*3 + [h] + rz + [h, s]
+      return rz
+    if name in ('z', 'inverse_s'):
+      return [s]*(2 if name == 'z' else 3)
+    if name == 'x':
+      return [h, s, s, h]
+    if name == 'y':
+      return [s, s, h, s, s, h]
+    if name in ('cz', 'cy', 'cp', 'swap'):
+      a, b = qubits
+      if name == 'cz' or (name == 'cp' and params[0] == 1):
+        return [('h', (b,)), ('cx', (a, b)), ('h', (b,))]
+      if name == 'cp':
+        return [] if params[0] == 0 else None
+      if name == 'cy':
+        return [('s', (b,))]*3 + [('cx', (a, b)), ('s', (b,))]
+      return [('cx', (a, b)), ('cx', (b, a)), ('cx', (a, b))]
+    return None
+
+  def _h(self, a):
+    self._r[:, 0] ^= self._x[:, a] & self._z[:, a]
+    self._x[:, a], self._z[:, a] = self._z[:, a].copy(), self._x[:, a].copy()
+    return None
+
+  def _s(self, a):
+    self._r[:, 0] ^= self._x[:, a] & self._z[:, a]
+    self._z[:, a] ^= self._x[:, a]
+    return None
+
+  def _cx(self, a, b):
+    self._r[:, 0] ^= self._x[:, a] & self._z[:, b] & ~(self._x[:, b] ^ self._z[:, a])
+    self._x[:, b] ^= self._x[:, a]
+    self._z[:, a] ^= self._z[:, b]
+    return None
+
+                                                    ####### Measurement #######
+
+  @staticmethod
+  def _phases(x1, z1, x2, z2):
+    """
+    Returns the exponents g (-1, 0 or 1) of i picked up by multiplying the Pauli operators (x2, z2) by (x1, z1), qubit
+    by qubit.
+    """
+    x1, z1, x2, z2 = (array.astype(np.int8) for array in (x1, z1, x2, z2))
+    g = np.where((x1 == 1) & (z1 == 1), z2-x2, 0)
+    g += np.where((x1 == 1) & (z1 == 0), z2*(2*x2-1), 0)
+    g += np.where((x1 == 0) & (z1 == 1), x2*(1-2*z2), 0)
+    return g
+
+  def _rowsum(self, targets, source):
+    """
+    Multiplies the rows targets by the row source, keeping track of the signs.
+    """
+    g = self._phases(self._x[source], self._z[source], self._x[targets], self._z[targets])
+    self._r[targets] ^= self._r[source]
+    self._r[targets, 0] ^= (g.sum(axis=1) % 4) == 2
+    self._x[targets] ^= self._x[source]
+    self._z[targets] ^= self._z[source]
+    return None
+
+  def _rowproduct(self, rows):
+    """
+    Returns (x, z, r) of the product of the given commuting rows, in order, keeping track of the sign.
+
+    Instead of one rowsum per row, the partial products before every row are all computed at once with cumulative XORs,
+    and the phases of all the multiplications are summed together: every partial product is Hermitian, so the sign
+    flips when the total is 2 mod 4.
+    """
+    x = self._x[rows]
+    z = self._z[rows]
+    g = self._phases(x, z, np.logical_xor.accumulate(x, axis=0) ^ x, np.logical_xor.accumulate(z, axis=0) ^ z)
+    r = np.logical_xor.reduce(self._r[rows], axis=0)
+    r[0] ^= g.sum() % 4 == 2
+    return np.logical_xor.reduce(x, axis=0), np.logical_xor.reduce(z, axis=0), r
+
+  def _measure(self, a, random_sign):
+    """
+    Measures qubit a in the tableau. If the outcome is random, the sign of the new stabilizer is set to random_sign.
+    Returns the sign row of the outcome.
+    """
+    n = self.n
+    candidates = np.flatnonzero(self._x[n:2*n, a])
+    if len(candidates):
+      p = n+candidates[0]
+      rows = np.flatnonzero(self._x[:, a])
+      self._rowsum(rows[rows != p], p)
+      self._x[p-n], self._z[p-n], self._r[p-n] = self._x[p], self._z[p], self._r[p]
+      self._x[p] = False
+      self._z[p] = False
+      self._z[p, a] = True
+      self._r[p] = random_sign
+      return self._r[p].copy()
+    return self._rowproduct(n + np.flatnonzero(self._x[:n, a]))[2]
+
+  def _copy(self, sign_columns = 1):
+    """
+    Returns a copy of the tableau whose signs have sign_columns columns (see sample).
+    """
+    tableau = StabilizerCircuit.__new__(StabilizerCircuit)
+    tableau.n = self.n
+    tableau._x = self._x.copy()
+    tableau._z = self._z.copy()
+    tableau._r = np.zeros((2*self.n, sign_columns), dtype=bool)
+    tableau._r[:, 0] = self._r[:, 0]
+    return tableau
+
+  def _fork_state(self, circuit):
+    """
+    Gives the fork a copy of the tableau, which has only O(n^2) bits, or a fork of the state vector after a fallback.
+    """
+    self.instructions = []
+    self._x = circuit._x.copy()
+    self._z = circuit._z.copy()
+    self._r = circuit._r.copy()
+    if circuit._vector is not None:
+      self._vector = circuit._vector.fork()
+      self._vector.rng = self.rng
+    return None
+
+  def measure(self, qubit_position):
+    """
+    Measures a single qubit in the computational basis and returns the outcome (0 or 1). The state collapses.
+    qubit_position: 0 to n-1.
+    """
+    if self._vector is not None:
+      return self._vector.measure(qubit_position)
+    return int(self._measure(qubit_position, [self.rng.integers(2)])[0])
+
+  def sample(self, shots, qubits = None, seed = None, counts = True):
+    """
+    Draws measurement shots in the computational basis without changing the state, like QuantumMeasurement.sample.
+
+    The qubits are measured once on a copy of the tableau in which every random outcome is kept as a free variable, so
+    each outcome is an affine function of these variables over GF(2). The shots are then drawn all at once.
+    """
+    qubits = list(range(self.n)) if qubits is None else list(qubits)
+    if self._vector is not None:
+      return QuantumMeasurement(self._vector.state).sample(shots, qubits, seed, counts)
+    tableau = self._copy(len(qubits)+1)
+    variables = 0
+    expressions = []
+    for qubit in qubits:
+      sign = np.zeros(len(qubits)+1, dtype=bool)
+      sign[variables+1] = True
+      expression = tableau._measure(qubit, sign)
+      variables += bool(np.array_equal(expression, sign))
+      expressions.append(expression)
+    expressions = np.array(expressions, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    bits = rng.integers(0, 2, size=(shots, variables))
+    outcomes = ((expressions[:, 0] + bits @ expressions[:, 1:variables+1].T) % 2).astype(np.uint8)
+    if not counts:
+      return outcome_integers(outcomes)
+    rows, histogram = np.unique(outcomes, axis=0, return_counts=True)
+    return {''.join(map(str, row)): int(count) for row, count in zip(rows, histogram)}
+
+  def expectation(self, operator):
+    """
+    Returns the expectation value (-1, 0 or 1) of a Pauli string, e.g. ['X', 'Y', 'I'] or 'XYI'.
+    """
+    if self._vector is not None:
+      return QuantumMeasurement(self._vector.state).expectation(operator)
+    if len(operator) != self.n:
+      raise ValueError(f"Pauli string {operator} does not act on {self.n} qubits.")
+    x_qubits, z_qubits, _ = pauli_masks(operator)
+    x = np.zeros(self.n, dtype=bool)
+    z = np.zeros(self.n, dtype=bool)
+    x[list(x_qubits)] = True
+    z[list(z_qubits)] = True
+    n = self.n
+    anticommuting = ((self._x & z) ^ (self._z & x)).sum(axis=1) % 2 == 1
+    if anticommuting[n:].any():
+      return 0.0
+    return -1.0 if self._rowproduct(n + np.flatnonzero(anticommuting[:n]))[2][0] else 1.0
+
+  def expectation_sum(self, terms):
+    """
+    Returns the expectation value of a weighted sum of Pauli strings terms = [(coefficient, operator), ...].
+    """
+    return sum(coefficient*self.expectation(operator) for coefficient, operator in terms)
+
+  def _to_state_vector(self):
+    """
+    Returns the state vector (up to a global phase) by projecting a basis state with non-zero amplitude onto the +1
+    eigenspace of every stabilizer.
+    """
+    n = self.n
+    tableau = self._copy()
+    outcomes = [int(tableau._measure(a, [False])[0]) for a in range(n)]
+    state = np.zeros(2**n, dtype=complex)
+    state[int(''.join(map(str, outcomes)), 2) if n else 0] = 1
+    for i in range(n, 2*n):
+      projected = state.copy()
+      for a in range(n):
+        pauli = 'IZXY'[2*self._x[i, a] + self._z[i, a]]
+        if pauli != 'I':
+          projected = apply_single_qubit_gate(projected, n, PAULI_MATRICES[pauli], a)
+      state = (state + (-1)**int(self._r[i, 0])*projected)/2
+    return state/np.linalg.norm(state)
@@ -20,7 +20,7 @@ setup(
         "Topic :: Scientific/Engineering :: Physics",
         "Topic :: Scientific/Engineering :: Quantum Computing",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.8",
     install_requires=[
         "numpy>=1.19.0",
         "matplotlib>=3.3.0",
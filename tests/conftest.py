@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from quantum_simulator import QuantumCircuit
+
+# name: (number of qubits, number of angles) of the gates drawn by random_circuit. mcx, mcz and mcp get two controls.
+GATES = {
+  'h': (1, 0), 'x': (1, 0), 'y': (1, 0), 'z': (1, 0), 's': (1, 0), 'inverse_s': (1, 0), 't': (1, 0),
+  'rx': (1, 1), 'ry': (1, 1), 'rz': (1, 1), 'p': (1, 1),
+  'cx': (2, 0), 'cy': (2, 0), 'cz': (2, 0), 'swap': (2, 0), 'ccx': (3, 0), 'cswap': (3, 0),
+  'mcx': (3, 0), 'mcz': (3, 0), 'mcp': (3, 1),
+}
+
+CLIFFORD_GATES = ('h', 'x', 'y', 'z', 's', 'inverse_s', 'cx', 'cy', 'cz', 'swap')
+
+
+def make_random_circuit(n, depth, seed, clifford = False):
+  """
+  Returns depth random instructions (name, qubits, params) on distinct random qubits and with random angles, drawn from
+  GATES, or only from CLIFFORD_GATES if clifford is True.
+  """
+  rng = np.random.default_rng(seed)
+  gates = CLIFFORD_GATES if clifford else tuple(GATES)
+  instructions = []
+  for _ in range(depth):
+    name = gates[rng.integers(len(gates))]
+    k, angles = GATES[name]
+    qubits = tuple(int(q) for q in rng.choice(n, k, replace=False))
+    instructions.append((name, qubits, tuple(rng.uniform(0, 2*np.pi, angles))))
+  return instructions
+
+
+def make_dense_state(n, instructions):
+  """
+  Returns the state vector of the instructions run on a QuantumCircuit, the reference of the other backends.
+  """
+  circuit = QuantumCircuit(n)
+  for instruction in instructions:
+    circuit._gate(*instruction)
+  return circuit.state
+
+
+def apply_matrix(state, n, matrix, qubits):
+  """
+  Returns the state after the 2^k x 2^k matrix on qubits (first qubit most significant), contracted with the full
+  state tensor, the reference of the gate kernels.
+  """
+  k = len(qubits)
+  tensor = np.moveaxis(np.reshape(state, (2,)*n), qubits, range(k)).reshape(2**k, -1)
+  return np.moveaxis((np.asarray(matrix) @ tensor).reshape((2,)*n), range(k), qubits).ravel()
+
+
+@pytest.fixture
+def random_circuit():
+  return make_random_circuit
+
+
+@pytest.fixture
+def dense_state():
+  return make_dense_state
+
+
+@pytest.fixture
+def matrix_state():
+  return apply_matrix
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from quantum_simulator import QuantumCircuit, QuantumMeasurement
+from quantum_simulator.basis import BasisLabels
+
+
+def test_labels_match_the_eager_list():
+  for n in (1, 3, 5):
+    eager = ['|' + format(i, f'0{n}b') + '>' for i in range(2**n)]
+    labels = BasisLabels(n, '|{}>')
+    assert len(labels) == 2**n and list(labels) == eager
+    assert labels[-1] == eager[-1] and labels[1:7:2] == eager[1:7:2] and labels[::-1] == eager[::-1]
+    assert labels.index(eager[2**n//2]) == 2**n//2 and eager[-1] in labels
+  assert list(BasisLabels(2)) == ['00', '01', '10', '11']
+  assert repr(BasisLabels(2)) == "['00', '01', '10', '11']"
+  assert repr(BasisLabels(10, '|{}>')) == "['|0000000000>', '|0000000001>', '|0000000010>', ..., '|1111111111>']"
+
+
+def test_labels_out_of_range_raise_index_error():
+  labels = BasisLabels(3)
+  for index in (8, -9):
+    with pytest.raises(IndexError):
+      labels[index]
+  assert labels[np.int64(5)] == '101'
+
+
+def test_labels_are_formatted_on_lookup():
+  labels = BasisLabels(60)
+  assert len(labels) == 2**60 and labels[-1] == '1'*60 and labels[2**59] == '1' + '0'*59
+  circuit = QuantumCircuit(3)
+  circuit.x(1)
+  assert circuit.basis_states[2] == '|010>' and circuit.binary_indices_list[2] == '010'
+  measurement = QuantumMeasurement(circuit.state)
+  assert measurement.basis_state[2] == '|010>' and measurement.collapsed_state == '(1+0j)|010>'
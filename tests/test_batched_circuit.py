@@ -0,0 +1,35 @@
+import numpy as np
+from quantum_simulator import QuantumCircuit, BatchedQuantumCircuit
+
+
+def test_batched_angles_with_threads():
+  angles = np.linspace(0, 1, 20000)
+  circuit = BatchedQuantumCircuit(4, len(angles), num_threads=4)
+  circuit.h(1)
+  circuit.rx(0, angles)
+  circuit.ry(3, angles)
+  circuit.cx(0, 2)
+  circuit.rz(2, angles)
+  for i in (0, 777, 19999):
+    reference = QuantumCircuit(4)
+    reference.h(1)
+    reference.rx(0, angles[i])
+    reference.ry(3, angles[i])
+    reference.cx(0, 2)
+    reference.rz(2, angles[i])
+    assert np.allclose(circuit.state[i], reference.state)
+
+
+def test_batched_measure_is_per_circuit():
+  angles = np.linspace(0.1, 3.0, 500)
+  circuit = BatchedQuantumCircuit(3, len(angles), seed=1)
+  circuit.ry(0, angles)
+  circuit.cx(0, 2)
+  circuit.h(1)
+  outcomes = circuit.measure(0)
+  state = circuit.state
+  assert outcomes.shape == (len(angles),)
+  assert np.allclose(np.linalg.norm(state, axis=1), 1)
+  ones = state.reshape(len(angles), 2, 4)[:, 1]
+  assert np.allclose(np.linalg.norm(ones, axis=1), outcomes)
+  assert abs(outcomes.mean() - np.mean(np.sin(angles/2)**2)) < 0.1
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from quantum_simulator import QuantumCircuit, QuantumMeasurement, MemmapQuantumCircuit, BatchedQuantumCircuit
+
+
+def prepare(circuit):
+  circuit.h(0)
+  circuit.cx(0, 3)
+  circuit.ry(2, 0.7)
+  circuit.t(1)
+  return circuit
+
+
+def finish(circuit):
+  circuit.rx(3, 1.3)
+  circuit.cz(1, 2)
+  return circuit.state
+
+
+def test_checkpoint_resumes_circuit(tmp_path):
+  circuit = prepare(QuantumCircuit(4, seed=1))
+  circuit.save_checkpoint(tmp_path)
+  loaded = QuantumCircuit.load_checkpoint(tmp_path)
+  assert type(loaded) is QuantumCircuit
+  assert np.allclose(finish(loaded), finish(circuit))
+  assert loaded.measure(0) == circuit.measure(0)
+
+
+def test_memmap_checkpoint_stays_file_backed(tmp_path):
+  circuit = prepare(MemmapQuantumCircuit(4, chunk_qubits=2, seed=1))
+  circuit.save_checkpoint(tmp_path / 'checkpoint')
+  loaded = QuantumCircuit.load_checkpoint(tmp_path / 'checkpoint')
+  assert isinstance(loaded, MemmapQuantumCircuit) and loaded.chunk_qubits == 2
+  assert isinstance(loaded.state, np.memmap)
+  assert np.allclose(finish(loaded), finish(circuit))
+  loaded.close()
+  circuit.close()
+
+
+def test_checkpoint_and_fork_reject_other_circuits(tmp_path):
+  with pytest.raises(TypeError):
+    BatchedQuantumCircuit(2, 3).save_checkpoint(tmp_path)
+  circuit = MemmapQuantumCircuit(2)
+  with pytest.raises(TypeError):
+    circuit.fork()
+  circuit.close()
+
+
+def test_forks_are_isolated_copy_on_write():
+  circuit = prepare(QuantumCircuit(4, seed=2))
+  snapshot = circuit.state
+  saved = snapshot.copy()
+  fork = circuit.fork()
+  assert fork.state is circuit.state
+  fork.x(0)
+  circuit.h(2)
+  assert not np.shares_memory(fork.state, circuit.state)
+  assert np.allclose(snapshot, saved)
+  reference = prepare(QuantumCircuit(4))
+  reference.x(0)
+  assert np.allclose(fork.state, reference.state)
+  assert fork.measure(1) == circuit.fork().measure(1)
+
+
+def test_forks_copy_queued_gates():
+  circuit = QuantumCircuit(3, lazy=True)
+  circuit.h(0)
+  circuit.t(0)
+  fork = circuit.fork()
+  fork.cx(0, 1)
+  circuit.cx(0, 2)
+  assert len(fork.instructions) == len(circuit.instructions) == 3
+  assert np.isclose(abs(fork.state[6]), np.sqrt(1/2)) and np.isclose(abs(circuit.state[5]), np.sqrt(1/2))
+
+
+def test_assigned_and_read_states_are_not_modified_by_gates():
+  initial = np.zeros(8, dtype=complex)
+  initial[0] = 1
+  circuit = QuantumCircuit(3)
+  circuit.state = initial
+  circuit.h(1)
+  assert initial[0] == 1 and np.allclose(initial[1:], 0)
+  read = circuit.state
+  circuit.x(2)
+  assert np.allclose(read[[0, 2]], 1/np.sqrt(2)) and np.allclose(circuit.state[[1, 3]], 1/np.sqrt(2))
+
+
+def test_measurement_forks_collapse_independently():
+  state = prepare(QuantumCircuit(4)).state
+  measurement = QuantumMeasurement(state)
+  fork = measurement.fork()
+  measurement.collapse([0], [[1, 0]])
+  fork.collapse([0], [[0, 1]])
+  assert np.allclose(measurement.state[8:], 0) and np.allclose(fork.state[:8], 0)
+  assert np.isclose(measurement.collapse_probability + fork.collapse_probability, 1)
+  assert np.allclose(state, prepare(QuantumCircuit(4)).state)
+  assert np.allclose(fork.fork().state, fork.state) and fork.fork().state is fork.state
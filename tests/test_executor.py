@@ -0,0 +1,100 @@
+import asyncio
+import concurrent.futures
+import threading
+import numpy as np
+import pytest
+from quantum_simulator import CircuitExecutor, QuantumCircuit
+from quantum_simulator.executor import Job, run_jobs, structure
+
+BELL = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[2];\ncreg c[2];\nh q[0];\ncx q[0],q[1];\n'
+
+
+def rotations(angle):
+  return (3, [('h', (0,), ()), ('rx', (1,), (angle,)), ('cx', (0, 2), ()), ('rz', (2,), (angle/2,))])
+
+
+def reference(angle):
+  n, instructions = rotations(angle)
+  circuit = QuantumCircuit(n)
+  for instruction in instructions:
+    circuit._gate(*instruction)
+  return circuit.state
+
+
+def job(angle, result = 'state'):
+  n, instructions = rotations(angle)
+  return Job(n, instructions, {}, result, 100, [(1, 'ZZI')], None)
+
+
+def test_jobs_with_the_same_structure_run_as_one_batch():
+  angles = [0.1, 0.7, 2.3]
+  jobs = [job(angle) for angle in angles] + [Job(1, [('h', (0,), ())], {}, 'state', 0, None, None)]
+  assert structure(jobs[0].instructions) == structure(jobs[1].instructions) != structure(jobs[3].instructions)
+  results = run_jobs(jobs)
+  for angle, state in zip(angles, results):
+    assert np.allclose(state, reference(angle))
+  assert np.allclose(results[3], [1/np.sqrt(2), 1/np.sqrt(2)])
+
+
+def test_failing_job_returns_its_error():
+  results = run_jobs([job(0.3), Job(2, [('cx', (0, 5), ())], {}, 'state', 0, None, None)])
+  assert np.allclose(results[0], reference(0.3)) and isinstance(results[1], Exception)
+
+
+def test_submit_results_and_qasm():
+  with CircuitExecutor(max_workers=2) as executor:
+    futures = [executor.submit(rotations(angle)) for angle in (0.2, 1.4)]
+    counts = executor.submit(BELL, result='samples', shots=1000, seed=1).result()
+    value = executor.submit(BELL, result='expectation', terms='ZZ').result()
+    assert all(np.allclose(future.result(), reference(angle)) for future, angle in zip(futures, (0.2, 1.4)))
+  assert set(counts) == {'00', '11'} and sum(counts.values()) == 1000
+  assert np.isclose(value, 1)
+
+
+def test_gather_and_map():
+  angles = [0.1*i for i in range(10)]
+  with CircuitExecutor(max_workers=2) as executor:
+    states = asyncio.run(executor.gather([rotations(angle) for angle in angles]))
+    mapped = executor.map([rotations(angle) for angle in angles], result='expectation', terms=[(1, 'ZZI')])
+  for angle, state, value in zip(angles, states, mapped):
+    assert np.allclose(state, reference(angle))
+    assert np.isclose(value, np.vdot(state, state*np.array([1, -1, -1, 1, 1, -1, -1, 1])).real)
+
+
+def test_pending_jobs_are_bounded():
+  executor = CircuitExecutor(max_workers=1, max_pending=1, linger=0.5)
+  first = executor.submit(rotations(0.1))
+  with pytest.raises(TimeoutError):
+    executor.submit(rotations(0.2), timeout=0.05)
+  first.result()
+  assert np.allclose(executor.submit(rotations(0.2), timeout=5).result(), reference(0.2))
+  executor.shutdown()
+
+
+def test_cancelled_jobs_do_not_run():
+  executor = CircuitExecutor(max_workers=1, linger=0.5)
+  kept = executor.submit(rotations(0.4))
+  cancelled = executor.submit(rotations(0.5))
+  assert cancelled.cancel()
+  assert np.allclose(kept.result(), reference(0.4))
+  assert cancelled.cancelled()
+  executor.shutdown()
+
+
+def test_submit_after_or_during_shutdown_fails_the_future():
+  executor = CircuitExecutor(max_workers=1)
+  futures = []
+  submitting = threading.Thread(target=lambda: futures.extend(executor.submit(rotations(0.1)) for _ in range(200)))
+  submitting.start()
+  executor.shutdown()
+  submitting.join()
+  late = executor.submit(rotations(0.1))
+  with pytest.raises(RuntimeError):
+    late.result(timeout=1)
+  for future in futures:
+    try:
+      future.result(timeout=10)
+    except RuntimeError:
+      pass
+  with pytest.raises(ValueError):
+    executor.submit((1, [('unknown', (0,), ())]))
@@ -0,0 +1,69 @@
+import json
+import numpy as np
+from quantum_simulator import QuantumCircuit, BatchedQuantumCircuit, StabilizerCircuit, Profiler
+
+
+def test_hooks_see_every_applied_gate_and_measurement():
+  circuit = QuantumCircuit(3, seed=0)
+  records = []
+  circuit.add_hook(records.append)
+  circuit.h(0)
+  circuit.cx(0, 1)
+  circuit.rx(2, 0.3)
+  circuit.measure(1)
+  assert [record['name'] for record in records] == ['h', 'cx', 'rx', 'measure']
+  assert [record['qubits'] for record in records] == [(0,), (0, 1), (2,), (1,)]
+  assert all(record['duration'] >= record['seconds'] >= 0 for record in records)
+  circuit.remove_hook(records.append)
+  circuit.h(2)
+  assert len(records) == 4 and '_execute' not in vars(circuit)
+
+
+def test_queued_diagonal_gates_are_recorded_with_their_flush():
+  circuit = QuantumCircuit(2)
+  records = []
+  circuit.add_hook(records.append)
+  circuit.h(0)
+  circuit.t(0)
+  circuit.cz(0, 1)
+  circuit.state
+  assert [(record['name'], record['passes']) for record in records] == [('h', 1), ('t', 0), ('cz', 0),
+                                                                        ('flush_diagonals', 1)]
+  assert records[-1]['qubits'] == (0, 1)
+
+
+def test_batched_and_stabilizer_gates_are_recorded():
+  batched = BatchedQuantumCircuit(2, 4, seed=0)
+  stabilizer = StabilizerCircuit(2, seed=0)
+  for circuit in (batched, stabilizer):
+    records = []
+    circuit.add_hook(records.append)
+    circuit.h(0)
+    circuit.cx(0, 1)
+    circuit.measure(0)
+    assert [record['name'] for record in records] == ['h', 'cx', 'measure']
+  assert np.allclose(np.sum(np.abs(batched.state[:, [0, 3]]), axis=1), 1)
+
+
+def test_profiler_summary_and_chrome_trace(tmp_path):
+  circuit = QuantumCircuit(10)
+  profiler = Profiler().attach(circuit)
+  for qubit in range(10):
+    circuit.h(qubit)
+  circuit.cx(0, 1)
+  circuit.cx(2, 3)
+  circuit.measure(0)
+  summary = profiler.summary()
+  assert {name: entry['count'] for name, entry in summary.items()} == {'h': 10, 'cx': 2, 'measure': 1}
+  assert summary['h']['passes'] == 10 and summary['measure']['passes'] == 2
+  assert np.isclose(summary['cx']['mean_seconds'], summary['cx']['seconds']/2)
+  assert summary['h']['max_bytes'] is None or summary['h']['max_bytes'] >= 0
+  report = profiler.report().splitlines()
+  assert len(report) == 4 and report[0].split()[:2] == ['gate', 'count']
+  path = tmp_path/'trace.json'
+  profiler.export_chrome_trace(str(path))
+  events = json.loads(path.read_text())['traceEvents']
+  assert [event['name'] for event in events] == [record['name'] for record in profiler.records]
+  assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events) and events[0]['ts'] == 0
+  assert events[-1]['cat'] == 'measure' and events[-1]['args']['qubits'] == [0]
+  profiler.detach(circuit)
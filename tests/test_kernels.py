@@ -0,0 +1,81 @@
+import itertools
+import tracemalloc
+import numpy as np
+import pytest
+from quantum_simulator.kernels import apply_permutation_gate, apply_single_qubit_gate, fuse_diagonals
+from quantum_simulator.parallel import CHUNK_SIZE, run_chunks
+
+N = 5
+
+
+def reference(state, gate, qubits):
+  """
+  Applies the permutation gate by moving every basis index, bit by bit.
+  """
+  result = np.empty_like(state)
+  for index in range(2**N):
+    bits = [(index >> (N-q-1)) & 1 for q in range(N)]
+    phase = 1
+    if gate in ('cx', 'cy', 'ccx') and all(bits[q] for q in qubits[:-1]):
+      phase = (1j if bits[qubits[-1]] == 0 else -1j) if gate == 'cy' else 1
+      bits[qubits[-1]] ^= 1
+    elif gate == 'swap' or (gate == 'cswap' and bits[qubits[0]]):
+      bits[qubits[-2]], bits[qubits[-1]] = bits[qubits[-1]], bits[qubits[-2]]
+    result[int(''.join(map(str, bits)), 2)] = phase*state[index]
+  return result
+
+
+def test_permutation_gates():
+  rng = np.random.default_rng(0)
+  for gate, k in (('cx', 2), ('cy', 2), ('swap', 2), ('ccx', 3), ('cswap', 3)):
+    for qubits in itertools.permutations(range(N), k):
+      state = rng.normal(size=2**N) + 1j*rng.normal(size=2**N)
+      expected = reference(state, gate, qubits)
+      assert np.allclose(apply_permutation_gate(state.copy(), N, gate, qubits, num_threads=2), expected)
+      batch = np.stack([state, 2*state])
+      assert np.allclose(apply_permutation_gate(batch, N, gate, qubits), [expected, 2*expected])
+
+
+def test_fused_diagonal_table_has_the_state_dtype():
+  terms = [((0, 2), np.exp(1j*np.arange(4)).reshape(2, 2)), ((1,), np.array([1, 1j]))]
+  qubits, table = fuse_diagonals(terms, np.complex64)
+  expected = np.einsum('ac,b->abc', terms[0][1], terms[1][1])
+  assert qubits == (0, 1, 2) and table.dtype == np.complex64
+  assert np.allclose(table, expected, atol=1e-6)
+  assert fuse_diagonals(terms)[1].dtype == np.complex128
+
+
+@pytest.mark.parametrize('qubit', [0, 5, 9, 16])
+def test_single_qubit_gate_in_chunks(qubit):
+  n = 17
+  rng = np.random.default_rng(qubit)
+  state = rng.normal(size=2**n) + 1j*rng.normal(size=2**n)
+  operator = rng.normal(size=(2, 2)) + 1j*rng.normal(size=(2, 2))
+  expected = np.einsum('ij,ajb->aib', operator, state.reshape(2**qubit, 2, -1)).ravel()
+  tracemalloc.start()
+  result = apply_single_qubit_gate(state, n, operator, qubit)
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  assert result is state and np.allclose(state, expected)
+  assert peak < 4*CHUNK_SIZE*state.itemsize < state.nbytes
+
+
+def test_batched_single_qubit_gate_in_chunks():
+  n, batch = 15, 4
+  rng = np.random.default_rng(1)
+  states = rng.normal(size=(batch, 2**n)) + 0j
+  operators = rng.normal(size=(batch, 2, 2)) + 0j
+  expected = np.einsum('zij,zajb->zaib', operators, states.reshape(batch, 2**3, 2, -1)).reshape(batch, -1)
+  assert np.allclose(apply_single_qubit_gate(states, n, operators, 3), expected)
+
+
+def test_chunks_cover_the_view_once():
+  view = np.zeros((3, 40, 2, 50))
+  sizes = []
+
+  def add(chunk):
+    chunk += 1
+    sizes.append(chunk.size)
+
+  run_chunks(add, view, [0, 1, 3], 300)
+  assert np.all(view == 1) and max(sizes) <= 300
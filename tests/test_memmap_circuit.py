@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from quantum_simulator import MemmapQuantumCircuit
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_memmap_matches_state_vector(random_circuit, dense_state, lazy):
+  n = 6
+  instructions = random_circuit(n, 40, 5)
+  circuit = MemmapQuantumCircuit(n, chunk_qubits=3, lazy=lazy)
+  for instruction in instructions:
+    circuit._gate(*instruction)
+  assert np.allclose(circuit.state, dense_state(n, instructions))
+  circuit.close()
+
+
+def test_memmap_measure_collapses_like_state_vector(random_circuit, dense_state):
+  n = 5
+  instructions = random_circuit(n, 30, 6)
+  circuit = MemmapQuantumCircuit(n, dense_state(n, instructions), chunk_qubits=2, seed=1)
+  outcome = circuit.measure(1)
+  state = dense_state(n, instructions).reshape(2, 2, -1)
+  state[:, 1-outcome] = 0
+  assert np.allclose(circuit.state, state.ravel()/np.linalg.norm(state))
+  circuit.close()
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from quantum_simulator import MPSQuantumCircuit, QuantumMeasurement
+
+
+def run(circuit, instructions):
+  for instruction in instructions:
+    circuit._gate(*instruction)
+  return circuit
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_mps_matches_state_vector(random_circuit, dense_state, lazy):
+  n = 5
+  for seed in range(10):
+    instructions = random_circuit(n, 30, seed)
+    assert np.allclose(run(MPSQuantumCircuit(n, lazy=lazy), instructions).state, dense_state(n, instructions))
+
+
+def test_mps_expectation_matches_state_vector(random_circuit, dense_state):
+  n = 6
+  rng = np.random.default_rng(1)
+  for seed in range(5):
+    instructions = random_circuit(n, 30, seed)
+    circuit = run(MPSQuantumCircuit(n), instructions)
+    measurement = QuantumMeasurement(dense_state(n, instructions))
+    for _ in range(5):
+      operator = ''.join(rng.choice(list('IXYZ'), n))
+      assert np.isclose(circuit.expectation(operator), measurement.expectation(operator))
+      assert np.isclose(circuit.expectation(operator.lower()), measurement.expectation(operator))
+
+
+def test_mps_samples_match_probabilities(random_circuit, dense_state):
+  n = 4
+  instructions = random_circuit(n, 20, 7)
+  circuit = run(MPSQuantumCircuit(n), instructions)
+  shots = 100000
+  counts = circuit.sample(shots, qubits=[3, 1], seed=1)
+  probabilities = QuantumMeasurement(dense_state(n, instructions)).marginal_probabilities([3, 1])
+  for i, probability in enumerate(probabilities):
+    assert abs(counts.get(format(i, '02b'), 0)/shots - probability) < 0.01
+  outcomes = circuit.sample(1000, qubits=[3, 1], seed=2, counts=False)
+  assert outcomes.shape == (1000,)
+  assert {format(i, '02b'): int(count) for i, count in enumerate(np.bincount(outcomes)) if count} == \
+         circuit.sample(1000, qubits=[3, 1], seed=2)
+
+
+def test_mps_measure_collapses_like_state_vector(random_circuit, dense_state):
+  n = 5
+  instructions = random_circuit(n, 30, 8)
+  circuit = run(MPSQuantumCircuit(n, seed=3), instructions)
+  outcome = circuit.measure(2)
+  state = dense_state(n, instructions).reshape(4, 2, -1)
+  state[:, 1-outcome] = 0
+  assert np.allclose(circuit.state, state.ravel()/np.linalg.norm(state))
+
+
+def test_mps_truncation_keeps_bond_dimension(random_circuit):
+  circuit = run(MPSQuantumCircuit(8, max_bond_dimension=2), random_circuit(8, 60, 3))
+  assert max(circuit.bond_dimensions) <= 2
+  assert np.isclose(np.linalg.norm(circuit.state), 1)
+
+
+def test_mps_samples_many_qubits():
+  n = 80
+  circuit = MPSQuantumCircuit(n)
+  circuit.h(0)
+  for i in range(n-1):
+    circuit.cx(i, i+1)
+  outcomes = circuit.sample(100, seed=4, counts=False)
+  assert set(outcomes) <= {0, 2**n-1}
+  assert set(circuit.sample(100, seed=4)) <= {'0'*n, '1'*n}
@@ -0,0 +1,46 @@
+import numpy as np
+from quantum_simulator import QuantumCircuit, QuantumMeasurement
+from quantum_simulator.gates import inverse_gate
+
+def redundant(instructions, seed):
+  """
+  Returns the instructions with redundant gates which cancel or merge: some rotations are repeated with another angle,
+  and the inverse of the last third follows it.
+  """
+  rng = np.random.default_rng(seed)
+  redundant_instructions = []
+  for name, qubits, params in instructions:
+    redundant_instructions.append((name, qubits, params))
+    if params and rng.random() < 0.5:
+      redundant_instructions.append((name, qubits, tuple(rng.uniform(0, 2*np.pi, len(params)))))
+  block = redundant_instructions[-len(redundant_instructions)//3:]
+  return redundant_instructions + [inverse_gate(*instruction) for instruction in reversed(block)]
+
+
+def run(n, instructions, measured_qubits = None, optimize = True):
+  circuit = QuantumCircuit(n, lazy=True)
+  for instruction in instructions:
+    circuit._gate(*instruction)
+  report = circuit.optimize(measured_qubits) if optimize else None
+  return circuit.state, report
+
+
+def test_optimized_circuit_has_the_same_state(random_circuit):
+  n = 5
+  for seed in range(10):
+    instructions = redundant(random_circuit(n, 40, seed), seed)
+    state, report = run(n, instructions)
+    assert np.allclose(state, run(n, instructions, optimize=False)[0])
+    assert report['gates_after'] < report['gates_before']
+
+
+def test_light_cone_keeps_measured_probabilities(random_circuit):
+  n = 6
+  measured = [0, 4]
+  for seed in range(10):
+    instructions = redundant(random_circuit(n, 40, seed), seed)
+    state, report = run(n, instructions, measured)
+    expected = run(n, instructions, optimize=False)[0]
+    assert np.allclose(QuantumMeasurement(state).marginal_probabilities(measured),
+                       QuantumMeasurement(expected).marginal_probabilities(measured))
+    assert report['gates_after'] <= run(n, instructions)[1]['gates_after']
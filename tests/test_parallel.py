@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from quantum_simulator import QuantumCircuit, BatchedQuantumCircuit
+from quantum_simulator.parallel import MIN_BLOCK_SIZE, run_blocks, run_ranges
+
+N = 16  # 2^16 amplitudes, split into 4 blocks of MIN_BLOCK_SIZE
+
+
+@pytest.mark.parametrize('dtype', [np.complex128, np.complex64])
+@pytest.mark.parametrize('lazy', [False, True])
+def test_threaded_circuits_match_single_threaded(random_circuit, dtype, lazy):
+  instructions = random_circuit(N, 60, 11)
+  states = []
+  for num_threads in (1, 3, 4):
+    circuit = QuantumCircuit(N, lazy=lazy, dtype=dtype, num_threads=num_threads, seed=0)
+    for instruction in instructions:
+      circuit._gate(*instruction)
+    circuit.qft(list(range(0, N, 2)))
+    circuit.measure(5)
+    states.append(circuit.state)
+  tolerance = 1e-5 if dtype == np.complex64 else 1e-12
+  assert all(np.allclose(state, states[0], atol=tolerance) for state in states[1:])
+
+
+def test_threaded_batches_match_single_threaded():
+  angles = np.linspace(0, np.pi, 4)
+  states = []
+  for num_threads in (1, 4):
+    circuit = BatchedQuantumCircuit(14, 4, num_threads=num_threads)
+    for q in range(14):
+      circuit.h(q)
+      circuit.rx(q, angles*(q + 1))
+    circuit.cx(0, 13)
+    circuit.rz(7, angles)
+    states.append(circuit.state)
+  assert np.allclose(states[0], states[1])
+
+
+def test_blocks_and_ranges_cover_everything_once():
+  view = np.zeros((8, 2, 2*MIN_BLOCK_SIZE))
+  blocks = []
+
+  def add(block):
+    block += 1
+    blocks.append(block.shape)
+
+  run_blocks(add, view, [0, 2], 4)
+  assert np.all(view == 1) and len(blocks) == 4
+  covered = np.zeros(4*MIN_BLOCK_SIZE)
+
+  def mark(start, stop):
+    covered[start:stop] += 1
+
+  run_ranges(mark, len(covered), 3)
+  assert np.all(covered == 1)
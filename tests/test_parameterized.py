@@ -0,0 +1,68 @@
+import numpy as np
+from quantum_simulator import QuantumCircuit, Parameter, ParameterizedCircuit
+
+TERMS = [(0.5, 'ZZI'), (-1.2, 'XIY'), (0.3, 'IYZ')]
+
+
+def build():
+  theta, phi = Parameter('theta'), Parameter('phi')
+  circuit = ParameterizedCircuit(3)
+  circuit.h(0)
+  circuit.rx(1, theta)
+  circuit.cx(0, 2)
+  circuit.ry(2, 2*phi - 0.3)
+  circuit.t(1)
+  circuit.rz(0, 0.5*theta + 1)
+  circuit.cx(2, 1)
+  circuit.p(1, -phi)
+  return circuit.compile()
+
+
+def reference_state(theta, phi):
+  circuit = QuantumCircuit(3)
+  circuit.h(0)
+  circuit.rx(1, theta)
+  circuit.cx(0, 2)
+  circuit.ry(2, 2*phi - 0.3)
+  circuit.t(1)
+  circuit.rz(0, 0.5*theta + 1)
+  circuit.cx(2, 1)
+  circuit.p(1, -phi)
+  return circuit.state
+
+
+def test_bind_matches_circuit():
+  compiled = build()
+  assert np.allclose(compiled.bind([0.4, 1.1]), reference_state(0.4, 1.1))
+
+
+def test_gradient_matches_finite_differences():
+  compiled = build()
+  values = np.array([0.4, 1.1])
+  _, gradient = compiled.gradient(values, TERMS)
+  step = 1e-6
+  for i in range(len(values)):
+    shift = np.zeros(len(values))
+    shift[i] = step
+    difference = (compiled.expectation(values + shift, TERMS) - compiled.expectation(values - shift, TERMS))/(2*step)
+    assert np.isclose(gradient[i], difference, atol=1e-6)
+
+
+def test_batched_gradient_is_per_row():
+  compiled = build()
+  batch = np.random.default_rng(0).uniform(0, 2*np.pi, size=(5, 2))
+  values, gradients = compiled.gradient(batch, TERMS)
+  assert values.shape == (5,) and gradients.shape == (5, 2)
+  for row, value, gradient in zip(batch, values, gradients):
+    expected_value, expected_gradient = compiled.gradient(row, TERMS)
+    assert np.isclose(value, expected_value)
+    assert np.allclose(gradient, expected_gradient)
+
+
+def test_expectation_matches_gradient_value():
+  compiled = build()
+  batch = np.random.default_rng(1).uniform(0, 2*np.pi, size=(4, 2))
+  assert np.allclose(compiled.expectation(batch, TERMS), compiled.gradient(batch, TERMS)[0])
+  assert np.isclose(compiled.expectation(batch[0], 'ZXY'), compiled.gradient(batch[0], 'ZXY')[0])
+  lowercase = [(coefficient, operator.lower()) for coefficient, operator in TERMS]
+  assert np.allclose(compiled.gradient(batch, lowercase)[1], compiled.gradient(batch, TERMS)[1])
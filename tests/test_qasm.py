@@ -0,0 +1,86 @@
+import io
+import numpy as np
+import pytest
+from quantum_simulator import QuantumCircuit, SparseQuantumCircuit, QasmReader, QasmError, run_qasm
+from quantum_simulator.qasm import statements
+
+HEADER = 'OPENQASM 2.0;\ninclude "qelib1.inc";\n'
+
+
+def read(program):
+  reader = QasmReader(io.StringIO(HEADER + program))
+  return reader, list(reader)
+
+
+def test_gates_and_angles():
+  _, instructions = read('qreg q[3];\nh q[0]; sdg q[1]; t q[2]; rx(pi/2) q[0];\n'
+                         'u1(-2*pi/3) q[1]; cp(sqrt(2)^2) q[0],q[2]; ccx q[0],q[1],q[2]; barrier q;')
+  assert instructions == [
+    ('h', (0,), ()), ('inverse_s', (1,), ()), ('p', (2,), (np.pi/4,)), ('rx', (0,), (np.pi/2,)),
+    ('p', (1,), (-2*np.pi/3,)), ('mcp', (0, 2), (pytest.approx(2.0),)), ('ccx', (0, 1, 2), ()),
+  ]
+
+
+def test_registers_are_numbered_and_broadcast():
+  reader, instructions = read('qreg a[2]; qreg b[2]; creg c[2];\nh a; cx a,b; cz a[1],b;')
+  assert reader.n == 4 and reader.qregs == {'a': (0, 2), 'b': (2, 2)} and reader.cregs == {'c': 2}
+  assert instructions == [('h', (0,), ()), ('h', (1,), ()), ('cx', (0, 2), ()), ('cx', (1, 3), ()),
+                          ('cz', (1, 2), ()), ('cz', (1, 3), ())]
+
+
+@pytest.mark.parametrize('program', [
+  'qreg a[2]; qreg b[3]; cx a,b;',
+  'qreg q[2]; h q[2];',
+  'qreg q[2]; cx q[0];',
+  'qreg q[2]; rx q[0];',
+  'qreg q[2]; gate g a { h a; }',
+  'qreg q[2]; h q[0]; qreg r[1];',
+  'qreg q[2]; creg c[1]; measure q -> c;',
+  'qreg q[2]; if(d==1) x q[0];',
+  'qreg q[1]; rx(pi/foo) q[0];',
+  'qreg q[1]; h q[0]',
+])
+def test_invalid_programs_raise_qasm_error(program):
+  with pytest.raises(QasmError):
+    read(program)
+
+
+def test_statements_strip_comments_and_join_lines():
+  lines = ['// header comment\n', 'qreg q[2]; // two qubits\n', 'cx q[0],\n', '   q[1]; h q[0];// ; not a statement\n']
+  assert list(statements(lines)) == ['qreg q[2]', 'cx q[0],\n   q[1]', 'h q[0]']
+
+
+def test_measure_and_condition():
+  program = 'qreg q[2]; creg c[2];\nx q[0];\nmeasure q -> c;\nif(c==1) x q[1];\nif(c==3) h q[1];'
+  reader, instructions = read(program)
+  assert instructions[1:3] == [('measure', (0,), ('c', 0)), ('measure', (1,), ('c', 1))]
+  assert instructions[3] == ('if', (), ('c', 1, ('x', (1,), ())))
+  circuit, bits = run_qasm(io.StringIO(HEADER + program))
+  assert bits == {'c': [1, 0]}
+  assert np.allclose(circuit.state, [0, 0, 0, 1])
+
+
+def test_repeated_statements_are_parsed_once():
+  reader = QasmReader(io.StringIO(HEADER + 'qreg q[2];\n' + 'cx q[0],q[1];\n'*5 + 'rz(pi/4) q[1];\n'*3))
+  calls = []
+  conditional = reader._conditional
+  reader._conditional = lambda statement: calls.append(statement) or conditional(statement)
+  instructions = list(reader)
+  assert instructions == [('cx', (0, 1), ())]*5 + [('rz', (1,), (np.pi/4,))]*3
+  assert calls.count('cx q[0],q[1]') == 1 and calls.count('rz(pi/4) q[1]') == 1
+
+
+def test_run_qasm_matches_circuit():
+  program = 'qreg q[3];\nh q[0];\ncx q[0],q[1];\nry(0.3) q[2];\nswap q[1],q[2];\ncp(pi/3) q[0],q[2];'
+  circuit, bits = run_qasm(io.StringIO(HEADER + program))
+  expected = QuantumCircuit(3)
+  expected.h(0)
+  expected.cx(0, 1)
+  expected.ry(2, 0.3)
+  expected.swap(1, 2)
+  expected.mcp([0], 2, np.pi/3)
+  assert bits == {} and np.allclose(circuit.state, expected.state)
+  sparse, _ = run_qasm(io.StringIO(HEADER + program), SparseQuantumCircuit(3))
+  assert np.allclose(sparse.state, expected.state)
+  with pytest.raises(QasmError):
+    run_qasm(io.StringIO(HEADER + program), QuantumCircuit(4))
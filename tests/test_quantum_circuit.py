@@ -0,0 +1,175 @@
+import tracemalloc
+import numpy as np
+import pytest
+from quantum_simulator import QuantumCircuit, SparseQuantumCircuit
+from quantum_simulator.gates import gate_matrix
+
+
+@pytest.mark.parametrize('apply', [
+  lambda circuit: circuit.mcx([0, 1], 1),
+  lambda circuit: circuit.mcz([2, 2], 0),
+  lambda circuit: circuit.mcp([0], 0, 0.3),
+  lambda circuit: circuit.qft([0, 1, 0]),
+  lambda circuit: circuit.iqft([2, 2]),
+  lambda circuit: circuit.unitary(np.eye(4), [1, 1]),
+])
+@pytest.mark.parametrize('circuit_class', [QuantumCircuit, SparseQuantumCircuit])
+def test_repeated_qubits_are_rejected(circuit_class, apply):
+  circuit = circuit_class(3)
+  circuit.h(0)
+  with pytest.raises(ValueError):
+    apply(circuit)
+  assert np.allclose(circuit.state, QuantumCircuit(3, np.kron([1, 1], [1, 0, 0, 0])/np.sqrt(2)).state)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_complex64_circuits_match_complex128(random_circuit, dense_state, lazy):
+  instructions = random_circuit(6, 60, 3)
+  circuit = QuantumCircuit(6, dtype=np.complex64, lazy=lazy)
+  for instruction in instructions:
+    circuit._gate(*instruction)
+  assert circuit.state.dtype == np.complex64
+  assert np.allclose(circuit.state, dense_state(6, instructions), atol=1e-5)
+
+
+def test_complex64_diagonal_flush_builds_no_complex128_table():
+  n = 16
+  circuit = QuantumCircuit(n, dtype=np.complex64)
+  for q in range(n):
+    circuit.h(q)
+  for q in range(n-1):
+    circuit.cp(q, q+1, 0.3)
+  tracemalloc.start()
+  circuit._flush_diagonals()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  # The fused table and one product being built, both complex64 like the state.
+  assert peak < 2.5*2**n*np.dtype(np.complex64).itemsize
+  assert circuit.state.dtype == np.complex64
+
+
+DIAGONALS = [('z', 1, ()), ('s', 1, ()), ('inverse_s', 1, ()), ('t', 1, ()), ('p', 1, (0.4,)), ('rz', 1, (1.1,)),
+             ('cz', 2, ()), ('cp', 2, (3,))]
+
+
+def test_fused_diagonal_gates_match_one_by_one(matrix_state):
+  n = 5
+  rng = np.random.default_rng(4)
+  circuit = QuantumCircuit(n)
+  expected = circuit.state.copy()
+  for layer in range(4):
+    for q in range(n):
+      circuit.ry(q, 0.3 + q + layer)
+      expected = matrix_state(expected, n, gate_matrix('ry', (q,), (0.3 + q + layer,)), (q,))
+    for _ in range(8):
+      name, k, params = DIAGONALS[rng.integers(len(DIAGONALS))]
+      qubits = tuple(int(q) for q in rng.choice(n, k, replace=False))
+      circuit._gate(name, qubits, params)
+      expected = matrix_state(expected, n, gate_matrix(name, qubits, params), qubits)
+    assert circuit._pending_diagonals
+    assert np.allclose(circuit.state, expected)
+    assert not circuit._pending_diagonals
+
+
+def test_diagonal_gates_on_the_same_qubits_are_multiplied_when_queued():
+  circuit = QuantumCircuit(3)
+  for q in range(3):
+    circuit.h(q)
+  circuit.cp(2, 0, 2)
+  circuit.cz(0, 2)
+  circuit.t(1)
+  circuit.s(1)
+  assert set(circuit._pending_diagonals) == {(0, 2), (1,)}
+  qubits_0_2 = np.array([[1, 1], [1, -1j]])
+  qubit_1 = np.array([1, 1j*gate_matrix('t', (1,))[1, 1]])
+  assert np.allclose(circuit.state, np.einsum('ac,b->abc', qubits_0_2, qubit_1).ravel()/np.sqrt(8))
+
+
+@pytest.mark.parametrize('max_fused_qubits', [1, 2, 3])
+def test_lazy_fusion_matches_eager_execution(random_circuit, dense_state, max_fused_qubits):
+  instructions = random_circuit(6, 80, max_fused_qubits)
+  circuit = QuantumCircuit(6, lazy=True, max_fused_qubits=max_fused_qubits)
+  for instruction in instructions:
+    circuit._gate(*instruction)
+  assert circuit.instructions == instructions and np.allclose(circuit._state[1:], 0)
+  assert np.allclose(circuit.state, dense_state(6, instructions))
+  assert circuit.instructions == []
+
+
+def test_lazy_measurements_run_the_recorded_gates_first():
+  eager, lazy = QuantumCircuit(3, seed=5), QuantumCircuit(3, lazy=True, seed=5)
+  for circuit in (eager, lazy):
+    circuit.h(0)
+    circuit.cx(0, 1)
+    circuit.ry(2, 0.8)
+    outcomes = [circuit.measure(q) for q in range(3)]
+    circuit.x(1)
+  assert [eager.measure(q) for q in range(3)] == [lazy.measure(q) for q in range(3)]
+  assert outcomes[0] == outcomes[1] and np.allclose(eager.state, lazy.state)
+
+
+def textbook_qft(circuit, qubits):
+  """
+  The QFT as h and cp gates followed by the swaps which reverse the qubit order.
+  """
+  k = len(qubits)
+  for j in range(k):
+    circuit.h(qubits[j])
+    for m in range(j+1, k):
+      circuit.cp(qubits[m], qubits[j], m-j+1)
+  for j in range(k//2):
+    circuit.swap(qubits[j], qubits[k-j-1])
+  return None
+
+
+@pytest.mark.parametrize('qubits', [[0], [1, 2], [0, 1, 2, 3, 4], [4, 1, 3], [3, 0, 4, 2]])
+def test_qft_matches_the_gate_circuit(random_circuit, dense_state, qubits):
+  prefix = random_circuit(5, 20, len(qubits))
+  circuit = QuantumCircuit(5, dense_state(5, prefix))
+  reference = QuantumCircuit(5, dense_state(5, prefix))
+  circuit.qft(qubits)
+  textbook_qft(reference, qubits)
+  assert np.allclose(circuit.state, reference.state)
+  circuit.iqft(qubits)
+  assert np.allclose(circuit.state, dense_state(5, prefix))
+
+
+def test_qft_of_a_basis_state_has_fourier_phases():
+  circuit = QuantumCircuit(4, np.eye(16)[5])
+  circuit.qft([0, 1, 2, 3])
+  assert np.allclose(circuit.state, np.exp(2j*np.pi*5*np.arange(16)/16)/4)
+  circuit.iqft([0, 1, 2, 3])
+  assert np.allclose(circuit.state, np.eye(16)[5])
+
+
+def controlled(operator, controls):
+  matrix = np.eye(2**(controls+1), dtype=complex)
+  matrix[-2:, -2:] = operator
+  return matrix
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_unitary_and_multi_controlled_gates_match_dense_matrices(random_circuit, dense_state, matrix_state, lazy):
+  n = 5
+  rng = np.random.default_rng(7)
+  prefix = random_circuit(n, 20, 8)
+  circuit = QuantumCircuit(n, dense_state(n, prefix), lazy=lazy)
+  expected = dense_state(n, prefix)
+  for qubits in ([3], [4, 0], [2, 0, 3], [1, 4, 0, 2]):
+    matrix, _ = np.linalg.qr(rng.normal(size=(2**len(qubits),)*2) + 1j*rng.normal(size=(2**len(qubits),)*2))
+    circuit.unitary(matrix, qubits)
+    expected = matrix_state(expected, n, matrix, qubits)
+  for controls, target in (([1], 3), ([4, 0], 2), ([3, 1, 0], 4), ([0, 1, 2, 3], 4)):
+    circuit.mcx(controls, target)
+    circuit.mcz(controls[::-1], target)
+    circuit.mcp(controls, target, 0.9)
+    qubits = tuple(controls) + (target,)
+    expected = matrix_state(expected, n, controlled([[0, 1], [1, 0]], len(controls)), qubits)
+    expected = matrix_state(expected, n, controlled(np.diag([1, -1]), len(controls)), tuple(controls[::-1]) + (target,))
+    expected = matrix_state(expected, n, controlled(np.diag([1, np.exp(0.9j)]), len(controls)), qubits)
+  assert np.allclose(circuit.state, expected)
+
+
+def test_unitary_rejects_a_matrix_of_the_wrong_size():
+  with pytest.raises(ValueError):
+    QuantumCircuit(3).unitary(np.eye(4), [0, 1, 2])
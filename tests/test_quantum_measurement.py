@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from quantum_simulator import QuantumCircuit, QuantumMeasurement
+
+
+def random_state(n, seed = 0):
+  rng = np.random.default_rng(seed)
+  state = rng.normal(size=2**n) + 1j*rng.normal(size=2**n)
+  return state/np.linalg.norm(state)
+
+
+def test_sample_counts_match_probabilities():
+  measurement = QuantumMeasurement(random_state(4))
+  shots = 200000
+  counts = measurement.sample(shots, qubits=[2, 0], seed=1)
+  assert sum(counts.values()) == shots
+  probabilities = measurement.marginal_probabilities([2, 0])
+  for i, probability in enumerate(probabilities):
+    assert abs(counts.get(format(i, '02b'), 0)/shots - probability) < 0.01
+
+
+def test_sample_outcomes_match_counts():
+  measurement = QuantumMeasurement(random_state(6))
+  outcomes = measurement.sample(1000, seed=2, counts=False)
+  counts = measurement.sample(1000, seed=2)
+  assert outcomes.shape == (1000,)
+  assert {format(i, '06b'): int(count) for i, count in enumerate(np.bincount(outcomes)) if count} == counts
+
+
+def test_sample_skips_zero_probabilities():
+  state = np.zeros(8)
+  state[[0, 7]] = 1/np.sqrt(2)
+  counts = QuantumMeasurement(state).sample(1000, seed=3)
+  assert set(counts) == {'000', '111'} and sum(counts.values()) == 1000
+
+
+PAULIS = {'I': np.eye(2), 'X': np.array([[0, 1], [1, 0]]), 'Y': np.array([[0, -1j], [1j, 0]]), 'Z': np.diag([1, -1])}
+
+
+def dense_pauli(operator):
+  matrix = np.ones((1, 1))
+  for letter in operator:
+    matrix = np.kron(matrix, PAULIS[letter])
+  return matrix
+
+
+def random_paulis(n, count, seed):
+  rng = np.random.default_rng(seed)
+  return [''.join(rng.choice(list('IXYZ'), n)) for _ in range(count)]
+
+
+def test_expectation_matches_dense_pauli_matrices():
+  state = random_state(5, 3)
+  measurement = QuantumMeasurement(state)
+  for operator in random_paulis(5, 30, 4) + ['IIIII', 'YYYYY']:
+    expected = np.vdot(state, dense_pauli(operator) @ state)
+    assert np.isclose(measurement.expectation(operator), expected.real) and abs(expected.imag) < 1e-12
+    assert np.isclose(measurement.expectation(list(operator)), expected.real)
+
+
+def test_expectation_sum_matches_dense_pauli_matrices():
+  state = random_state(4, 5)
+  measurement = QuantumMeasurement(state)
+  rng = np.random.default_rng(6)
+  # All the Z strings share one X mask, a group larger than n which is evaluated with a Walsh-Hadamard transform.
+  z_strings = [''.join('Z' if (i >> q) & 1 else 'I' for q in range(4)) for i in range(16)]
+  for operators in (random_paulis(4, 12, 7), z_strings + ['XXYY', 'XXZZ']):
+    terms = [(float(rng.normal()), operator) for operator in operators]
+    expected = sum(coefficient*np.vdot(state, dense_pauli(operator) @ state) for coefficient, operator in terms)
+    assert np.isclose(measurement.expectation_sum(terms), expected.real)
+    assert measurement.expectation_value == measurement.expectation_sum(terms)
+  complex_terms = [(1j, 'XIII'), (2, 'ZZII')]
+  value = measurement.expectation_sum(complex_terms)
+  assert isinstance(value, complex)
+  assert np.isclose(value, sum(c*np.vdot(state, dense_pauli(o) @ state) for c, o in complex_terms))
+
+
+def test_expectation_rejects_strings_of_the_wrong_length():
+  with pytest.raises(ValueError):
+    QuantumMeasurement(random_state(3)).expectation_sum([(1, 'ZZ')])
+
+
+@pytest.mark.parametrize('qubits, vectors', [
+  ([1], [[0, 1]]),
+  ([0, 2], [[1, 0], [0, 1]]),
+  ([0, 3], [np.array([1, 1j])/np.sqrt(2), [0, 1]]),
+  ([1, 2, 3], [np.array([1, 1])/np.sqrt(2), [1, 0], [np.cos(0.3), np.sin(0.3)]]),
+])
+def test_collapse_matches_dense_projectors(matrix_state, qubits, vectors):
+  state = random_state(4, 8)
+  measurement = QuantumMeasurement(state)
+  measurement.collapse(qubits, vectors)
+  expected = state
+  for qubit, vector in zip(qubits, vectors):
+    expected = matrix_state(expected, 4, np.outer(vector, np.conjugate(vector)), (qubit,))
+  assert np.isclose(measurement.collapse_probability, np.linalg.norm(expected)**2)
+  assert np.allclose(measurement.state, expected/np.linalg.norm(expected))
+  assert np.allclose(measurement.probabilities, np.abs(measurement.state)**2)
+  assert np.allclose(state, random_state(4, 8))
+
+
+def test_collapse_onto_an_impossible_outcome_raises():
+  with pytest.raises(ValueError):
+    QuantumMeasurement([1, 0, 0, 0]).collapse([0], [[0, 1]])
+
+
+def test_measure_collapses_onto_the_drawn_outcome(matrix_state):
+  state = random_state(3, 9)
+  outcomes = []
+  for seed in range(400):
+    circuit = QuantumCircuit(3, state, seed=seed)
+    outcome = circuit.measure(1)
+    projected = matrix_state(state, 3, np.diag([1 - outcome, outcome]), (1,))
+    assert np.allclose(circuit.state, projected/np.linalg.norm(projected))
+    outcomes.append(outcome)
+  probability1 = np.sum(np.abs(state.reshape(2, 2, 2)[:, 1, :])**2)
+  assert abs(np.mean(outcomes) - probability1) < 0.1
+  circuit = QuantumCircuit(3, state, seed=0)
+  first = circuit.measure(2)
+  assert all(circuit.measure(2) == first for _ in range(5))
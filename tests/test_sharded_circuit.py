@@ -0,0 +1,45 @@
+import gc
+import numpy as np
+from multiprocessing import shared_memory
+import pytest
+from quantum_simulator import ShardedQuantumCircuit, QuantumCircuit
+
+
+def run(circuit):
+  circuit.h(0)
+  circuit.cx(0, 4)
+  circuit.ry(1, 0.4)
+  circuit.swap(1, 3)
+  circuit.rz(4, 1.1)
+  circuit.ccx(4, 1, 2)
+  return circuit.state
+
+
+def test_sharded_matches_state_vector():
+  with ShardedQuantumCircuit(5, global_qubits=2, num_workers=2) as circuit:
+    assert np.allclose(run(circuit), run(QuantumCircuit(5)))
+
+
+def test_shared_memory_is_released():
+  with ShardedQuantumCircuit(4, global_qubits=1, num_workers=1) as circuit:
+    names = circuit._names()
+  circuit = ShardedQuantumCircuit(4, global_qubits=1, num_workers=1)
+  names += circuit._names()
+  del circuit
+  gc.collect()
+  for name in names:
+    with pytest.raises(FileNotFoundError):
+      shared_memory.SharedMemory(name=name)
+
+
+def test_sharded_random_circuit_and_measure(random_circuit, dense_state):
+  n = 5
+  instructions = random_circuit(n, 30, 4)
+  with ShardedQuantumCircuit(n, global_qubits=2, num_workers=2, seed=2) as circuit:
+    for instruction in instructions:
+      circuit._gate(*instruction)
+    assert np.allclose(circuit.state, dense_state(n, instructions))
+    outcome = circuit.measure(0)
+    state = dense_state(n, instructions).reshape(2, -1)
+    state[1-outcome] = 0
+    assert np.allclose(circuit.state, state.ravel()/np.linalg.norm(state))
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from quantum_simulator import SparseQuantumCircuit, QuantumMeasurement
+
+
+def run(circuit, instructions):
+  for instruction in instructions:
+    circuit._gate(*instruction)
+  return circuit
+
+
+@pytest.mark.parametrize('max_nonzero', [2**5, 4])
+def test_sparse_matches_state_vector(random_circuit, dense_state, max_nonzero):
+  n = 5
+  for seed in range(10):
+    instructions = random_circuit(n, 30, seed)
+    circuit = run(SparseQuantumCircuit(n, max_nonzero=max_nonzero), instructions)
+    assert np.allclose(circuit.state, dense_state(n, instructions))
+
+
+def test_reversible_gates_stay_sparse():
+  n = 50
+  circuit = SparseQuantumCircuit(n)
+  circuit.h(0)
+  for i in range(n-1):
+    circuit.cx(i, i+1)
+  circuit.ccx(0, 1, 2)
+  circuit.swap(3, 40)
+  circuit.mcx([0, 5, 9], 49)
+  indices, amplitudes = circuit.nonzero()
+  assert not circuit.dense
+  assert list(indices) == [0, 2**n-1 - 2**(n-3) - 1]
+  assert np.allclose(amplitudes, 1/np.sqrt(2))
+
+
+def test_sparse_samples_and_measure(random_circuit, dense_state):
+  n = 4
+  instructions = random_circuit(n, 20, 7)
+  circuit = run(SparseQuantumCircuit(n, max_nonzero=2**n, seed=2), instructions)
+  shots = 100000
+  counts = circuit.sample(shots, qubits=[3, 1], seed=1)
+  probabilities = QuantumMeasurement(dense_state(n, instructions)).marginal_probabilities([3, 1])
+  for i, probability in enumerate(probabilities):
+    assert abs(counts.get(format(i, '02b'), 0)/shots - probability) < 0.01
+  outcome = circuit.measure(1)
+  state = dense_state(n, instructions).reshape(2, 2, -1)
+  state[:, 1-outcome] = 0
+  assert np.allclose(circuit.state, state.ravel()/np.linalg.norm(state))
@@ -0,0 +1,44 @@
+import numpy as np
+from quantum_simulator import StabilizerCircuit, QuantumCircuit, QuantumMeasurement
+
+
+def test_expectation_matches_state_vector(random_circuit):
+  rng = np.random.default_rng(1)
+  for seed in range(20):
+    n = 5
+    stabilizer, dense = StabilizerCircuit(n), QuantumCircuit(n)
+    for instruction in random_circuit(n, 40, seed, clifford=True):
+      stabilizer._gate(*instruction)
+      dense._gate(*instruction)
+    assert np.isclose(abs(np.vdot(stabilizer.state, dense.state)), 1)
+    measurement = QuantumMeasurement(dense.state)
+    for _ in range(10):
+      operator = ''.join(rng.choice(list('IXYZ'), n))
+      assert np.isclose(stabilizer.expectation(operator), measurement.expectation(operator))
+
+
+def test_ghz_measurements_agree():
+  n = 200
+  circuit = StabilizerCircuit(n, seed=3)
+  circuit.h(0)
+  for i in range(n-1):
+    circuit.cx(i, i+1)
+  assert circuit.expectation('Z'*n) == 1.0
+  assert circuit.expectation('X'*n) == 1.0
+  outcomes = {circuit.measure(i) for i in range(n)}
+  assert len(outcomes) == 1
+  assert circuit.expectation('Z' + 'I'*(n-1)) == (-1.0 if outcomes == {1} else 1.0)
+
+
+def test_sample_outcomes_are_integers(random_circuit):
+  n = 5
+  for fallback in (False, True):
+    circuit = StabilizerCircuit(n, fallback=fallback)
+    for instruction in random_circuit(n, 30, 2, clifford=True):
+      circuit._gate(*instruction)
+    if fallback:
+      circuit.t(0)
+    outcomes = circuit.sample(1000, qubits=[4, 0, 2], seed=5, counts=False)
+    assert outcomes.shape == (1000,)
+    assert {format(i, '03b'): int(count) for i, count in enumerate(np.bincount(outcomes)) if count} == \
+           circuit.sample(1000, qubits=[4, 0, 2], seed=5)